@@ -0,0 +1,86 @@
+import base64
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+"""
+   Measures cold start cost in a fresh interpreter for each entrypoint: importing main.py
+   and the first invocation, against a local fake Slack server
+
+   usage: python benchmarks/bench_coldstart.py [runs]
+"""
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+# runs inside the fresh interpreter, prints import and first invocation time in ms
+PROBE = '''
+import hashlib, hmac, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+entrypoint = sys.argv[1]
+if entrypoint == 'slackbuild_pubsub':
+    with open(sys.argv[2]) as f:
+        main.slackbuild_pubsub(json.load(f), {})
+else:
+    body = 'command=%2Fbuilds&text=help'
+    ts = str(int(time.time()))
+    sig = 'v0=' + hmac.new(b'secret', ('v0:' + ts + ':' + body).encode('utf-8'), hashlib.sha256).hexdigest()
+
+    class Request:
+        method = 'POST'
+        content_length = len(body)
+        headers = {'X-Slack-Request-Timestamp': ts, 'X-Slack-Signature': sig}
+        form = {'command': '/builds', 'text': 'help'}
+
+        def get_data(self, as_text=True, **kwargs):
+            return body if as_text else body.encode('utf-8')
+
+    Request.form = type('Form', (dict,), {'to_dict': lambda self: dict(self)})(Request.form)
+    main.slackbuild_webhook(Request())
+done = time.perf_counter()
+print(json.dumps([(imported - start) * 1e3, (done - imported) * 1e3]), file=sys.stderr)
+'''
+
+
+def run(workdir, entrypoint, fixture):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run([sys.executable, '-c', PROBE, entrypoint, fixture], cwd=workdir, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    return json.loads(proc.stderr.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    sys.path.append(ROOT)
+    from benchmarks.fake_slack import FakeSlack
+
+    workdir = tempfile.mkdtemp()
+    try:
+        with FakeSlack() as slack:
+            with open(os.path.join(workdir, 'config.yaml'), 'w') as f:
+                json.dump({
+                    'slack': {
+                        'channel': '#test',
+                        'token': 'xoxb-test',
+                        'signing_secret': 'secret',
+                        'incoming_webhook_url': slack.url + 'hook'
+                    },
+                    'gcloud': {'project_id': 'my-project'}
+                }, f)
+
+            fixture = os.path.join(ROOT, 'mocks', 'pubsub', 'success_triggered.json')
+            for entrypoint in ('slackbuild_webhook', 'slackbuild_pubsub'):
+                samples = sorted(run(workdir, entrypoint, fixture) for _ in range(runs))
+                imported, invoked = samples[len(samples) // 2]
+                print('%-20s import %8.1f ms  first call %8.1f ms  total %8.1f ms' % (entrypoint, imported, invoked, imported + invoked))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
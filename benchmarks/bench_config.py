@@ -0,0 +1,57 @@
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.config import Config  # noqa
+
+"""
+   Compares loading config.yaml with loading its compiled json snapshot, and nested .get() chains
+   with Config.value lookups
+
+   usage: python benchmarks/bench_config.py [config file] [iterations]
+"""
+
+source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), '..', 'config.example.yaml')
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+directory = tempfile.mkdtemp()
+filename = os.path.join(directory, 'config.yaml')
+shutil.copy(source, filename)
+
+
+def load():
+    return Config(filename)
+
+
+yaml_seconds = min(timeit.repeat(load, number=iterations, repeat=3))
+Config.compile(filename)
+snapshot_seconds = min(timeit.repeat(load, number=iterations, repeat=3))
+
+# the first load imports yaml, only the snapshot path avoids that import on a cold start
+assert load().get('slack') == Config(source).get('slack')
+
+print('%-30s %8.2f us/load' % ('yaml', yaml_seconds / iterations * 1e6))
+print('%-30s %8.2f us/load' % ('json snapshot', snapshot_seconds / iterations * 1e6))
+
+config = load()
+lookups = iterations * 100
+
+
+def chained():
+    return config.get('slack', {}).get('webhook', {}).get('max_request_age', 300)
+
+
+def value():
+    return config.value('slack.webhook.max_request_age', 300)
+
+
+assert chained() == value()
+
+for name, fn in (('nested .get()', chained), ('Config.value', value)):
+    seconds = min(timeit.repeat(fn, number=lookups, repeat=3))
+    print('%-30s %8.3f us/lookup' % (name, seconds / lookups * 1e6))
+
+shutil.rmtree(directory)
@@ -0,0 +1,359 @@
+import argparse
+import base64
+import contextlib
+import copy
+import gc
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+"""
+   Drives main.slackbuild_webhook and main.slackbuild_pubsub end to end with the mocks/webhook
+   and mocks/pubsub fixtures, and generated variants of them, against in process fake Slack and
+   Cloud Build clients. Reports time per stage, operations per second and the memory peak of each
+   scenario, and fails when the median of its runs got slower than its stored baseline by more than
+   the threshold, scenarios faster than FAST_US are noisier and get the wider --fast-threshold
+
+   Baselines depend on the machine and are not committed, the first run records one, record it
+   again with --update after a change that is expected to be slower
+
+   usage: python benchmarks/bench_e2e.py [--iterations N] [--repeat N] [--threshold PCT] [--fast-threshold PCT] [--update] [--baseline FILE]
+"""
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'e2e.json')
+SECRET = 'secret'
+STATUSES = ('QUEUED', 'WORKING', 'SUCCESS', 'FAILURE', 'INTERNAL_ERROR', 'TIMEOUT', 'CANCELLED')
+# in the order a pubsub or webhook call goes through them
+STAGES = ('verify', 'parse', 'command', 'decode', 'variables', 'render', 'post')
+# us/op under which a scenario is compared with --fast-threshold
+FAST_US = 200.0
+
+
+class FakeSlackClient:
+    """ answers every Web API call like a successful chat.postMessage """
+
+    def api_call(self, method, **kwargs):
+        return {'ok': True, 'channel': 'C123', 'ts': '1549843673.001900'}
+
+
+class FakeRequest:
+    """ executes to a canned Cloud Build API response """
+
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self, **kwargs):
+        return self.response
+
+
+class FakeCloudBuildApi:
+    """ stands in for the googleapiclient Cloud Build resource """
+
+    def __init__(self):
+        with open(os.path.join(ROOT, 'mocks', 'webhook', 'operation.json')) as f:
+            self.operation = json.load(f)
+        self.build = self.operation['metadata']['build']
+
+    def projects(self):
+        return self
+
+    def builds(self):
+        return self
+
+    def triggers(self):
+        return self
+
+    def cancel(self, **kwargs):
+        return FakeRequest(self.operation)
+
+    def retry(self, **kwargs):
+        return FakeRequest(self.operation)
+
+    def run(self, **kwargs):
+        return FakeRequest(self.operation)
+
+    def get(self, **kwargs):
+        return FakeRequest(self.build)
+
+    def list(self, **kwargs):
+        return FakeRequest({'builds': [self.build] * 10})
+
+    def list_next(self, request, response):
+        return None
+
+
+class Stages:
+    """ times wrapped functions, a nested call is only counted in its own stage """
+
+    def __init__(self):
+        self.totals = {name: 0.0 for name in STAGES}
+        self.__stack = []  # type: list
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            self.__stack.append(0.0)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.totals[name] += elapsed - self.__stack.pop()
+                if self.__stack:
+                    self.__stack[-1] += elapsed
+        return timed
+
+    def reset(self):
+        for name in self.totals:
+            self.totals[name] = 0.0
+
+
+def instrument(main, stages):
+    from slackbuild.build_event import BuildEvent
+    from slackbuild.cloudbuild import CloudBuild
+    from slackbuild.slack import Slack
+
+    main.slack = Slack(main.config, client=FakeSlackClient())
+    main.cloudbuild = CloudBuild(factory=lambda http: FakeCloudBuildApi(), http_factory=object)
+
+    main.slack.verify_webhook = stages.wrap('verify', main.slack.verify_webhook)
+    main.slack.render_message = stages.wrap('render', main.slack.render_message)
+    main.slack.post_message = stages.wrap('post', main.slack.post_message)
+    main.Slack.parse_request = staticmethod(stages.wrap('parse', Slack.parse_request))
+    main.Command.run = staticmethod(stages.wrap('command', main.Command.run))
+    main.BuildStatus.toMessage = staticmethod(stages.wrap('variables', main.BuildStatus.toMessage))
+    # the Build resource is decoded lazily, by an ingestion rule or by toMessage
+    BuildEvent._BuildEvent__decode = stages.wrap('decode', BuildEvent._BuildEvent__decode)
+
+
+def webhook_scenarios():
+    """ returns scenario name -> list of requests, each request is signed with its own timestamp
+    since replayed signatures are rejected """
+    def load(name):
+        with open(os.path.join(ROOT, 'mocks', 'webhook', name)) as f:
+            return json.load(f)
+
+    form = load('form.json')
+    build_id = '2a4ad330-22d3-489e-b0fa-5731e17113b4'
+    return {
+        'webhook help': dict(form, text='help'),
+        'webhook retry': form,
+        'webhook cancel': dict(form, text='cancel %s' % build_id),
+        'webhook status': dict(form, text='status %s' % build_id),
+        'webhook list': dict(form, text='list'),
+        'webhook interactive cancel': load('interactive_message.json'),
+        'webhook bad signature': dict(form, text='help', bad_signature=True)
+    }
+
+
+def signed_requests(body, count):
+    from werkzeug.datastructures import Headers
+
+    bad = body.pop('bad_signature', False)
+    raw = urlencode(body).encode('utf-8')
+
+    class Request:
+        method = 'POST'
+        content_length = len(raw)
+
+        def __init__(self, headers):
+            self.headers = headers
+
+        def get_data(self, as_text=True, **kwargs):
+            return raw.decode('utf-8') if as_text else raw
+
+    # one clock reading, so every request gets its own timestamp and signature
+    now = int(time.time())
+    requests = []
+    for i in range(count):
+        ts = str(now - i)
+        sig = hmac.new(SECRET.encode('utf-8'), b'v0:' + ts.encode('utf-8') + b':' + raw, hashlib.sha256).hexdigest()
+        if bad:
+            sig = '%064x' % i
+        requests.append(Request(Headers({'X-Slack-Request-Timestamp': ts, 'X-Slack-Signature': 'v0=' + sig})))
+    return requests
+
+
+def pubsub_scenarios():
+    """ returns scenario name -> list of pubsub messages replayed in turn """
+    def load(name):
+        with open(os.path.join(ROOT, 'mocks', 'pubsub', name)) as f:
+            return json.load(f)
+
+    def variant(data, status=None, **fields):
+        data = copy.deepcopy(data)
+        build = json.loads(base64.b64decode(data['data']))
+        build.update(fields)
+        if status is not None:
+            build['status'] = data['attributes']['status'] = status
+        data['data'] = base64.b64encode(json.dumps(build).encode('utf-8')).decode('utf-8')
+        return data
+
+    triggered = load('success_triggered.json')
+    build = json.loads(base64.b64decode(triggered['data']))
+    step = build['steps'][0]
+    timings = [{'startTime': '2019-01-20T21:09:30.568278630Z', 'endTime': '2019-01-20T21:%02d:%02d.0Z' % (10 + i // 60 % 40, i % 60)} for i in range(500)]
+    steps = [dict(step, id='step-%d' % i, timing=timing) for i, timing in enumerate(timings)]
+
+    return {
+        'pubsub success triggered': [triggered],
+        'pubsub success manual': [load('success_manual.json')],
+        'pubsub working manual': [load('working_manual.json')],
+        'pubsub every status': [variant(triggered, status) for status in STATUSES],
+        'pubsub 500 steps': [variant(triggered, steps=steps)],
+        'pubsub large payload': [variant(triggered, substitutions=dict(build.get('substitutions', {}), _BLOB='x' * 512 * 1024))],
+        'pubsub oversized': [variant(triggered, substitutions={'_BLOB': 'x' * 2 * 1024 * 1024})]
+    }
+
+
+def calls(main, count):
+    """ returns scenario name -> function making the i-th of count calls """
+    from werkzeug.exceptions import HTTPException
+
+    def webhook(req, rejected):
+        # flask turns the exception raised by abort() into the error response
+        try:
+            return main.slackbuild_webhook(req)
+        except HTTPException as e:
+            if not rejected:
+                raise
+            return e
+
+    scenarios = {}
+    for name, body in webhook_scenarios().items():
+        # a request for each call, a signature is only accepted once
+        rejected = body.get('bad_signature', False)
+        requests = signed_requests(body, count)
+        scenarios[name] = (lambda requests, rejected: lambda i: webhook(requests[i], rejected))(requests, rejected)
+    for name, messages in pubsub_scenarios().items():
+        scenarios[name] = (lambda messages: lambda i: main.slackbuild_pubsub(messages[i % len(messages)], {}))(messages)
+    return scenarios
+
+
+@contextlib.contextmanager
+def quiet():
+    # the entrypoints print every message, keeping the output would grow the memory peak
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(fn, iterations, repeat, offset, stages):
+    """ returns us per call and us per call of each stage, from the median of repeat runs """
+    runs = []
+    for r in range(repeat):
+        stages.reset()
+        with quiet():
+            # like timeit, a collection in the middle of a run would only add noise
+            gc.disable()
+            start = time.perf_counter()
+            for i in range(offset + r * iterations, offset + (r + 1) * iterations):
+                fn(i)
+            elapsed = time.perf_counter() - start
+            gc.enable()
+        runs.append((elapsed, dict(stages.totals)))
+
+    # one slow run, or one lucky one, does not move the median
+    median = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    return median[0] / iterations * 1e6, {name: total / iterations * 1e6 for name, total in median[1].items()}
+
+
+def peak_memory(fn, iterations, offset):
+    tracemalloc.start()
+    with quiet():
+        for i in range(iterations):
+            fn(offset + i)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='end to end benchmark of the slackbuild entrypoints')
+    parser.add_argument('--iterations', type=int, default=200, help='calls per run of a scenario')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each scenario, the median is kept')
+    parser.add_argument('--threshold', type=float, default=50.0, help='percent slower than the baseline that fails the run')
+    parser.add_argument('--fast-threshold', type=float, default=100.0, help='the same for scenarios under %.0f us/op' % FAST_US)
+    parser.add_argument('--baseline', default=BASELINE, help='json file of us/op per scenario')
+    parser.add_argument('--update', action='store_true', help='record the results as the new baseline')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        with open(os.path.join(workdir, 'config.yaml'), 'w') as f:
+            json.dump({
+                'slack': {
+                    'channel': '#test',
+                    'token': 'xoxb-test',
+                    'signing_secret': SECRET,
+                    # requests are signed ahead of time, each with another timestamp
+                    'webhook': {'max_request_age': 0},
+                    # every call is posted, the fake client has no rate limit
+                    'delivery': {'rate': 1e9, 'burst': 1e9}
+                },
+                'pubsub': {
+                    # the same messages are replayed, none of them is a duplicate here
+                    'state': {'enabled': False}
+                },
+                'gcloud': {'project_id': 'my-project', 'list_cache_ttl': 0}
+            }, f)
+        os.chdir(workdir)
+
+        import main as entrypoints
+        stages = Stages()
+        instrument(entrypoints, stages)
+
+        memory_iterations = min(args.iterations, 20)
+        scenarios = calls(entrypoints, 1 + args.repeat * args.iterations + memory_iterations)
+        results = {}
+        print('%-28s %10s %10s %10s  %s' % ('scenario', 'us/op', 'ops/sec', 'peak KiB', ' '.join('%9s' % s for s in STAGES)))
+        for name, fn in scenarios.items():
+            # warm up caches and lazy imports, as in a warm function instance
+            with quiet():
+                fn(0)
+            us, per_stage = measure(fn, args.iterations, args.repeat, 1, stages)
+            peak = peak_memory(fn, memory_iterations, 1 + args.repeat * args.iterations)
+            results[name] = round(us, 2)
+            print('%-28s %10.1f %10.0f %10.1f  %s' % (name, us, 1e6 / us, peak, ' '.join('%9.1f' % per_stage[s] for s in STAGES)))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+    if args.update or not os.path.exists(args.baseline):
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Wrote baseline %s' % args.baseline)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, us in sorted(results.items()):
+        expected = baseline.get(name, None)
+        if expected is None:
+            continue
+        threshold = args.fast_threshold if expected < FAST_US else args.threshold
+        if us > expected * (1 + threshold / 100.0):
+            regressions.append('%s : %.1f us/op, baseline %.1f us/op (+%.0f%%, limit %.0f%%)' % (name, us, expected, (us / expected - 1) * 100, threshold))
+
+    if regressions != []:
+        print('Slower than the baseline :\n  %s' % '\n  '.join(regressions))
+        return 1
+    print('No scenario is slower than the baseline by more than %.0f%%, %.0f%% under %.0f us/op' % (args.threshold, args.fast_threshold, FAST_US))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
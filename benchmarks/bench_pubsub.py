@@ -0,0 +1,85 @@
+import base64
+import copy
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.build_event import BuildEvent  # noqa
+
+"""
+   Compares reading the fields of a pubsub message used by BuildStatus.toMessage after decoding
+   the whole Build resource and parsing timestamps with dateutil, as it used to, with the lazily
+   decoded BuildEvent, on the mocks/pubsub fixtures and a synthetic 500 step build
+
+   usage: python benchmarks/bench_pubsub.py [iterations]
+"""
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def legacy(data):
+    from dateutil import parser
+
+    build = data.get("data", None)
+    build = json.loads(base64.b64decode(build).decode("utf-8")) if build is not None else {}
+    return read(build, parser.parse)
+
+
+def current(data):
+    return read(BuildEvent(data), BuildEvent.parse_time)
+
+
+def read(build, parse_time):
+    """ reads every field BuildStatus.toMessage uses, the work that differs between the two decoders """
+    fields = [build.get(field, None) for field in BuildEvent.FIELDS if field != 'steps']
+    fields.append([step.get('timing', None) for step in build.get('steps', None) or []])
+
+    start = build.get('startTime', None)
+    end = build.get('finishTime', None)
+    if start is not None and end is not None:
+        fields.append((parse_time(end) - parse_time(start)).seconds)
+    return fields
+
+
+def fixture(name):
+    with open(os.path.join(ROOT, 'mocks', 'pubsub', name)) as f:
+        return json.load(f)
+
+
+def synthetic(steps=500):
+    """ success_triggered.json with `steps` build steps, each with args, env and timings """
+    data = fixture('success_triggered.json')
+    build = json.loads(base64.b64decode(data['data']))
+    step = build['steps'][0]
+
+    build['steps'] = []
+    for i in range(steps):
+        s = copy.deepcopy(step)
+        s['id'] = 'step-%d' % i
+        s['args'] = ['-c', 'make test TARGET=//services/%d/... --jobs=8 --verbose' % i] * 4
+        s['env'] = ['STEP=%d' % i, 'CI=true', 'PROJECT_ID=my-project']
+        build['steps'].append(s)
+    build['results']['buildStepImages'] = build['results']['buildStepImages'] * steps
+
+    data['data'] = base64.b64encode(json.dumps(build).encode('utf-8')).decode('utf-8')
+    return data
+
+
+def main():
+    cases = [(name, fixture(name)) for name in ('working_manual.json', 'success_manual.json', 'success_triggered.json')]
+    cases.append(('synthetic 500 steps', synthetic()))
+
+    for name, data in cases:
+        assert legacy(data) == current(data), name
+
+        print('%s (%d bytes)' % (name, len(data.get('data', ''))))
+        for label, fn in (('decode all + dateutil', legacy), ('BuildEvent', current)):
+            seconds = min(timeit.repeat(lambda: fn(data), number=iterations, repeat=3))
+            print('  %-24s %8.2f us/message' % (label, seconds / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
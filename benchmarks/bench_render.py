@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import timeit
+from string import Template
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.json_template import JsonTemplate  # noqa
+
+"""
+   Compares the per render cost of the string substitution + json.loads renderer
+   with the pre-parsed JsonTemplate renderer
+
+   usage: python benchmarks/bench_render.py [template file] [iterations]
+"""
+
+template = sys.argv[1] if len(sys.argv) > 1 else 'working.json'
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+variables = {
+    "build_color": "#00c752",
+    "build_id": "12345678-9012345-123425",
+    "build_id_short": "12345678",
+    "build_log_url": "http://google.com",
+    "build_status": "Success",
+    "build_duration": "3 seconds",
+
+    "repo_name": "testrepo",
+    "revision": "ab12cd34ef560a123",
+    "revision_sha_short": "ab12cd34",
+    "revision_url": "github.com/you/testrepo/commits/ab12cd34ef560a123",
+
+    "project_id": "my-project"
+}
+
+with open(os.path.join(os.path.dirname(__file__), '..', 'templates', template)) as f:
+    contents = f.read()
+
+string_template = Template(contents)
+json_template = JsonTemplate(contents)
+
+
+def legacy():
+    return json.loads(string_template.safe_substitute(variables, channel='#test'))
+
+
+def tree():
+    return json_template.render(variables, channel='#test')
+
+
+assert legacy() == tree()
+
+for name, fn in (('string.Template + json.loads', legacy), ('JsonTemplate', tree)):
+    seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+    print('%-30s %8.2f us/render' % (name, seconds / iterations * 1e6))
@@ -0,0 +1,77 @@
+import fnmatch
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.routing import Router  # noqa
+
+"""
+   Measures the per build cost of picking channels from slack.routes with thousands of routes,
+   and compares the compiled Router with checking every route in order
+
+   usage: python benchmarks/bench_routing.py [routes] [iterations]
+"""
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+random.seed(1)
+routes = []
+for i in range(count):
+    route = {'repo': 'repo-%d' % i, 'channels': ['#team-%d' % (i % 50)]}
+    if i % 3 == 0:
+        route['branch'] = ['master', 'release/*']
+    if i % 5 == 0:
+        route['status'] = ['FAILURE', 'TIMEOUT']
+    routes.append(route)
+# a few routes apply to every repo
+routes.append({'branch': '/hotfix-[0-9]+/', 'channels': ['#hotfixes']})
+routes.append({'status': ['INTERNAL_ERROR'], 'channels': ['#oncall']})
+
+config = {'slack': {'channel': '#builds', 'routes': routes}}
+
+start = timeit.default_timer()
+router = Router(config)
+print('%-30s %8.2f ms for %d routes' % ('compile', (timeit.default_timer() - start) * 1e3, len(router)))
+
+builds = [({'repo_name': 'repo-%d' % random.randrange(count * 2), 'branch_name': random.choice(['master', 'release/1.2', 'feature', 'hotfix-12'])},
+           random.choice(['SUCCESS', 'FAILURE', 'WORKING'])) for _ in range(1000)]
+
+
+def naive_matches(route, variables, status):
+    if 'repo' in route and variables['repo_name'] != route['repo']:
+        return False
+    if 'status' in route and status not in route['status']:
+        return False
+    if 'branch' in route:
+        branches = route['branch'] if isinstance(route['branch'], list) else [route['branch']]
+        if not any(re.match(b[1:-1], variables['branch_name']) if b.startswith('/') else fnmatch.fnmatchcase(variables['branch_name'], b) for b in branches):
+            return False
+    return True
+
+
+def naive(variables, status):
+    channels = [c for route in routes if naive_matches(route, variables, status) for c in route['channels']]
+    return sorted(set(channels)) if channels != [] else ['#builds']
+
+
+for variables, status in builds[:200]:
+    assert sorted(router.route(variables, status)[0]) == naive(variables, status)
+
+i = [0]
+
+
+def compiled():
+    i[0] += 1
+    variables, status = builds[i[0] % len(builds)]
+    return router.route(variables, status)
+
+
+seconds = min(timeit.repeat(compiled, number=iterations, repeat=3))
+print('%-30s %8.2f us/build' % ('Router', seconds / iterations * 1e6))
+
+seconds = min(timeit.repeat(lambda: naive(*builds[0]), number=50, repeat=3))
+print('%-30s %8.2f us/build' % ('every route in order', seconds / 50 * 1e6))
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from benchmarks.fake_slack import FakeSlack  # noqa
+from slackbuild.transport import WebApiTransport  # noqa
+from slackbuild.transport import WebhookTransport  # noqa
+
+"""
+   Compares chat.postMessage latency of slackclient.SlackClient, which opens a new
+   connection per call, with the pooled transport and the incoming webhook transport
+   against a local fake Slack server
+
+   usage: python benchmarks/bench_transport.py [iterations]
+"""
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+msg = {
+    "channel": "#test",
+    "attachments": [
+        {
+            "text": "*testrepo*  <github.com/you/testrepo/commits/ab12cd34|ab12cd34>\nSuccess | <http://google.com|Logs>",
+            "color": "#00c752",
+            "footer": "ID: 12345678 3 seconds"
+        }
+    ]
+}
+
+
+def measure(client):
+    client.api_call('chat.postMessage', **msg)  # warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        client.api_call('chat.postMessage', **msg)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+with FakeSlack() as slack:
+    clients = []
+
+    try:
+        import requests
+        from slackclient import SlackClient
+        from slackclient import slackrequest
+
+        # SlackClient always posts to https://slack.com, send it to the fake server instead
+        class LocalRequests:
+            @staticmethod
+            def post(url, **kwargs):
+                return requests.post(url.replace('https://slack.com/', slack.url), **kwargs)
+
+        slackrequest.requests = LocalRequests  # type: ignore
+        clients.append(('slackclient.SlackClient', SlackClient('xoxb-test')))
+    except ImportError:
+        print('slackclient not installed, skipping')
+
+    pooled = WebApiTransport('xoxb-test', base_url=slack.url + 'api/')
+    clients.append(('WebApiTransport (pooled)', pooled))
+    clients.append(('WebhookTransport', WebhookTransport(slack.url + 'hook', pooled)))
+
+    for name, client in clients:
+        p50, p99 = measure(client)
+        print('%-26s p50 %7.3f ms  p99 %7.3f ms' % (name, p50 * 1e3, p99 * 1e3))
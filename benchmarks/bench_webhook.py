@@ -0,0 +1,87 @@
+import hmac
+import io
+import json
+import os
+import sys
+import timeit
+from urllib.parse import urlencode
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.webhook_request import WebhookRequest  # noqa
+
+"""
+   Compares verifying and parsing a slack webhook the way slackbuild_webhook used to, a text
+   read, string concatenation and werkzeug form parsing, with the single read WebhookRequest,
+   for valid, badly signed and oversized requests built from the mocks/webhook fixtures
+
+   usage: python benchmarks/bench_webhook.py [iterations]
+"""
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+SECRET = '8f742231b10e8888abcd99yyyzzz85a5'
+MAX_CONTENT_LENGTH = 50000
+TS = '1531420618'
+
+
+def legacy(req):
+    if req.content_length > MAX_CONTENT_LENGTH or req.content_length <= 0:
+        return None
+
+    body = req.get_data(as_text=True)
+    base = 'v0:' + req.headers.get('X-Slack-Request-Timestamp', '') + ':' + body
+    sig = 'v0=' + hmac.new(bytes(SECRET, 'utf-8'), bytes(base, 'utf-8'), 'sha256').hexdigest()
+    if not hmac.compare_digest(sig, req.headers.get('X-Slack-Signature', '')):
+        return None
+
+    data = req.form.to_dict()
+    payload = data.get('payload', '')
+    if payload != '':
+        data = json.loads(payload)
+    return data
+
+
+def envelope(req):
+    req = WebhookRequest(req)
+    if not req.verify(bytes(SECRET, 'utf-8'), MAX_CONTENT_LENGTH)[0]:
+        return None
+    return req.body()
+
+
+def requests_for(fixture):
+    from werkzeug.test import EnvironBuilder
+    from werkzeug.wrappers import Request
+
+    with open(os.path.join(ROOT, 'mocks', 'webhook', fixture)) as f:
+        body = urlencode(json.load(f)).encode('utf-8')
+    sig = 'v0=' + hmac.new(bytes(SECRET, 'utf-8'), b'v0:' + TS.encode('utf-8') + b':' + body, 'sha256').hexdigest()
+
+    def build(signature, extra=b''):
+        data = body + extra
+        environ = EnvironBuilder(method='POST', data=data, content_type='application/x-www-form-urlencoded',
+                                 headers={'X-Slack-Request-Timestamp': TS, 'X-Slack-Signature': signature}).get_environ()
+        # a fresh request each time, the body of a request can only be read once
+        return lambda: Request(dict(environ, **{'wsgi.input': io.BytesIO(data)}))
+
+    return {
+        'valid': build(sig),
+        'bad signature': build('v0=' + '0' * 64),
+        'oversized': build(sig, b'&padding=' + b'x' * MAX_CONTENT_LENGTH)
+    }
+
+
+def main():
+    for fixture in ('form.json', 'interactive_message.json'):
+        for case, new_request in requests_for(fixture).items():
+            assert legacy(new_request()) == envelope(new_request())
+
+            print('%s, %s' % (fixture, case))
+            for name, fn in (('legacy', legacy), ('WebhookRequest', envelope)):
+                seconds = min(timeit.repeat(lambda: fn(new_request()), number=iterations, repeat=3))
+                baseline = min(timeit.repeat(new_request, number=iterations, repeat=3))
+                print('  %-20s %8.2f us/request' % (name, (seconds - baseline) / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+
+"""
+   Local stand in for the Slack Web API and incoming webhooks, answers every
+   POST /api/<method> with a successful json response and every other POST with "ok"
+"""
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    """ http.server.ThreadingHTTPServer, which python 3.6 does not have """
+
+    daemon_threads = True
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # headers and body are written separately, avoid nagle delaying keep-alive responses
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.startswith('/api/'):
+            body = b'{"ok": true, "channel": "C123", "ts": "1549843673.001900"}'
+            content_type = 'application/json'
+        else:
+            body = b'ok'
+            content_type = 'text/html'
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSlack:
+
+    def __init__(self):
+        self.server = FakeServer(('127.0.0.1', 0), FakeSlackHandler)
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
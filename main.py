@@ -1,23 +1,177 @@
+import functools
 import json
-from apiclient.discovery import build
-from flask import Response
-from flask import Request
-from flask import abort
+from slackbuild.build_event import BuildEvent
+from slackbuild.build_index import BuildIndex
+from slackbuild.build_state import BuildState
 from slackbuild.build_status import BuildStatus
-from slackbuild.colors import Colors
+from slackbuild.cloudbuild import CloudBuild
+from slackbuild.coalesce import Coalescer
 from slackbuild.command import Command
 from slackbuild.config import Config
+from slackbuild.deferred import Deferred
+from slackbuild.digest import Digest
+from slackbuild.duration_history import DurationHistory
+from slackbuild.ingest import IngestRules
 from slackbuild.slack import Slack
+from slackbuild.transitions import Transitions
+from slackbuild.webhook_request import WebhookRequest
 
 # create these as globals for reuse across non "cold starts"
 config = Config()
-slack = Slack(config)
-# https://googleapis.github.io/google-api-python-client/docs/epy/googleapiclient-module.html
-# https://developers.google.com/apis-explorer/#p/cloudbuild/v1/
-cloudbuild = build('cloudbuild', 'v1')
+slack = None
+coalescer = None
+rules = None
+states = None
+history = None
+transitions = None
+digest = None
+cloudbuild = None
+index = None
+deferred = None
 
+# settings each global is built from, it is only built again when config_reload notices one of them changed
+DEPENDS = {
+    'slack': ('slack',),
+    'coalescer': ('pubsub.coalesce',),
+    'rules': ('pubsub.rules', 'gcloud.triggers'),
+    'states': ('pubsub.state',),
+    'history': ('pubsub.duration_history',),
+    'transitions': ('pubsub.transitions',),
+    'digest': ('slack.digest',),
+    'cloudbuild': ('gcloud.max_retries',),
+    'index': ('build_index',),
+    # holds slack and index
+    'deferred': ('slack', 'build_index'),
+    # the trigger pool and the /builds list cache of Command
+    'command': ('gcloud',)
+}
+# name -> the settings it was last built from
+built = {}  # type: dict
 
-def slackbuild_webhook(req: Request):
+
+def settings_of(name):
+    return json.dumps([config.value(path, None) for path in DEPENDS[name]], sort_keys=True, default=str)
+
+
+def changed(name):
+    """ returns true when name was never built or its settings changed since it was last built """
+    return built.get(name, None) != settings_of(name)
+
+
+def record(name):
+    """ records the settings name was built from, only once it was built so a failed build is tried again """
+    built[name] = settings_of(name)
+
+
+def setup():
+    """ builds everything that depends on config, then again what depends on the settings that
+    changed when config_reload notices a change. Replaced objects are shut down and keep the state
+    they share with their replacement, such as the replay cache and buffered digest builds """
+    global slack
+    global coalescer
+    global rules
+    global states
+    global history
+    global transitions
+    global digest
+    global cloudbuild
+    global index
+    global deferred
+
+    replaced = []
+    try:
+        if changed('slack'):
+            fresh = Slack(config, previous=slack)
+            replaced.append(slack)
+            slack = fresh
+            record('slack')
+        if changed('coalescer'):
+            coalescer = Coalescer(config)
+            record('coalescer')
+        if changed('rules'):
+            rules = IngestRules(config)
+            record('rules')
+        if changed('states'):
+            states = BuildState(config)
+            record('states')
+        if changed('history'):
+            history = DurationHistory(config)
+            record('history')
+        if changed('transitions'):
+            transitions = Transitions(config)
+            record('transitions')
+        if changed('digest'):
+            # builds summarized in one message per interval, see slack.digest
+            digest = Digest(config, previous=digest)
+            record('digest')
+        if changed('cloudbuild'):
+            # the api client is only created on first use, slackbuild_pubsub never needs it
+            cloudbuild = CloudBuild(max_retries=config.value('gcloud.max_retries', 2))
+            record('cloudbuild')
+        if changed('index'):
+            # recent builds seen by slackbuild_pubsub, lets commands take short build ids
+            index = BuildIndex(config)
+            record('index')
+        if changed('deferred'):
+            fresh = Deferred(config, slack, index=index)
+            replaced.append(deferred)
+            deferred = fresh
+            record('deferred')
+        if changed('command'):
+            Command.reset()
+            record('command')
+    finally:
+        # objects replaced before a later build failed are shut down too
+        for previous in replaced:
+            if previous is not None:
+                previous.close()
+
+
+setup()
+
+
+def stats():
+    """ returns the counters of every component, keyed by component """
+    return {
+        'ingest': rules.stats(),
+        'templates': slack.template_stats(),
+        'delivery': slack.delivery_stats(),
+        'webhook': slack.webhook_stats(),
+        'states': states.stats(),
+        'transitions': transitions.stats(),
+        'digest': digest.stats(),
+        'deferred': deferred.stats(),
+        'cloudbuild': cloudbuild.stats()
+    }
+
+
+def logs_stats(entrypoint):
+    """ prints stats() as one json line after each invocation of an entrypoint, unless log_stats is false """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def invoke(*args):
+            try:
+                return handler(*args)
+            finally:
+                if config.value('log_stats', True):
+                    print(json.dumps({'stats': entrypoint, 'counters': stats()}, sort_keys=True))
+        return invoke
+    return decorator
+
+
+def post_digest(summary):
+    """ posts a digest, its builds stay buffered for the next digest when posting fails """
+    if summary is None:
+        return False
+
+    posted = slack.post_message(slack.render_message(summary, digest.template, channel=digest.channel))
+    if posted:
+        digest.posted(summary)
+    return posted
+
+
+@logs_stats('webhook')
+def slackbuild_webhook(req):
     """ Slackbuild entrypoint when invoked via a slack webhook
 
     Parameters:
@@ -30,11 +184,23 @@ def slackbuild_webhook(req: Request):
     global config
     global slack
     global cloudbuild
+    global deferred
+    global index
+
+    # deferred, slackbuild_pubsub does not need flask
+    from flask import Response
+    from flask import abort
+
+    if config.reload():
+        setup()
 
     # slack submits a POST
     if req.method != "POST":
         return abort(405)
 
+    # the body is read once for verification and parsing, and only parsed once verified
+    req = WebhookRequest(req)
+
     # not a true request from slack
     verified, err = slack.verify_webhook(req)
     if not verified:
@@ -43,27 +209,28 @@ def slackbuild_webhook(req: Request):
 
     body = Slack.parse_request(req)
     argv = Slack.parse_command(body)
-    msg = ""
 
-    output, success = Command.run(argv, cloudbuild, config)
+    # when enabled, api calls run in the background and the result is posted to the response_url
+    msg = deferred.handle(body, argv, cloudbuild)
 
-    if output is None:
-        if success:
-            # intentionaly not responding with a slack message
-            return ('', 200)
-        else:
-            return abort(500)
-    elif Slack.is_interactive_message(body):
-        msg = slack.render_interactive_message(body, success, output)
-    else:
-        color = Colors.SUCCESS if success else Colors.FAILURE
-        msg = slack.render_message({"result": output, "color": color}, "command.json")
+    if msg is None:
+        output, success = Command.run(argv, cloudbuild, config, index)
+
+        if output is None:
+            if success:
+                # intentionaly not responding with a slack message
+                return ('', 200)
+            else:
+                return abort(500)
+
+        msg = slack.render_command_result(body, success, output)
 
     msg = json.dumps(msg)
     print(msg)
     return Response(response=msg, content_type="application/json")
 
 
+@logs_stats('pubsub')
 def slackbuild_pubsub(data, context):
     """ Slackbuild entrypoint when invoked via a cloudbuild pubsub message
 
@@ -76,12 +243,75 @@ def slackbuild_pubsub(data, context):
     """
     global config
     global slack
+    global coalescer
+    global rules
+    global states
+    global history
+    global transitions
+    global digest
+    global index
 
     print(data)
     print(context)
 
-    build, template = BuildStatus.toMessage(data, config)
+    if config.reload():
+        setup()
+
+    # functions have no timers, a digest waiting for its interval is posted by the next event
+    post_digest(digest.poll())
+
+    # decoded only once a rule or the message needs more than the status
+    event = BuildEvent(data, max_size=config.value('pubsub.max_payload_size', BuildEvent.MAX_SIZE))
+
+    accepted, rule = rules.accept(event)
+    if not accepted:
+        print("Dropped event by pubsub rule %s" % rule)
+        return False
+
+    # pubsub redelivers messages and does not keep them in order
+    accepted, reason = states.advance(event.build_id, event.status)
+    if not accepted:
+        print(reason)
+        return False
+
+    # the previous event of this build was notified moments ago
+    if not coalescer.offer(data):
+        print("Dropped %s event within pubsub.coalesce.window of the previous one" % event.status)
+        return False
+
+    build, template = BuildStatus.toMessage(event, config)
+    index.record(build, event.status)
+    build = history.annotate(build, event.status)
+
+    # only the builds that changed outcome when pubsub.transitions is enabled
+    notify, build = transitions.check(build, event.status)
+    if not notify:
+        if event.status in Transitions.OUTCOMES:
+            print("Suppressed %s, %s finished builds in a row with this status" % (event.status, build['streak_length']))
+        else:
+            print("Suppressed %s, not an outcome of pubsub.transitions" % event.status)
+        return False
+
+    # digests mix builds of every route, they go to slack.digest.channel and are not routed
+    if digest.accepts(event.status):
+        summary = digest.add(build, event.status)
+        if summary is None:
+            print("Buffered %s for the next digest" % event.status)
+            return False
+        return post_digest(summary)
+
+    # slack.routes, or slack.channel when no route matches
+    channels, template = config.router().route(build, event.status, template)
+    if channels == []:
+        print("Not routed to any channel")
+        return False
 
-    msg = slack.render_message(build, template)
+    key = data.get("attributes", {}).get("buildId", None)
+    default = config.value('slack.channel', '')
 
-    return slack.post_message(msg)
+    posted = True
+    for channel in channels:
+        msg = slack.render_message(build, template, channel=channel)
+        # messages of the same build in other channels are updated separately
+        posted = slack.post_message(msg, key=key if key is None or channel == default else '%s %s' % (key, channel)) and posted
+    return posted
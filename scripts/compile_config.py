@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.config import Config  # noqa
+
+"""
+   Validates config.yaml and writes config.snapshot.json next to it, which the functions load
+   instead of parsing yaml on each cold start. Compile again after editing config.yaml, a snapshot
+   compiled from other contents is ignored
+
+   usage: python scripts/compile_config.py [config file]
+"""
+
+filename = sys.argv[1] if len(sys.argv) > 1 else './config.yaml'
+
+try:
+    path = Config.compile(filename)
+except ValueError as e:
+    print(e)
+    exit(1)
+
+print('Wrote %s' % path)
@@ -0,0 +1,28 @@
+import json
+import os
+import sys
+import urllib.request
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from slackbuild.cloudbuild import CloudBuild  # noqa
+
+"""
+   Downloads the current Cloud Build v1 discovery document into slackbuild/discovery
+
+   usage: python scripts/refresh_discovery.py
+"""
+
+URL = 'https://cloudbuild.googleapis.com/$discovery/rest?version=v1'
+
+with urllib.request.urlopen(URL) as resp:
+    document = json.load(resp)
+
+if document.get('name') != 'cloudbuild' or document.get('version') != 'v1':
+    print('Unexpected discovery document from %s' % URL)
+    exit(1)
+
+with open(CloudBuild.DISCOVERY_DOCUMENT, 'w') as f:
+    json.dump(document, f, indent=2, sort_keys=True)
+    f.write('\n')
+
+print('Wrote revision %s to %s' % (document.get('revision'), CloudBuild.DISCOVERY_DOCUMENT))
@@ -0,0 +1,108 @@
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+from datetime import timezone
+
+
+class BuildEvent:
+    """
+     A Cloud Build pubsub message. The buildId and status attributes are read right away,
+     the base64 encoded Build resource is only decoded when one of its fields is asked for,
+     and only the fields used by BuildStatus are kept once decoded, down to the id, name and
+     timing of each build step
+     See: https://cloud.google.com/cloud-build/docs/send-build-notifications
+    """
+
+    __slots__ = ('build_id', 'status', 'size', 'oversized', '__data', '__build', '__max_size')
+
+    # top level fields of the Build resource kept after decoding, results and the like are dropped
+    FIELDS = ('projectId', 'logUrl', 'buildTriggerId', 'createTime', 'startTime', 'finishTime',
+              'source', 'sourceProvenance', 'substitutions', 'timing', 'steps')
+
+    # fields of each build step kept after decoding, its args, env and volumes are dropped
+    STEP_FIELDS = ('id', 'name', 'timing')
+
+    # default largest Build resource decoded, in bytes
+    MAX_SIZE = 1048576
+
+    # Cloud Build timestamps, RFC 3339 in UTC with up to nanosecond precision
+    TIMESTAMP = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,9}))?Z$')
+
+    def __init__(self, data: dict, max_size=MAX_SIZE):
+        """
+        Parameters:
+            data     (dict) : Pubsub Message
+            max_size (int)  : largest decoded Build resource in bytes, larger ones are not decoded
+        """
+        attributes = data.get("attributes", None) or {}
+        self.build_id = attributes.get("buildId", "UNKNOWN")
+        self.status = attributes.get("status", "")
+
+        self.__data = data.get("data", None)
+        self.__build = None
+        self.__max_size = max_size
+        # size of the decoded Build resource, known without decoding it
+        self.size = len(self.__data) * 3 // 4 if self.__data else 0
+        self.oversized = self.size > max_size
+
+    def get(self, field, default=None):
+        """ returns a top level field of the Build resource, decoding it on first use
+
+        Parameters:
+            field (str) : one of BuildEvent.FIELDS
+
+        Returns:
+            the value of the field, or default when it is missing
+        """
+        if self.__build is None:
+            self.__build = self.__decode()
+        return self.__build.get(field, default)
+
+    def is_decoded(self):
+        """ returns true once the Build resource was decoded """
+        return self.__build is not None
+
+    def __decode(self):
+        if self.__data is None or self.oversized:
+            if self.oversized:
+                print("Build %s is %d bytes, larger than pubsub.max_payload_size, only using its attributes" % (self.build_id, self.size))
+            return {}
+
+        try:
+            # json.loads reads utf-8 bytes directly, without an intermediate str
+            build = json.loads(base64.b64decode(self.__data))
+        except (binascii.Error, ValueError) as err:
+            print("Invalid build in pubsub message : %s" % err)
+            return {}
+
+        if not isinstance(build, dict):
+            return {}
+        kept = {k: build[k] for k in BuildEvent.FIELDS if k in build}
+        if isinstance(kept.get('steps', None), list):
+            kept['steps'] = [{k: step[k] for k in BuildEvent.STEP_FIELDS if k in step} for step in kept['steps'] if isinstance(step, dict)]
+        return kept
+
+    @staticmethod
+    def parse_time(timestamp):
+        """ parses a Cloud Build timestamp such as 2019-01-20T21:09:20.577629622Z
+
+        Returns:
+            (datetime) : timezone aware datetime, None if timestamp is not RFC 3339
+        """
+        match = BuildEvent.TIMESTAMP.match(timestamp or '')
+        if match is None:
+            if not timestamp:
+                return None
+            # other offsets or formats, rarely seen so the slower parser is imported lazily
+            from dateutil import parser
+            try:
+                return parser.parse(timestamp)
+            except (ValueError, OverflowError):
+                return None
+
+        year, month, day, hour, minute, second, fraction = match.groups()
+        # datetime only keeps microseconds, nanoseconds are truncated
+        micros = int((fraction or '0')[:6].ljust(6, '0'))
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), micros, tzinfo=timezone.utc)
@@ -0,0 +1,90 @@
+import time
+from slackbuild.config import Config
+from slackbuild.state_store import new_store
+
+
+class BuildIndex:
+    """
+     Recent builds seen by slackbuild_pubsub, keyed by build id, so that commands can be
+     given the short build id shown in notifications instead of the full 36 character id
+     The webhook and pubsub functions are deployed separately, so the webhook only sees what
+     pubsub recorded when both run in one process or the store is shared between instances
+    """
+
+    # shortest prefix looked up, shorter ones match too many builds to be useful
+    MIN_PREFIX = 4
+    # most matches listed when a prefix is ambiguous
+    MAX_MATCHES = 5
+
+    # order of the fields stored for each build
+    FIELDS = ('status', 'repo_name', 'revision', 'trigger_id', 'created', 'updated')
+
+    def __init__(self, config: Config, store=None, clock=time.time):
+        conf = config.get('build_index', {})
+        self.__enabled = store is not None or conf.get('enabled', False)
+        self.__clock = clock
+
+        if store is None and self.__enabled:
+            store = new_store(dict({'ttl': 7 * 86400}, **conf.get('store', {})), table='build_index')
+        self.__store = store
+
+    def is_enabled(self):
+        return self.__enabled
+
+    def record(self, variables, status):
+        """ remembers a build from the variables of BuildStatus.toMessage
+
+        Parameters:
+            variables (dict) : template variables of a pubsub message
+            status    (str)  : build status from the message attributes
+        """
+        build_id = variables.get('build_id', 'UNKNOWN')
+        if not self.__enabled or build_id == 'UNKNOWN':
+            return
+
+        # a list rather than a dict keeps each entry small
+        self.__store.set(build_id, [
+            status,
+            variables.get('repo_name', ''),
+            variables.get('revision', ''),
+            variables.get('build_trigger_id', ''),
+            variables.get('build_create_time', ''),
+            self.__clock()
+        ])
+
+    def get(self, build_id):
+        """ returns the recorded fields of a build as a dict, None if it was not seen """
+        if not self.__enabled:
+            return None
+
+        entry = self.__store.get(build_id)
+        if entry is None:
+            return None
+        return dict(zip(BuildIndex.FIELDS, entry))
+
+    def resolve(self, prefix):
+        """ finds the full id of the build starting with prefix
+
+        Parameters:
+            prefix (str) : beginning of a build id, such as ${build_id_short}
+
+        Returns:
+            (str, str) : the full build id or None, and an error message when the prefix
+                         matches more than one build
+        """
+        if not self.__enabled or len(prefix) < BuildIndex.MIN_PREFIX:
+            return None, None
+
+        matches = [key for key, _ in self.__store.scan(prefix.lower(), limit=BuildIndex.MAX_MATCHES + 1)]
+
+        if len(matches) == 1:
+            return matches[0], None
+        elif len(matches) > 1:
+            shown = ", ".join(sorted(matches)[:BuildIndex.MAX_MATCHES])
+            more = " and more" if len(matches) > BuildIndex.MAX_MATCHES else ""
+            return None, "Build ID %s is ambiguous, it matches %s%s" % (prefix, shown, more)
+
+        if len(self.__store) == 0:
+            print("Build index is empty, %s was not resolved, pubsub events may be recorded by another instance" % prefix)
+
+        return None, None
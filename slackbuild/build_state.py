@@ -0,0 +1,79 @@
+from slackbuild.config import Config
+from slackbuild.state_store import MemoryStore
+from slackbuild.state_store import new_store
+
+
+class BuildState:
+    """
+     Remembers the last status notified for each build so that pubsub redeliveries and events
+     arriving out of order are not posted. A build only moves forward:
+     QUEUED -> WORKING -> one terminal status, anything else is rejected
+     Statuses are kept in a bounded in memory cache, and in pubsub.state.store when configured
+     so they survive the function instance being recycled
+    """
+
+    # position of each status in the life of a build, terminal statuses share the last position
+    ORDER = {
+        'STATUS_UNKNOWN': 0,
+        'QUEUED': 1,
+        'WORKING': 2,
+        'SUCCESS': 3,
+        'FAILURE': 3,
+        'INTERNAL_ERROR': 3,
+        'TIMEOUT': 3,
+        'CANCELLED': 3
+    }
+    TERMINAL = 3
+
+    def __init__(self, config: Config, store=None):
+        conf = config.get('pubsub', {}).get('state', {})
+        self.__enabled = conf.get('enabled', True)
+        ttl = conf.get('ttl', 86400)
+
+        self.__cache = MemoryStore(ttl=ttl, max_entries=conf.get('max_entries', 10000))
+        if store is None and conf.get('store', None) is not None:
+            store = new_store(dict({'ttl': ttl}, **conf.get('store')), table='build_state')
+        self.__store = store
+        self.__stats = {'accepted': 0, 'duplicate': 0, 'stale': 0}
+
+    def advance(self, build_id, status):
+        """ records a new status for a build if it moves the build forward
+
+        Parameters:
+            build_id (str) : Cloud Build id
+            status   (str) : status from the pubsub message attributes
+
+        Returns:
+            (bool, str) : true if the event should be notified, and why it should not otherwise
+        """
+        if not self.__enabled or build_id in (None, 'UNKNOWN') or status not in BuildState.ORDER:
+            return True, ''
+
+        last = self.__last(build_id)
+
+        if last == status:
+            self.__stats['duplicate'] += 1
+            return False, 'Build %s was already notified as %s' % (build_id, status)
+
+        if last is not None and (BuildState.ORDER[last] == BuildState.TERMINAL or BuildState.ORDER[status] < BuildState.ORDER[last]):
+            self.__stats['stale'] += 1
+            return False, 'Build %s is already %s, ignoring %s' % (build_id, last, status)
+
+        self.__cache.set(build_id, status)
+        if self.__store is not None:
+            self.__store.set(build_id, status)
+
+        self.__stats['accepted'] += 1
+        return True, ''
+
+    def stats(self):
+        """ returns counters of accepted, duplicate and out of order (stale) events """
+        return dict(self.__stats)
+
+    def __last(self, build_id):
+        last = self.__cache.get(build_id)
+        if last is None and self.__store is not None:
+            last = self.__store.get(build_id)
+            if last is not None:
+                self.__cache.set(build_id, last)
+        return last
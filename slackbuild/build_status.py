@@ -1,6 +1,5 @@
-import base64
-import json
-from dateutil import parser
+import heapq
+from slackbuild.build_event import BuildEvent
 from slackbuild.colors import Colors
 
 """
@@ -29,45 +28,122 @@ class BuildStatus:
         """ Generate a cloud build status and message from a pubsub message
 
         Parameters:
-            data (dict): see https://cloud.google.com/pubsub/docs/reference/rest/v1/PubsubMessage
+            data (dict or BuildEvent): see https://cloud.google.com/pubsub/docs/reference/rest/v1/PubsubMessage
 
         Returns:
             (dict, str) : dict is input args for Slack.render_message(), str is template filename is configured
         """
+        build = data
+        if not isinstance(build, BuildEvent):
+            build = BuildEvent(data, max_size=config.get('pubsub', {}).get('max_payload_size', BuildEvent.MAX_SIZE))
 
         variables = {}
 
-        variables['build_id'] = data.get("attributes", {}).get("buildId", "UNKNOWN")
+        variables['build_id'] = build.build_id
         variables['build_id_short'] = variables['build_id'].split('-')[0]
 
-        status = data.get("attributes", {}).get("status", "")
-        build = BuildStatus.__decode_data(data.get("data", None))
+        status = build.status
 
         (variables['build_status'], variables['build_color']) = BuildStatus.statuses.get(status, ('Invalid status', Colors.FAILURE))
 
         variables['project_id'] = build.get('projectId', 'unknown project id')
         variables['build_log_url'] = build.get('logUrl', '')
+        variables['build_trigger_id'] = build.get('buildTriggerId', '')
+        variables['build_create_time'] = build.get('createTime', '')
 
-        variables = BuildStatus.__add_timing(build, variables)
+        variables = BuildStatus.__add_timing(build, variables, config.get('slack', {}).get('slowest_steps', 3))
         variables = BuildStatus.__add_git_info(build, variables, config)
 
+        # set by Transitions, when pubsub.transitions is enabled
+        variables['previous_status'] = ''
+        variables['streak_length'] = ''
+        variables['build_transition'] = ''
+
         template = config.get('slack', {}).get('templates', {}).get('default', '')
         template = config.get('slack', {}).get('templates', {}).get(status.lower(), template)
 
         return variables, template
 
+    # phases of Build.timing with a template variable each, build_phase_<name in lower case>
+    PHASES = ('FETCHSOURCE', 'BUILD', 'PUSH')
+    # prefix of official builder images, removed from step names
+    BUILDER_PREFIX = 'gcr.io/cloud-builders/'
+
     @staticmethod
-    def __add_timing(build, variables):
-        start = build.get('startTime', None)
-        end = build.get('finishTime', None)
+    def source_key(variables):
+        """ identifies what a build is for, its trigger or repository when not triggered, and branch
 
-        variables['build_duration'] = ''
-        if start is not None and end is not None:
-            delta = parser.parse(end) - parser.parse(start)
-            variables['build_duration'] = str(delta.seconds) + ' seconds'
+        Parameters:
+            variables (dict) : variables from toMessage
+
+        Returns:
+            str : key shared by builds of the same trigger and branch
+        """
+        return '%s:%s' % (variables.get('build_trigger_id', '') or variables.get('repo_name', ''), variables.get('branch_name', ''))
+
+    @staticmethod
+    def __add_timing(build, variables, slowest):
+        # every variable is set, empty when unknown, so templates always render
+        duration = BuildStatus.__seconds(build.get('startTime', None), build.get('finishTime', None))
+        variables['build_duration'] = BuildStatus.__format_seconds(duration)
+        variables['build_duration_seconds'] = '' if duration is None else str(duration)
+        # compared with previous builds by DurationHistory
+        variables['build_duration_p50'] = ''
+        variables['build_duration_delta_pct'] = ''
+        variables['build_slow'] = ''
+
+        queued = BuildStatus.__seconds(build.get('createTime', None), build.get('startTime', None))
+        variables['build_queue_time'] = BuildStatus.__format_seconds(queued)
+
+        timing = build.get('timing', None) or {}
+        breakdown = ['queued %s' % BuildStatus.__short_seconds(queued)] if queued is not None else []
+        for phase in BuildStatus.PHASES:
+            span = timing.get(phase, None) or {}
+            seconds = BuildStatus.__seconds(span.get('startTime', None), span.get('endTime', None))
+            variables['build_phase_' + phase.lower()] = BuildStatus.__format_seconds(seconds)
+            if seconds is not None:
+                breakdown.append('%s %s' % (phase.lower(), BuildStatus.__short_seconds(seconds)))
+
+        steps = []
+        for i, step in enumerate(build.get('steps', None) or []):
+            span = step.get('timing', None) or {}
+            seconds = BuildStatus.__seconds(span.get('startTime', None), span.get('endTime', None))
+            if seconds is not None:
+                name = step.get('id', '') or step.get('name', '') or 'step %d' % i
+                if name.startswith(BuildStatus.BUILDER_PREFIX):
+                    name = name[len(BuildStatus.BUILDER_PREFIX):]
+                steps.append((seconds, -i, name))
+
+        slowest = ['%s (%s)' % (name, BuildStatus.__short_seconds(seconds)) for seconds, _, name in heapq.nlargest(slowest, steps)]
+        variables['build_slowest_steps'] = ', '.join(slowest)
+        if slowest != []:
+            breakdown.append('slowest: ' + ', '.join(slowest))
+        variables['build_timing'] = ' | '.join(breakdown)
 
         return variables
 
+    @staticmethod
+    def __seconds(start, end):
+        """ returns the whole seconds between two Cloud Build timestamps, None if either is missing """
+        start = BuildEvent.parse_time(start)
+        end = BuildEvent.parse_time(end)
+        if start is None or end is None:
+            return None
+        return int((end - start).total_seconds())
+
+    @staticmethod
+    def __format_seconds(seconds):
+        return '' if seconds is None else str(seconds) + ' seconds'
+
+    @staticmethod
+    def __short_seconds(seconds):
+        # 45s, 3m 05s, 1h 02m
+        if seconds < 60:
+            return '%ds' % seconds
+        if seconds < 3600:
+            return '%dm %02ds' % (seconds // 60, seconds % 60)
+        return '%dh %02dm' % (seconds // 3600, seconds % 3600 // 60)
+
     @staticmethod
     def __add_git_info(build, variables, config):
         # prefer `sourceProvenance` over `source`
@@ -82,6 +158,10 @@ class BuildStatus:
                 repoSource['branchName'] = build.get('substitutions', {}).get('_BRANCH', '')
 
         variables['repo_name'] = repoSource.get('repoName', '')
+        # the resolved source only has the sha, the branch comes from the requested source or substitutions
+        substitutions = build.get('substitutions', None) or {}
+        variables['branch_name'] = build.get('source', {}).get('repoSource', {}).get('branchName', '') or \
+            substitutions.get('BRANCH_NAME', '') or substitutions.get('_BRANCH', '')
         # prefer sha over branch as revision in case both are set
         sha = repoSource.get('commitSha', '')
         if sha is not '':
@@ -103,12 +183,3 @@ class BuildStatus:
             variables['revision_url'] = url
 
         return variables
-
-    @staticmethod
-    def __decode_data(data):
-        if data is None:
-            return {}
-
-        tmp = base64.b64decode(data).decode("utf-8")
-        tmp = json.loads(tmp)
-        return tmp
@@ -0,0 +1,157 @@
+import http.client
+import os.path
+import random
+import socket
+import threading
+import time
+
+
+class CloudBuild:
+    """
+     Cloud Build API clients, one per thread since discovery clients are not thread safe
+     Clients are only created when first used, from the discovery document bundled in
+     slackbuild/discovery instead of fetching it over the network on every cold start
+     Refresh the bundled document with `make discovery`
+    """
+
+    DISCOVERY_DOCUMENT = os.path.join(os.path.dirname(__file__), 'discovery', 'cloudbuild.v1.json')
+
+    # errors from a connection that went stale between warm invocations
+    CONNECTION_ERRORS = (ConnectionError, TimeoutError, http.client.HTTPException)
+    # connection errors raised before any byte of the request was sent
+    UNSENT_ERRORS = (ConnectionRefusedError, socket.gaierror)
+    SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+    # http statuses worth retrying for idempotent requests
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    __document = None
+
+    def __init__(self, factory=None, max_retries=2, backoff=0.5, sleep=time.sleep, http_factory=None):
+        self.__factory = factory if factory is not None else CloudBuild.new_client
+        self.__http_factory = http_factory if http_factory is not None else CloudBuild.new_http
+        self.__max_retries = max_retries
+        self.__backoff = backoff
+        self.__sleep = sleep
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__stats = {'clients': 0, 'reconnects': 0, 'retries': 0}
+
+    def __getattr__(self, name):
+        # only called for attributes of the api client, such as projects()
+        return getattr(self.client(), name)
+
+    def client(self):
+        """ returns the api client of the current thread, creating it on first use """
+        client = getattr(self.__local, 'client', None)
+        if client is None:
+            client = self.__new_client()
+        return client
+
+    def reconnect(self):
+        """ replaces the api client of the current thread, dropping its connections
+
+        Returns:
+            the new api client
+        """
+        with self.__lock:
+            self.__stats['reconnects'] += 1
+        return self.__new_client()
+
+    def http(self):
+        """ returns the authorized http object the api client of the current thread was built with """
+        self.client()
+        return self.__local.http
+
+    def execute(self, request, idempotent=False):
+        """ executes a request, reconnecting when the connection has gone stale
+
+        The connection is replaced after any connection error. Idempotent requests are retried
+        on the new connection, and with backoff on 429/5xx responses, up to max_retries times.
+        Other requests, such as triggers.run, are only retried when the error was raised before
+        the request was sent, since the API may already have started a build
+
+        Parameters:
+            request    : googleapiclient HttpRequest or BatchHttpRequest
+            idempotent (bool) : true if the request can safely be sent more than once
+
+        Returns:
+            the response of the request
+        """
+        from googleapiclient.errors import HttpError
+
+        http = None
+        attempt = 0
+
+        while True:
+            try:
+                if http is None:
+                    return request.execute()
+                return request.execute(http=http)
+            except CloudBuild.CONNECTION_ERRORS as err:
+                print("Reconnecting to cloudbuild after : %s" % repr(err))
+                self.reconnect()
+                http = self.__local.http
+                if attempt >= (self.__max_retries if idempotent else 1):
+                    raise
+                if not idempotent and not isinstance(err, CloudBuild.UNSENT_ERRORS):
+                    raise
+                # a dead connection is detected right away, only back off when retrying a live one
+                wait = attempt > 0
+            except HttpError as err:
+                if not idempotent or attempt >= self.__max_retries or err.resp.status not in CloudBuild.RETRY_STATUSES:
+                    raise
+                wait = True
+
+            attempt += 1
+            with self.__lock:
+                self.__stats['retries'] += 1
+            if wait:
+                self.__sleep(self.__backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+    def stats(self):
+        """ returns counters of created clients, reconnects and retries """
+        with self.__lock:
+            return dict(self.__stats)
+
+    def __new_client(self):
+        http = self.__http_factory()
+        client = self.__factory(http=http)
+        self.__local.http = http
+        self.__local.client = client
+        with self.__lock:
+            self.__stats['clients'] += 1
+        return client
+
+    @staticmethod
+    def new_http():
+        """ creates an http object authorized with the application default credentials
+
+        Returns:
+            (google_auth_httplib2.AuthorizedHttp) : http object with its own connections
+        """
+        import google.auth
+        import google_auth_httplib2
+        import httplib2
+
+        credentials, _ = google.auth.default(scopes=CloudBuild.SCOPES)
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+
+    @staticmethod
+    def new_client(http=None):
+        """ creates a Cloud Build API client
+        See: https://googleapis.github.io/google-api-python-client/docs/epy/googleapiclient.discovery-module.html
+
+        Parameters:
+            http (httplib2.Http) : authorized http object, defaults to application default credentials
+
+        Returns:
+            (googleapiclient.discovery.Resource) : client for https://developers.google.com/apis-explorer/#p/cloudbuild/v1/
+        """
+        # deferred, importing the google api client is a large share of cold start time
+        from googleapiclient.discovery import build_from_document
+
+        if CloudBuild.__document is None:
+            with open(CloudBuild.DISCOVERY_DOCUMENT, 'r') as f:
+                CloudBuild.__document = f.read()
+
+        return build_from_document(CloudBuild.__document, http=http)
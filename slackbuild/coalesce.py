@@ -0,0 +1,49 @@
+import time
+from slackbuild.config import Config
+from slackbuild.state_store import new_store
+
+
+class Coalescer:
+    """
+     Skips non terminal build events that arrive within a short window of the previous event
+     of the same build, so a build moving through QUEUED -> WORKING quickly only produces one
+     in progress notification. Terminal events are always notified
+     Nothing waits: each event is decided when it arrives, from the time of the previous one
+    """
+
+    TERMINAL_STATUSES = ('SUCCESS', 'FAILURE', 'INTERNAL_ERROR', 'TIMEOUT', 'CANCELLED')
+
+    def __init__(self, config: Config, store=None, clock=time.time):
+        conf = config.get('pubsub', {}).get('coalesce', {})
+        # seconds after an event of a build during which its non terminal events are skipped, 0 disables coalescing
+        self.__window = conf.get('window', 0)
+        self.__clock = clock
+
+        if store is None and self.__window > 0:
+            store = new_store(dict(conf.get('store', {}), ttl=max(60, self.__window * 10)), table='coalesce')
+        # build id -> time of its last notified event
+        self.__last = store
+
+    def offer(self, data):
+        """ decides if a pubsub message should be rendered and posted
+
+        Parameters:
+            data (dict) : Pubsub Message
+
+        Returns:
+            bool : false for a non terminal event within the window of the previous notified event of its build
+        """
+        attributes = data.get("attributes", {})
+        build_id = attributes.get("buildId", None)
+
+        if self.__window <= 0 or build_id is None:
+            return True
+
+        now = self.__clock()
+        if attributes.get("status", "") not in Coalescer.TERMINAL_STATUSES:
+            last = self.__last.get(build_id)
+            if last is not None and now - last < self.__window:
+                return False
+
+        self.__last.set(build_id, now)
+        return True
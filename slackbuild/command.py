@@ -1,13 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Optional
+from slackbuild.build_status import BuildStatus
+from slackbuild.cloudbuild import CloudBuild
 from slackbuild.config import Config
-from googleapiclient.errors import HttpError
+from slackbuild.state_store import MemoryStore
 
 
 class Command:
 
     BAD_INPUT = "Unrecognized command\nSee '/builds help' for available commands"
+    # selects every queued or running build for /builds cancel
+    ALL_WORKING = "--all-working"
+    # most requests allowed in one batch request
+    MAX_BATCH = 1000
+
+    # most builds shown by /builds list
+    MAX_LIST = 50
+    # most pages of builds.list read to match a branch, which the API cannot filter on
+    MAX_LIST_PAGES = 5
+    # most seconds a fan out waits when the webhook answers slack itself, within slack's 3 second timeout
+    SYNC_DEADLINE = 2.5
+
+    # runs triggers concurrently for /builds trigger with several aliases
+    __pool = None  # type: Optional[ThreadPoolExecutor]
+    # short lived cache of /builds list and /builds status responses
+    __cache = None  # type: Optional[MemoryStore]
 
     @staticmethod
-    def run(argv, cloudbuild, config):
+    def run(argv, cloudbuild, config, index=None):
         if argv == []:
             return Command.BAD_INPUT, False
 
@@ -17,6 +38,10 @@ class Command:
 
         project = config.get('gcloud', {}).get('project_id', '')
 
+        argv, invalid = Command._resolve_ids(cmd, argv, index)
+        if invalid is not None:
+            return invalid
+
         if cmd == 'cancel':
             resp, success = Command.cancel(argv, cloudbuild, project)
         elif cmd == 'retry':
@@ -25,20 +50,74 @@ class Command:
             resp, success = Command.help()
         elif cmd == 'trigger':
             resp, success = Command.trigger(argv, cloudbuild, project, config)
+        elif cmd == 'list':
+            resp, success = Command.list_builds(argv, cloudbuild, project, config)
+        elif cmd == 'status':
+            resp, success = Command.status(argv, cloudbuild, project, config)
         else:
             resp = Command.BAD_INPUT
             success = False
 
+        # cached list/status responses are stale once builds were started or cancelled
+        if cmd in ('cancel', 'retry', 'trigger') and success:
+            Command.clear_cache()
+
         return resp, success
 
+    @staticmethod
+    def validate(argv, config, index=None):
+        """ checks the arguments of a command without calling the Cloud Build API
+
+        Parameters:
+            argv   (list)       : command and its arguments
+            config (dict)       : slackbuild config
+            index  (BuildIndex) : resolves short build ids, optional
+
+        Returns:
+            (str, bool) : the response and success of the command when it can be answered
+                          without the API, otherwise (None, True)
+        """
+        if argv == []:
+            return Command.BAD_INPUT, False
+
+        cmd = argv[0].lower()
+        argv = argv[1:] if len(argv) > 1 else []
+
+        project = config.get('gcloud', {}).get('project_id', '')
+
+        argv, invalid = Command._resolve_ids(cmd, argv, index)
+        if invalid is not None:
+            return invalid
+
+        if cmd == 'cancel':
+            return Command._check_build_id(argv, project, 'cancel') or (None, True)
+        elif cmd == 'retry':
+            return Command._check_build_id(argv, project, 'retry') or (None, True)
+        elif cmd == 'help':
+            return Command.help()
+        elif cmd == 'trigger':
+            return Command._check_trigger(argv, config) or (None, True)
+        elif cmd == 'list':
+            return Command._parse_list(argv, project, config)[1] or (None, True)
+        elif cmd == 'status':
+            return Command._check_build_id(argv[:1], project, 'status') or (None, True)
+
+        return Command.BAD_INPUT, False
+
     @staticmethod
     def help():
         msg = "```" + \
-              "/builds <command> [arguments]\\n" + \
-              "/builds trigger <alias> <branch>  Run a cloudbuild trigger\\n" + \
-              "/builds retry <buildId>           Retry a failed build\\n" + \
-              "/builds cancel <buildId>          Cancel a build in progress\\n" + \
-              "/builds help                      Show this message\\n" + \
+              "/builds <command> [arguments]\n" + \
+              "/builds trigger <alias>[,alias...] <branch>\n" + \
+              "                                     Run cloudbuild triggers or trigger groups\n" + \
+              "/builds retry <buildId> [buildId...]  Retry failed builds\n" + \
+              "/builds cancel <buildId> [buildId...] Cancel builds in progress\n" + \
+              "/builds cancel --all-working         Cancel every build in progress\n" + \
+              "/builds list [trigger=<alias>] [branch=<branch>] [status=<status>] [limit=<n>]\n" + \
+              "                                     List recent builds\n" + \
+              "/builds status <buildId>             Show the status of a build\n" + \
+              "                                     Recent builds can be given by their short ID\n" + \
+              "/builds help                         Show this message\n" + \
               "```"
 
         return msg, True
@@ -48,16 +127,24 @@ class Command:
         """
         See: https://cloud.google.com/cloud-build/docs/api/reference/rest/v1/projects.builds/cancel
         """
-        buildId = argv[0] if len(argv) > 0 else ""
+        if argv == [Command.ALL_WORKING] and project != "":
+            buildIds, err = Command._working_builds(cloudbuild, project)
+            if err is not None:
+                return err, False
+            if buildIds == []:
+                return "No builds in progress in %s" % project, True
+            return Command._batch(cloudbuild, project, "cancel", buildIds)
 
-        if project == "" or buildId == "":
-            return "Usage: cancel <buildId>", False
+        invalid = Command._check_build_id(argv, project, 'cancel')
+        if invalid is not None:
+            return invalid
 
-        if len(buildId) < 36:
-            return "Invalid build ID", False
+        if len(argv) > 1:
+            return Command._batch(cloudbuild, project, "cancel", argv)
+        buildId = argv[0]
 
         method = cloudbuild.projects().builds().cancel(projectId=project, id=buildId)
-        status, msg = Command._api_call(method)
+        status, msg = Command._api_call(method, cloudbuild=cloudbuild)
 
         if status == "200":
             return "cancelled build", True
@@ -72,17 +159,16 @@ class Command:
         """
         See: https://cloud.google.com/cloud-build/docs/api/reference/rest/v1/projects.builds/retry
         """
-        buildId = argv[0] if len(argv) > 0 else ""
+        invalid = Command._check_build_id(argv, project, 'retry')
+        if invalid is not None:
+            return invalid
 
-        if project == "" or buildId == "":
-            return "Usage: retry <buildId>", False
-
-        # GCB BuildID field is 36 characters
-        if len(buildId) < 36:
-            return "Invalid build ID", False
+        if len(argv) > 1:
+            return Command._batch(cloudbuild, project, "retry", argv)
+        buildId = argv[0]
 
         method = cloudbuild.projects().builds().retry(projectId=project, id=buildId)
-        status, msg = Command._api_call(method)
+        status, msg = Command._api_call(method, cloudbuild=cloudbuild)
 
         if status == "200":
             return "submitted retry request", True
@@ -97,17 +183,18 @@ class Command:
         """
         See: https://cloud.google.com/cloud-build/docs/api/reference/rest/v1/projects.triggers/run
         """
-        alias = argv[0] if len(argv) > 0 else ""
-        revision = argv[1] if len(argv) > 1 else ""
+        invalid = Command._check_trigger(argv, config)
+        if invalid is not None:
+            return invalid
+        triggers = Command._resolve_triggers(argv[0], config)[0]
+        revision = argv[1]
 
-        triggers = config.get("gcloud", {}).get("triggers", {})
-        triggerId = triggers.get(alias, None)
-
-        if triggerId is None or revision == "":
-            return "Usage: trigger <alias> <branch>", False
+        if len(triggers) > 1:
+            return Command._fan_out(triggers, revision, cloudbuild, project, config)
+        alias, triggerId = triggers[0]
 
         method = cloudbuild.projects().triggers().run(projectId=project, triggerId=triggerId, body={"branchName": revision})
-        status, msg = Command._api_call(method)
+        status, msg = Command._api_call(method, cloudbuild=cloudbuild)
 
         if status == "200":
             return "submitted trigger request", True
@@ -118,9 +205,405 @@ class Command:
         return msg, False
 
     @staticmethod
-    def _api_call(method, include_resp=False):
+    def _fan_out(triggers, revision, cloudbuild, project, config):
+        """ runs several triggers concurrently, waiting at most gcloud.command_deadline seconds, or
+        SYNC_DEADLINE seconds when slack.webhook.deferred is off and slack waits for the answer """
+        gcloud = config.get("gcloud", {})
+        deadline = gcloud.get("command_deadline", 20)
+        if not config.get("slack", {}).get("webhook", {}).get("deferred", False):
+            deadline = min(deadline, Command.SYNC_DEADLINE)
+
+        # the pool outlives the command so its threads, and their api clients, are reused
+        if Command.__pool is None:
+            Command.__pool = ThreadPoolExecutor(max_workers=gcloud.get("trigger_workers", 8), thread_name_prefix="trigger")
+
+        def run(triggerId):
+            method = cloudbuild.projects().triggers().run(projectId=project, triggerId=triggerId, body={"branchName": revision})
+            return Command._api_call(method, cloudbuild=cloudbuild)
+
+        futures = [Command.__pool.submit(run, triggerId) for _, triggerId in triggers]
+        wait(futures, timeout=deadline)
+
+        lines = []
+        submitted = 0
+        pending = 0
+        for (alias, triggerId), future in zip(triggers, futures):
+            if not future.done():
+                # the request was sent and may still start a build
+                pending += 1
+                lines.append("%s : still pending after %s seconds, check /builds list" % (alias, deadline))
+                continue
+
+            status, msg = future.result()
+            if status == "200":
+                submitted += 1
+                lines.append("%s : submitted" % alias)
+            elif status == "404":
+                lines.append("%s : no trigger found with ID %s" % (alias, triggerId))
+            else:
+                print("Unhandled status : %s - %s" % (status, msg))
+                lines.append("%s : %s" % (alias, msg))
+
+        summary = "submitted %d of %d trigger requests for %s" % (submitted, len(triggers), revision)
+        lines.append(summary if pending == 0 else "%s, %d still pending" % (summary, pending))
+        return "\n".join(lines), submitted == len(triggers)
+
+    @staticmethod
+    def _check_build_id(argv, project, cmd):
+        if project == "" or argv == []:
+            return "Usage: %s <buildId>" % cmd, False
+
+        if cmd == "cancel" and argv == [Command.ALL_WORKING]:
+            return None
+
+        if len(argv) > Command.MAX_BATCH:
+            return "At most %d builds can be %s at once" % (Command.MAX_BATCH, cmd), False
+
+        # GCB BuildID field is 36 characters
+        for buildId in argv:
+            if len(buildId) < 36:
+                return "Invalid build ID" if len(argv) == 1 else "Invalid build ID %s" % buildId, False
+
+        return None
+
+    @staticmethod
+    def _resolve_ids(cmd, argv, index):
+        """ replaces short build ids with the full ids of builds recorded in the build index
+
+        Returns:
+            (list, tuple) : the arguments, and the response to return instead when an id is ambiguous
+        """
+        if index is None or cmd not in ('cancel', 'retry', 'status'):
+            return argv, None
+
+        resolved = []
+        for buildId in argv:
+            if len(buildId) < 36 and buildId != Command.ALL_WORKING:
+                fullId, ambiguous = index.resolve(buildId)
+                if ambiguous is not None:
+                    return argv, (ambiguous, False)
+                # unknown ids are left as is and rejected by _check_build_id
+                buildId = fullId or buildId
+            resolved.append(buildId)
+
+        return resolved, None
+
+    @staticmethod
+    def _batch(cloudbuild, project, action, buildIds):
+        """ cancels or retries several builds with a single batch request
+        See: https://developers.google.com/api-client-library/python/guide/batch
+        """
+        from googleapiclient.errors import HttpError
+
+        done = "cancelled" if action == "cancel" else "submitted retry"
+        buildIds = list(dict.fromkeys(buildIds))
+        errors = {}
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+
+        batch = cloudbuild.new_batch_http_request(callback=callback)
+        builds = cloudbuild.projects().builds()
+        for buildId in buildIds:
+            batch.add(getattr(builds, action)(projectId=project, id=buildId), request_id=buildId)
+
+        try:
+            if isinstance(cloudbuild, CloudBuild):
+                cloudbuild.execute(batch)
+            else:
+                batch.execute()
+        except Exception as batch_err:
+            print("Batch %s failed : %s" % (action, batch_err))
+            return str(batch_err), False
+
+        lines = []
+        for buildId in buildIds:
+            err = errors.get(buildId, None)
+            if err is None:
+                lines.append("%s : %s" % (buildId, done))
+            elif isinstance(err, HttpError) and str(err.resp.status) == "404":
+                lines.append("%s : no build found in %s" % (buildId, project))
+            else:
+                reason = err._get_reason() if isinstance(err, HttpError) else str(err)
+                lines.append("%s : %s" % (buildId, reason))
+
+        ok = len(buildIds) - len(errors)
+        lines.append("%s %d of %d builds" % (done, ok, len(buildIds)))
+        return "\n".join(lines), len(errors) == 0
+
+    @staticmethod
+    def list_builds(argv: list, cloudbuild, project, config):
+        """
+        See: https://cloud.google.com/cloud-build/docs/api/reference/rest/v1/projects.builds/list
+        """
+        query, invalid = Command._parse_list(argv, project, config)
+        if invalid is not None:
+            return invalid
+
+        cache = Command._cache(config)
+        key = "list:%s:%s:%s:%d" % (project, query["filter"], query["branch"], query["limit"])
+        resp = cache.get(key)
+        if resp is not None:
+            return resp, True
+
+        branch = query["branch"]
+        match = None if branch == "" else lambda b: Command._branch(b) == branch
+        builds, err, truncated = Command._list_builds(cloudbuild, project, query["filter"], query["limit"], match=match,
+                                                      max_pages=Command.MAX_LIST_PAGES if match is not None else None)
+        if err is not None:
+            return err, False
+
+        if builds == []:
+            resp = "No builds found"
+        else:
+            aliases = Command._aliases(config)
+            resp = "\n".join(Command._format_build(b, aliases) for b in builds)
+        if truncated:
+            resp += "\nOnly the latest %d pages of builds were searched for branch %s, add trigger= or status= to search further back" % (Command.MAX_LIST_PAGES, branch)
+
+        cache.set(key, resp)
+        return resp, True
+
+    @staticmethod
+    def status(argv: list, cloudbuild, project, config):
+        """
+        See: https://cloud.google.com/cloud-build/docs/api/reference/rest/v1/projects.builds/get
+        """
+        invalid = Command._check_build_id(argv[:1], project, 'status')
+        if invalid is not None:
+            return invalid
+        buildId = argv[0]
+
+        cache = Command._cache(config)
+        key = "status:%s:%s" % (project, buildId)
+        resp = cache.get(key)
+        if resp is not None:
+            return resp, True
+
+        method = cloudbuild.projects().builds().get(projectId=project, id=buildId)
+        status, build = Command._api_call(method, include_resp=True, cloudbuild=cloudbuild, idempotent=True)
+
+        if status == "404":
+            return "No build found in %s with ID %s" % (project, buildId), False
+        elif status != "200":
+            print("Unhandled status : %s - %s" % (status, build))
+            return build, False
+
+        description = BuildStatus.statuses.get(build.get("status", ""), ("Invalid status", None))[0]
+        lines = [
+            "ID: %s" % build.get("id", buildId),
+            "Status: %s" % description,
+            "Trigger: %s" % Command._aliases(config).get(build.get("buildTriggerId", ""), build.get("buildTriggerId", "")),
+            "Branch: %s" % Command._branch(build),
+            "Created: %s" % Command._format_time(build.get("createTime", "")),
+            "Logs: %s" % build.get("logUrl", "")
+        ]
+        resp = "\n".join(lines)
+
+        cache.set(key, resp)
+        return resp, True
+
+    @staticmethod
+    def _parse_list(argv, project, config):
+        """ parses key=value filters of /builds list into a builds.list filter
+
+        Returns:
+            (dict, tuple) : the query, and the response to return instead when the arguments are invalid
+        """
+        usage = ("Usage: list [trigger=<alias>] [branch=<branch>] [status=<status>] [limit=<n>]", False)
+        query = {"filter": [], "branch": "", "limit": 10}
+
+        if project == "":
+            return query, usage
+
+        for arg in argv:
+            key, _, value = arg.partition("=")
+            if value == "":
+                return query, usage
+
+            if key == "trigger":
+                triggers, unknown = Command._resolve_triggers(value, config)
+                if unknown != [] or len(triggers) != 1:
+                    return query, ("Unknown trigger alias : %s" % value, False)
+                query["filter"].append('trigger_id="%s"' % triggers[0][1])
+            elif key == "status":
+                if value.upper() not in BuildStatus.statuses:
+                    return query, ("Unknown status : %s" % value, False)
+                query["filter"].append('status="%s"' % value.upper())
+            elif key == "branch":
+                query["branch"] = value
+            elif key == "limit" and value.isdigit() and 0 < int(value) <= Command.MAX_LIST:
+                query["limit"] = int(value)
+            else:
+                return query, usage
+
+        query["filter"] = " AND ".join(query["filter"])
+        return query, None
+
+    @staticmethod
+    def _list_builds(cloudbuild, project, filter, limit=None, match=None, max_pages=None):
+        """ pages through builds.list, newest first, stopping once limit builds matched
+        or max_pages pages were read
+
+        Returns:
+            (list, str, bool) : the builds, an error message if an api call failed, and true
+                                when more pages were left unread after max_pages
+        """
+        builds = cloudbuild.projects().builds()
+        # builds matched while paging may be rare, read full pages
+        pageSize = min(limit * 2, 100) if limit is not None and match is None else 100
+        request = builds.list(projectId=project, pageSize=pageSize, filter=filter)
+        found = []
+        pages = 0
+
+        while request is not None:
+            if max_pages is not None and pages >= max_pages:
+                return found, None, True
+
+            status, resp = Command._api_call(request, include_resp=True, cloudbuild=cloudbuild, idempotent=True)
+            if status != "200":
+                print("Unhandled status : %s - %s" % (status, resp))
+                return [], resp, False
+            pages += 1
+
+            for build in resp.get("builds", []):
+                if match is None or match(build):
+                    found.append(build)
+                    if limit is not None and len(found) >= limit:
+                        return found, None, False
+
+            request = builds.list_next(request, resp)
+
+        return found, None, False
+
+    @staticmethod
+    def _working_builds(cloudbuild, project):
+        """ lists the IDs of every queued or running build """
+        builds, err, _ = Command._list_builds(cloudbuild, project, 'status="WORKING" OR status="QUEUED"')
+        return [b.get("id") for b in builds], err
+
+    @staticmethod
+    def clear_cache():
+        """ drops cached /builds list and /builds status responses """
+        if Command.__cache is not None:
+            Command.__cache = None
+
+    @staticmethod
+    def reset():
+        """ drops the trigger pool and the cache, both are created again from the config on next use """
+        if Command.__pool is not None:
+            Command.__pool.shutdown(wait=False)
+            Command.__pool = None
+        Command.clear_cache()
+
+    @staticmethod
+    def _cache(config):
+        # answers repeated list/status commands without calling the api again
+        if Command.__cache is None:
+            Command.__cache = MemoryStore(ttl=config.get("gcloud", {}).get("list_cache_ttl", 30), max_entries=1000)
+        return Command.__cache
+
+    @staticmethod
+    def _aliases(config):
+        triggers = config.get("gcloud", {}).get("triggers", {})
+        return {v: k for k, v in triggers.items() if isinstance(v, str)}
+
+    @staticmethod
+    def _branch(build):
+        substitutions = build.get("substitutions", {})
+        return build.get("source", {}).get("repoSource", {}).get("branchName", "") or \
+            substitutions.get("BRANCH_NAME", "") or substitutions.get("_BRANCH", "")
+
+    @staticmethod
+    def _format_time(timestamp):
+        # 2019-01-20T21:09:20.577629622Z -> 2019-01-20 21:09
+        return timestamp[:16].replace("T", " ")
+
+    @staticmethod
+    def _format_build(build, aliases):
+        triggerId = build.get("buildTriggerId", "")
+        return "%s  %-14s %-20s %-20s %s" % (
+            build.get("id", "").split("-")[0],
+            build.get("status", ""),
+            aliases.get(triggerId, triggerId[:8] if triggerId else "manual"),
+            Command._branch(build),
+            Command._format_time(build.get("createTime", ""))
+        )
+
+    @staticmethod
+    def _check_trigger(argv, config):
+        names = argv[0] if len(argv) > 0 else ""
+        revision = argv[1] if len(argv) > 1 else ""
+
+        triggers, unknown = Command._resolve_triggers(names, config)
+
+        if revision == "" or (triggers == [] and len(unknown) <= 1):
+            return "Usage: trigger <alias> <branch>", False
+
+        if unknown != []:
+            return "Unknown trigger alias : %s" % ", ".join(unknown), False
+
+        return None
+
+    @staticmethod
+    def _resolve_triggers(names, config):
+        """ expands comma separated aliases and trigger groups from gcloud.triggers
+
+        Returns:
+            (list, list) : (alias, triggerId) tuples to run, names that are not configured
+        """
+        aliases = config.get("gcloud", {}).get("triggers", {})
+        triggers = []
+        unknown = []
+        seen = set()
+
+        # a group is a list of aliases, groups of groups are not expanded
+        for name in names.split(","):
+            if name == "":
+                continue
+            value = aliases.get(name, None)
+            members = [(m, aliases.get(m, None)) for m in value] if isinstance(value, list) else [(name, value)]
+
+            for alias, triggerId in members:
+                if not isinstance(triggerId, str):
+                    unknown.append(alias)
+                elif triggerId not in seen:
+                    seen.add(triggerId)
+                    triggers.append((alias, triggerId))
+
+        return triggers, unknown
+
+    @staticmethod
+    def trigger_ids(names, aliases):
+        """ expands aliases and trigger groups from gcloud.triggers into trigger ids, for pubsub.rules
+        and slack.routes, anything that is not an alias is taken as a trigger id
+
+        Parameters:
+            names   (list) : aliases, trigger group names or trigger ids
+            aliases (dict) : gcloud.triggers
+
+        Returns:
+            (frozenset) : trigger ids
+        """
+        ids = set()
+        for name in names:
+            value = aliases.get(name, name)
+            # a group is a list of aliases, groups of groups are not expanded
+            ids.update([aliases.get(m, m) for m in value] if isinstance(value, list) else [value])
+        return frozenset(ids)
+
+    @staticmethod
+    def _api_call(method, include_resp=False, cloudbuild=None, idempotent=False):
+        # deferred so that importing this module does not load the google api client
+        from googleapiclient.errors import HttpError
+
         try:
-            op = method.execute()
+            if isinstance(cloudbuild, CloudBuild):
+                # reconnects stale connections and retries idempotent calls
+                op = cloudbuild.execute(method, idempotent=idempotent)
+            else:
+                op = method.execute()
 
             if not include_resp:
                 done = op.get("done", False)
@@ -130,12 +613,8 @@ class Command:
                 return "200", op
         except Exception as err:
             if isinstance(err, HttpError):
-                if not include_resp:
-                    return str(err.resp.status), err._get_reason()
+                return str(err.resp.status), err._get_reason()
             else:
-                # TODO : only other exception seen thus far is :
-                #        ConnectionResetError: [Errno 104] Connection reset by peer
-                #        perhaps explicitly handle that by creating a new cloudbuild client
                 return "500", str(err)
 
         return "200", ""
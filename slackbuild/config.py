@@ -1,16 +1,188 @@
-import yaml
+import hashlib
+import json
 import os
+import re
+from typing import Any
+from slackbuild.json_template import JsonTemplate
+from slackbuild.routing import Router
+from slackbuild.template_registry import TemplateRegistry
 
 
 class Config:
+    """
+     Settings from config.yaml, or from the json snapshot written by scripts/compile_config.py
+     The snapshot records a hash of the config.yaml it was compiled from and is only used while
+     config.yaml is unchanged, so editing config.yaml without compiling again is never ignored
+    """
+
+    SNAPSHOT_VERSION = 1
+    TRIGGER_ID = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+    __MISSING = object()  # type: Any
 
     def __init__(self, filename='./config.yaml', config_override=None):
+        self.__filename = filename
+        # mtime of the file the settings were read from, None when they were passed in
+        self.__mtime = None
+
         if config_override is None:
-            f = open(filename)
-            self.__data = yaml.load(f.read())
-            f.close()
+            self.__mtime, data = Config.__read(filename)
         else:
-            self.__data = config_override
+            data = config_override
+        self.__load(data)
+
+    def get(self, value, default=None):
+        return self.__data.get(value, default)
+
+    def value(self, path: str, default: Any = None) -> Any:
+        """ looks up a nested setting by its dotted path, such as slack.webhook.max_request_age
+
+        Parameters:
+            path    (str) : keys separated by dots
+            default (any) : returned when the setting is missing, a setting of another type than
+                            the default is a configuration error
+
+        Returns:
+            (any) : the setting, or the default
+        """
+        checked = self.__values.get(path, None)
+        if checked is not None and checked[0] is type(default):
+            return checked[1]
+
+        found = self.__walk(path)
+        if found is Config.__MISSING or found is None:
+            return default
+
+        # ints are fine where floats are expected, but bools are not ints here
+        expected = (float, int) if isinstance(default, float) else type(default)
+        if default is not None and (not isinstance(found, expected) or isinstance(found, bool) != isinstance(default, bool)):
+            raise ValueError('%s should be a %s, not %s' % (path, type(default).__name__, type(found).__name__))
+        # later lookups with the same type of default skip the walk and the checks
+        self.__values[path] = (type(default), found)
+        return found
+
+    def router(self):
+        """ returns the compiled slack.routes
+
+        Returns:
+            (Router) : picks the channels and template of each build notification
+        """
+        return self.__router
+
+    def reload(self):
+        """ reads the config file again when it changed since it was loaded, only when config_reload is set
+
+        Returns:
+            (bool) : true if the settings changed, objects built from them should be built again
+        """
+        if self.__mtime is None or not self.get('config_reload', False):
+            return False
+
+        try:
+            mtime = Config.__mtime_of(self.__filename)
+            if mtime == self.__mtime:
+                return False
+            mtime, data = Config.__read(self.__filename)
+            # parsed and compiled aside, so a bad edit leaves the current settings untouched
+            fresh = Config(config_override=data)
+        except OSError:
+            # keep the current settings while the file is being replaced
+            return False
+        except ValueError as e:
+            # a broken file is not parsed again until it changes
+            self.__mtime = mtime
+            print("Keeping the current settings, %s is invalid : %s" % (self.__filename, e))
+            return False
+
+        self.__mtime = mtime
+        self.__data, self.__values, self.__router = fresh.__data, fresh.__values, fresh.__router
+        return True
+
+    def validate(self):
+        """ checks what would otherwise only fail once a build or command needs it
+
+        Returns:
+            (list) : descriptions of the problems found, empty when the config is valid
+        """
+        errors = []
+        slack = self.get('slack', {}) or {}
+
+        channel = slack.get('channel', '')
+        if not isinstance(channel, str) or channel == '':
+            errors.append('slack.channel is required')
+
+        templates = [('slack.templates.%s' % k, v) for k, v in (slack.get('templates', {}) or {}).items()]
+        templates += [('slack.routes[%d].template' % i, r.get('template', '')) for i, r in enumerate(slack.get('routes', []) or [])]
+        if (slack.get('digest', {}) or {}).get('statuses', []):
+            templates.append(('slack.digest.template', slack['digest'].get('template', 'digest.json')))
+        for setting, name in templates:
+            if name == '':
+                continue
+            path = os.path.join(TemplateRegistry.TEMPLATE_DIR, name)
+            if not os.path.isfile(path):
+                errors.append('%s : no template named %s in templates/' % (setting, name))
+                continue
+            try:
+                with open(path) as f:
+                    JsonTemplate(f.read())
+            except ValueError as e:
+                # placeholders must be inside json strings, such as "${count}"
+                errors.append('%s : %s is not valid json : %s' % (setting, name, e))
+
+        for i, route in enumerate(slack.get('routes', []) or []):
+            for target in Config.__as_list(route.get('channels', [])):
+                if not isinstance(target, str) or target == '':
+                    errors.append('slack.routes[%d].channels : %r is not a channel' % (i, target))
+
+        triggers = (self.get('gcloud', {}) or {}).get('triggers', {}) or {}
+        for alias, value in triggers.items():
+            if isinstance(value, list):
+                unknown = [m for m in value if m not in triggers or isinstance(triggers[m], list)]
+                if unknown != []:
+                    errors.append('gcloud.triggers.%s : %s are not trigger aliases' % (alias, ', '.join(str(m) for m in unknown)))
+            elif not Config.TRIGGER_ID.match(str(value)):
+                errors.append('gcloud.triggers.%s : %s is not a trigger id' % (alias, value))
+
+        return errors
+
+    @staticmethod
+    def snapshot_path(filename):
+        """ returns where the compiled snapshot of a config file is written """
+        return os.path.splitext(filename)[0] + '.snapshot.json'
+
+    @staticmethod
+    def compile(filename='./config.yaml'):
+        """ validates a config file and writes its json snapshot, which loads faster than yaml
+
+        Secrets from the environment are not written to the snapshot
+
+        Parameters:
+            filename (str) : the yaml config file
+
+        Returns:
+            (str) : path of the snapshot
+
+        Raises:
+            ValueError : the config is invalid, the snapshot is not written
+        """
+        import yaml
+        with open(filename, 'rb') as f:
+            source = f.read()
+        data = yaml.safe_load(source)
+        errors = Config(config_override=json.loads(json.dumps(data))).validate()
+        if errors != []:
+            raise ValueError('Invalid %s\n  %s' % (filename, '\n  '.join(errors)))
+
+        path = Config.snapshot_path(filename)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': Config.SNAPSHOT_VERSION, 'source_sha256': hashlib.sha256(source).hexdigest(), 'data': data}, f, separators=(',', ':'))
+        # readers never see a partial snapshot
+        os.replace(path + '.tmp', path)
+        return path
+
+    def __load(self, data):
+        self.__data = data if data is not None else {}
+        # dotted path -> (type of the default, setting), filled by value()
+        self.__values = {}  # type: dict
 
         if self.__data.get('slack', {}).get('token', '') == '':
             if self.__data.get('slack', None) is None:
@@ -18,5 +190,46 @@ class Config:
             self.__data['slack']['token'] = os.environ.get('SLACK_TOKEN', '')
             self.__data['slack']['signing_secret'] = os.environ.get('SLACK_SIGNING_SECRET', '')
 
-    def get(self, value, default=None):
-        return self.__data.get(value, default)
+        # compiled once per load, an invalid route fails here instead of on the first build
+        self.__router = Router(self)
+
+    def __walk(self, path):
+        node = self.__data
+        for key in path.split('.'):
+            if not isinstance(node, dict) or key not in node:
+                return Config.__MISSING
+            node = node[key]
+        return node
+
+    @staticmethod
+    def __read(filename):
+        """ returns the mtime of the config file and the settings, from the snapshot when it was compiled
+        from the current contents of the config file """
+        mtime = Config.__mtime_of(filename)
+        with open(filename, 'rb') as f:
+            source = f.read()
+
+        try:
+            with open(Config.snapshot_path(filename)) as f:
+                compiled = json.load(f)
+            if compiled.get('version') == Config.SNAPSHOT_VERSION and compiled.get('source_sha256') == hashlib.sha256(source).hexdigest():
+                return mtime, compiled['data']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        import yaml
+        try:
+            data = yaml.safe_load(source)
+        except yaml.YAMLError as e:
+            raise ValueError('Invalid yaml in %s : %s' % (filename, e))
+        if data is not None and not isinstance(data, dict):
+            raise ValueError('%s should contain a mapping of settings' % filename)
+        return mtime, data
+
+    @staticmethod
+    def __mtime_of(filename):
+        return os.stat(filename).st_mtime_ns
+
+    @staticmethod
+    def __as_list(value):
+        return value if isinstance(value, list) else [value]
@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from slackbuild.command import Command
+from slackbuild.config import Config
+
+
+class Deferred:
+    """
+     Answers slack within its 3 second limit by acknowledging a command right away and
+     running the Cloud Build API call in the background, the result is posted to the
+     response_url of the request
+     See: https://api.slack.com/slash-commands#responding_response_url
+    """
+
+    ACK = {
+        "response_type": "ephemeral",
+        "replace_original": False,
+        "text": "Working on it..."
+    }
+
+    def __init__(self, config: Config, slack, executor=None, index=None):
+        conf = config.get('slack', {}).get('webhook', {})
+        self.__enabled = conf.get('deferred', False)
+        self.__config = config
+        self.__slack = slack
+        self.__index = index
+
+        if executor is None and self.__enabled:
+            executor = ThreadPoolExecutor(max_workers=conf.get('deferred_workers', 4))
+        self.__executor = executor
+        self.__stats = {'deferred': 0, 'responded': 0, 'failed': 0, 'ack_latency_max': 0.0}
+
+    def handle(self, body, argv, cloudbuild):
+        """ starts a command in the background when it needs the Cloud Build API
+
+        Parameters:
+            body (dict)       : Request body from slack
+            argv (list)       : arguments for Command.run
+            cloudbuild (obj)  : Cloud Build API client
+
+        Returns:
+            (dict) : the acknowledgement to answer slack with, None when the
+                     command should be run synchronously
+        """
+        start = time.perf_counter()
+        response_url = body.get('response_url', '')
+
+        if not self.__enabled or response_url == '':
+            return None
+
+        # invalid arguments and help are answered right away
+        output, success = Command.validate(argv, self.__config, self.__index)
+        if output is not None or not success:
+            return None
+
+        self.__executor.submit(self.__run, body, argv, cloudbuild, response_url)
+        self.__stats['deferred'] += 1
+        self.__stats['ack_latency_max'] = max(self.__stats['ack_latency_max'], time.perf_counter() - start)
+
+        return dict(Deferred.ACK)
+
+    def close(self):
+        """ stops the worker threads once the commands already started have answered """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+
+    def stats(self):
+        """ returns counters of deferred commands and the slowest acknowledgement in seconds """
+        return dict(self.__stats)
+
+    def __run(self, body, argv, cloudbuild, response_url):
+        try:
+            output, success = Command.run(argv, cloudbuild, self.__config, self.__index)
+            if output is None:
+                return
+
+            msg = self.__slack.render_command_result(body, success, output)
+            responded = self.__slack.respond(response_url, msg)
+        except Exception as err:
+            print("Deferred command failed : %s" % err)
+            responded = False
+
+        self.__stats['responded' if responded else 'failed'] += 1
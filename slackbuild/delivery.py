@@ -0,0 +1,216 @@
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+     Allows `rate` calls per second with bursts of up to `burst` calls
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.__rate = rate
+        self.__burst = burst
+        self.__tokens = burst
+        self.__clock = clock
+        self.__updated = clock()
+
+    def take(self):
+        """ reserves a token
+
+        Returns:
+            float : seconds to wait before the reserved token may be used
+        """
+        now = self.__clock()
+        self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+        self.__tokens -= 1
+
+        if self.__tokens >= 0:
+            return 0.0
+        return -self.__tokens / self.__rate
+
+
+class Delivery:
+    """
+     Calls the Slack API with per channel rate limiting and retries, optionally from a worker thread
+     See: https://api.slack.com/docs/rate-limits
+    """
+
+    # slack errors worth retrying, any exception raised by the client is retried as well
+    RETRY_ERRORS = ('ratelimited', 'internal_error', 'fatal_error', 'service_unavailable', 'request_timeout')
+
+    def __init__(self, client, config: dict, clock=time.monotonic, sleep=time.sleep, jitter=random.random):
+        self.__client = client
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__jitter = jitter
+
+        self.__max_retries = config.get('max_retries', 3)
+        self.__backoff = config.get('backoff', 1.0)
+        self.__max_backoff = config.get('max_backoff', 30.0)
+        # chat.postMessage allows roughly one message per second per channel with short bursts
+        self.__rate = config.get('rate', 1.0)
+        self.__burst = config.get('burst', 3)
+        self.__buckets = {}  # type: dict
+
+        self.__lock = threading.Lock()
+        self.__stats = {'delivered': 0, 'failed': 0, 'retries': 0, 'overflow': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+
+        self.__queue = None  # type: Optional[queue.Queue]
+        if config.get('async', False):
+            self.__queue = queue.Queue(maxsize=config.get('queue_size', 100))
+            threading.Thread(target=self.__work, args=(self.__queue,), name='slack-delivery', daemon=True).start()
+
+    def is_async(self):
+        return self.__queue is not None
+
+    def call(self, method, **args):
+        """ calls a Slack API method, waiting out rate limits and retrying transient errors
+
+        Parameters:
+            method (str) : Slack API method
+            args         : arguments to the API method
+
+        Returns:
+            (dict) : the last response from the Slack API
+        """
+        wait = self.__take(args.get('channel', ''))
+        attempt = 0
+
+        while True:
+            if wait > 0:
+                self.__sleep(wait)
+
+            try:
+                resp = self.__client.api_call(method, **args)
+                transient = resp.get('error', '') in Delivery.RETRY_ERRORS
+            except Exception as err:
+                # connection errors and non json (5xx) responses
+                resp = {'ok': False, 'error': str(err)}
+                transient = True
+
+            if resp.get('ok', False) or not transient or attempt >= self.__max_retries:
+                return resp
+
+            attempt += 1
+            with self.__lock:
+                self.__stats['retries'] += 1
+
+            wait = min(self.__max_backoff, self.__backoff * (2 ** (attempt - 1)) * (0.5 + self.__jitter()))
+            wait = max(wait, Delivery.retry_after(resp))
+
+    @staticmethod
+    def retry_after(resp):
+        """ returns the seconds slack asked to wait before retrying, 0 when it did not say
+
+        Only the number of seconds slack sends is understood, an http date or any other value is
+        ignored and the exponential backoff applies. Header names are not case sensitive, the
+        headers may be a plain dict
+        """
+        headers = resp.get('headers', None) or {}
+        value = next((v for k, v in headers.items() if k.lower() == 'retry-after'), 0)
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def submit(self, job):
+        """ runs a delivery job, on the worker thread when slack.delivery.async is set
+
+        Parameters:
+            job (callable) : returns true when the message was delivered
+
+        Returns:
+            bool : result of the job, or true when the job was queued
+        """
+        work_queue = self.__queue
+        if work_queue is not None:
+            try:
+                work_queue.put_nowait((self.__clock(), job))
+                return True
+            except queue.Full:
+                # never lose a notification, deliver it from this thread instead
+                with self.__lock:
+                    self.__stats['overflow'] += 1
+
+        return self.__run(self.__clock(), job)
+
+    def drain(self, timeout=10.0):
+        """ waits for queued deliveries to finish, call before the process exits
+
+        Returns:
+            bool : true if the queue was emptied before timeout
+        """
+        if self.__queue is None:
+            return True
+
+        deadline = time.monotonic() + timeout
+        while self.__queue.unfinished_tasks > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=10.0):
+        """ waits for queued deliveries and stops the worker thread, later jobs run on the submitting thread
+
+        Returns:
+            bool : true if the queue was emptied before timeout
+        """
+        work_queue = self.__queue
+        if work_queue is None:
+            return True
+
+        drained = self.drain(timeout)
+        self.__queue = None
+        try:
+            # wakes the worker up to stop it, a worker still busy after timeout is left to finish
+            work_queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        return drained
+
+    def stats(self):
+        """ returns queue depth, retry count and delivery latency counters """
+        with self.__lock:
+            stats = dict(self.__stats)
+        done = stats['delivered'] + stats['failed']
+        stats['latency_avg'] = stats.pop('latency_total') / done if done > 0 else 0.0
+        work_queue = self.__queue
+        stats['queue_depth'] = work_queue.qsize() if work_queue is not None else 0
+        return stats
+
+    def __take(self, channel):
+        with self.__lock:
+            bucket = self.__buckets.get(channel, None)
+            if bucket is None:
+                bucket = TokenBucket(self.__rate, self.__burst, clock=self.__clock)
+                self.__buckets[channel] = bucket
+            return bucket.take()
+
+    def __run(self, submitted, job):
+        try:
+            ok = job()
+        except Exception as err:
+            print("Slack delivery failed : %s" % err)
+            ok = False
+
+        latency = self.__clock() - submitted
+        with self.__lock:
+            self.__stats['delivered' if ok else 'failed'] += 1
+            self.__stats['latency_total'] += latency
+            self.__stats['latency_max'] = max(self.__stats['latency_max'], latency)
+        return ok
+
+    def __work(self, work_queue):
+        while True:
+            item = work_queue.get()
+            try:
+                if item is None:
+                    return
+                self.__run(*item)
+            finally:
+                work_queue.task_done()
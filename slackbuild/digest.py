@@ -0,0 +1,208 @@
+import fcntl
+import heapq
+import json
+import os
+import time
+from slackbuild.colors import Colors
+from slackbuild.config import Config
+
+"""
+   Buffers of build events waiting to be summarized, each event is a small json serializable dict
+"""
+
+
+class MemoryBuffer:
+    """
+     Events buffered by this function instance, lost when the instance is recycled
+    """
+
+    def __init__(self) -> None:
+        self.__events = []  # type: list
+
+    def append(self, event):
+        """ adds an event and returns the number of buffered events """
+        self.__events.append(event)
+        return len(self.__events)
+
+    def first(self):
+        """ returns the oldest buffered event, None when empty """
+        return self.__events[0] if len(self.__events) > 0 else None
+
+    def peek(self):
+        """ returns every buffered event, oldest first, without removing them """
+        return list(self.__events)
+
+    def remove(self, count):
+        """ removes the count oldest events, events appended since they were peeked are kept """
+        del self.__events[:count]
+
+
+class FileBuffer:
+    """
+     Events appended to a local file as json lines, shared by invocations and processes on the
+     same host. Each operation holds an exclusive lock on the file
+    """
+
+    def __init__(self, path):
+        self.__path = path
+
+    def append(self, event):
+        line = (json.dumps(event, separators=(',', ':')) + '\n').encode('utf-8')
+        with self.__open() as f:
+            f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.seek(0)
+            return sum(1 for _ in f)
+
+    def first(self):
+        with self.__open() as f:
+            line = f.readline()
+        return json.loads(line) if line else None
+
+    def peek(self):
+        with self.__open() as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def remove(self, count):
+        with self.__open() as f:
+            kept = [line for line in f if line.strip()][count:]
+            f.seek(0)
+            f.truncate()
+            f.writelines(kept)
+
+    def __open(self):
+        f = open(self.__path, 'a+b')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+        except Exception:
+            f.close()
+            raise
+        # closing the file releases the lock
+        return f
+
+
+# buffer name in config -> factory from the digest config section
+BUFFERS = {
+    'memory': lambda conf: MemoryBuffer(),
+    'file': lambda conf: FileBuffer(conf.get('path', '/tmp/slackbuild-digest.jsonl'))
+}
+
+
+class Digest:
+    """
+     Collects the builds of some statuses and posts one summary message per interval instead of
+     one message per build. There is no timer between invocations, a due digest is posted by the
+     next pubsub event, or as soon as max_events builds are buffered
+     Builds stay buffered until posted() is called, a digest that failed to post is tried again
+     with the builds buffered since
+    """
+
+    # fields of the toMessage variables kept for each buffered build
+    FIELDS = ('build_id', 'build_id_short', 'build_log_url', 'repo_name', 'branch_name', 'build_duration_seconds')
+    FAILED = ('FAILURE', 'INTERNAL_ERROR', 'TIMEOUT')
+
+    def __init__(self, config: Config, buffer=None, clock=time.time, previous=None):
+        conf = config.get('slack', {}).get('digest', {})
+        # statuses as in slack.templates, such as success or working
+        self.__statuses = set(s.upper() for s in conf.get('statuses', []))
+        self.__interval = conf.get('interval', 300)
+        self.__max_events = conf.get('max_events', 100)
+        self.__slowest = conf.get('slowest', 3)
+        self.template = conf.get('template', 'digest.json')
+        # (Optional) post digests to another channel than slack.channel
+        self.channel = conf.get('channel', None)
+        self.__clock = clock
+
+        # previous is the digest built before a config reload, its buffered builds are kept
+        if buffer is None and previous is not None and previous.__buffer is not None and \
+                (previous.__conf.get('buffer'), previous.__conf.get('path')) == (conf.get('buffer'), conf.get('path')):
+            buffer = previous.__buffer
+        if buffer is None and len(self.__statuses) > 0:
+            backend = conf.get('buffer', 'memory')
+            if backend not in BUFFERS:
+                raise ValueError('Unknown digest buffer : %s' % backend)
+            buffer = BUFFERS[backend](conf)
+        self.__buffer = buffer
+        self.__conf = conf
+        self.__stats = {'buffered': 0, 'digests': 0}
+
+    def accepts(self, status):
+        """ returns true if builds with this status are summarized instead of posted """
+        return status in self.__statuses
+
+    def add(self, variables, status):
+        """ buffers a build
+
+        Parameters:
+            variables (dict) : variables from BuildStatus.toMessage
+            status    (str)  : build status from the message attributes
+
+        Returns:
+            (dict) : variables of the digest message when it is due or the buffer is full, else None
+        """
+        event = {k: variables.get(k, '') for k in Digest.FIELDS}
+        event['status'] = status
+        event['ts'] = self.__clock()
+        self.__stats['buffered'] += 1
+
+        if self.__buffer.append(event) >= self.__max_events:
+            return self.flush()
+        return self.poll()
+
+    def poll(self):
+        """ returns the variables of the digest message when the oldest buffered build waited
+        at least the interval, None otherwise """
+        if self.__buffer is None:
+            return None
+
+        first = self.__buffer.first()
+        if first is None or self.__clock() - first.get('ts', 0) < self.__interval:
+            return None
+        return self.flush()
+
+    def flush(self):
+        """ summarizes the buffer, call posted() once the digest was posted to empty it
+
+        Returns:
+            (dict) : variables for the digest template, None when nothing was buffered
+        """
+        events = self.__buffer.peek() if self.__buffer is not None else []
+        if events == []:
+            return None
+        return Digest.summarize(events, self.__slowest)
+
+    def posted(self, summary):
+        """ removes the builds of a posted digest from the buffer
+
+        Parameters:
+            summary (dict) : variables returned by add, poll or flush
+        """
+        self.__buffer.remove(int(summary['digest_count']))
+        self.__stats['digests'] += 1
+
+    def stats(self):
+        """ returns counters of buffered builds and posted digests """
+        return dict(self.__stats)
+
+    @staticmethod
+    def summarize(events, slowest=3):
+        """ turns buffered builds into the variables of the digest template """
+        counts = {}
+        for event in events:
+            counts[event['status']] = counts.get(event['status'], 0) + 1
+
+        failures = [e for e in events if e['status'] in Digest.FAILED]
+        durations = [(int(e['build_duration_seconds']), i, e) for i, e in enumerate(events) if e.get('build_duration_seconds', '') != '']
+
+        def line(event, suffix=''):
+            return '<%s|%s> %s %s%s' % (event['build_log_url'], event['build_id_short'], event['repo_name'], event['branch_name'], suffix)
+
+        return {
+            'digest_count': str(len(events)),
+            'digest_summary': ', '.join('%d %s' % (counts[s], s.lower()) for s in sorted(counts)),
+            'digest_failures': '\n'.join(line(e) for e in failures),
+            'digest_slowest': '\n'.join(line(e, ' (%d seconds)' % d) for d, _, e in heapq.nlargest(slowest, durations, key=lambda t: (t[0], -t[1]))),
+            'digest_minutes': str(max(1, int(round((events[-1]['ts'] - events[0]['ts']) / 60.0)))),
+            'digest_color': Colors.FAILURE if failures != [] else Colors.SUCCESS
+        }
@@ -0,0 +1,69 @@
+from slackbuild.build_status import BuildStatus
+from slackbuild.config import Config
+from slackbuild.state_store import new_store
+
+
+class DurationHistory:
+    """
+     Remembers the durations of the last successful builds of each trigger and branch, and
+     compares each finished build with their median so templates can point out slow builds
+     Each trigger and branch keeps at most `window` durations, so memory does not grow with
+     the number of builds
+    """
+
+    def __init__(self, config: Config, store=None):
+        conf = config.get('pubsub', {}).get('duration_history', {})
+        self.__enabled = store is not None or conf.get('enabled', False)
+        # number of recent durations kept per trigger and branch
+        self.__window = conf.get('window', 20)
+        # fewer durations than this are not enough to call a build slow
+        self.__min_samples = conf.get('min_samples', 5)
+        # percent above the median for a build to be slow
+        self.__threshold = conf.get('threshold_pct', 50)
+        self.__slow_text = conf.get('slow_text', ':snail: slower than usual')
+
+        if store is None and self.__enabled:
+            store = new_store(dict({'ttl': 30 * 86400, 'max_entries': 1000}, **conf.get('store', {})), table='duration_history')
+        self.__store = store
+
+    def annotate(self, variables, status):
+        """ sets build_duration_p50, build_duration_delta_pct and build_slow in the variables of
+        a finished build, and remembers its duration when it succeeded
+
+        Parameters:
+            variables (dict) : variables from BuildStatus.toMessage
+            status    (str)  : build status from the message attributes
+
+        Returns:
+            (dict) : the variables
+        """
+        seconds = variables.get('build_duration_seconds', '')
+        if not self.__enabled or seconds == '':
+            return variables
+        seconds = int(seconds)
+
+        key = BuildStatus.source_key(variables)
+        durations = self.__store.get(key, [])
+
+        if len(durations) > 0:
+            p50 = DurationHistory.median(durations)
+            variables['build_duration_p50'] = str(p50) + ' seconds'
+            if p50 > 0:
+                delta = round((seconds - p50) * 100.0 / p50)
+                variables['build_duration_delta_pct'] = '%+d%%' % delta
+                if len(durations) >= self.__min_samples and delta > self.__threshold:
+                    variables['build_slow'] = self.__slow_text
+
+        # failed and cancelled builds stop early and would drag the median down
+        if status == 'SUCCESS':
+            self.__store.set(key, (durations + [seconds])[-self.__window:])
+
+        return variables
+
+    @staticmethod
+    def median(durations):
+        ordered = sorted(durations)
+        middle = len(ordered) // 2
+        if len(ordered) % 2 == 1:
+            return ordered[middle]
+        return (ordered[middle - 1] + ordered[middle]) // 2
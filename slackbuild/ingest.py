@@ -0,0 +1,99 @@
+from slackbuild.build_event import BuildEvent
+from slackbuild.command import Command
+from slackbuild.config import Config
+
+
+class IngestRules:
+    """
+     Decides which pubsub events are worth notifying, before they are rendered or posted
+     Rules from pubsub.rules are checked in order and the first matching rule decides,
+     events matching no rule are notified. Conditions on the message attributes (status) are
+     checked first, the Build resource is only decoded when a rule also needs one of its fields
+    """
+
+    ACTIONS = ('drop', 'notify')
+    # conditions that only need the pubsub message attributes
+    ATTRIBUTE_CONDITIONS = ('status',)
+    # conditions that need the decoded Build resource
+    BUILD_CONDITIONS = ('trigger', 'triggered')
+
+    def __init__(self, config: Config):
+        aliases = config.get('gcloud', {}).get('triggers', {})
+        self.__rules = [IngestRules.__compile(i, rule, aliases) for i, rule in enumerate(config.get('pubsub', {}).get('rules', []) or [])]
+        self.__stats = {'accepted': 0, 'decoded': 0}
+        self.__dropped = {rule['name']: 0 for rule in self.__rules}
+
+    def accept(self, event: BuildEvent):
+        """ checks an event against the rules
+
+        Parameters:
+            event (BuildEvent) : the pubsub message, decoded only if a rule needs it
+
+        Returns:
+            (bool, str) : true if the event should be notified, and the name of the deciding rule or None
+        """
+        decoded = event.is_decoded()
+
+        for rule in self.__rules:
+            if not IngestRules.__matches(rule, event):
+                continue
+
+            if rule['action'] == 'drop':
+                self.__dropped[rule['name']] += 1
+            else:
+                self.__stats['accepted'] += 1
+            self.__count_decode(decoded, event)
+            return rule['action'] == 'notify', rule['name']
+
+        self.__stats['accepted'] += 1
+        self.__count_decode(decoded, event)
+        return True, None
+
+    def stats(self):
+        """ returns the number of accepted events, events decoded by a rule and events dropped per rule """
+        return dict(self.__stats, dropped=dict(self.__dropped))
+
+    def __count_decode(self, decoded, event):
+        if not decoded and event.is_decoded():
+            self.__stats['decoded'] += 1
+
+    @staticmethod
+    def __matches(rule, event):
+        statuses = rule.get('status', None)
+        if statuses is not None and event.status not in statuses:
+            return False
+
+        triggers = rule.get('trigger', None)
+        if triggers is not None and event.get('buildTriggerId', '') not in triggers:
+            return False
+
+        triggered = rule.get('triggered', None)
+        if triggered is not None and (event.get('buildTriggerId', '') != '') != triggered:
+            return False
+
+        return True
+
+    @staticmethod
+    def __compile(i, rule, aliases):
+        name = rule.get('name', 'rule-%d' % (i + 1))
+        action = rule.get('action', 'drop')
+        unknown = [k for k in rule.keys() if k not in ('name', 'action') + IngestRules.ATTRIBUTE_CONDITIONS + IngestRules.BUILD_CONDITIONS]
+
+        if action not in IngestRules.ACTIONS:
+            raise ValueError('Unknown action in pubsub rule %s : %s' % (name, action))
+        if unknown != []:
+            raise ValueError('Unknown condition in pubsub rule %s : %s' % (name, ', '.join(unknown)))
+
+        compiled = {'name': name, 'action': action}
+        if 'status' in rule:
+            compiled['status'] = frozenset(s.upper() for s in IngestRules.__as_list(rule['status']))
+        if 'trigger' in rule:
+            compiled['trigger'] = Command.trigger_ids(IngestRules.__as_list(rule['trigger']), aliases)
+        if 'triggered' in rule:
+            compiled['triggered'] = bool(rule['triggered'])
+
+        return compiled
+
+    @staticmethod
+    def __as_list(value):
+        return value if isinstance(value, list) else [value]
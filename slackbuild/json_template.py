@@ -0,0 +1,75 @@
+import json
+from string import Template
+
+
+class JsonTemplate:
+    """
+     A json message template parsed once into a tree
+     Rendering only fills the string values containing ${var} placeholders, so substituted
+     values never need to be json escaped and the output never needs to be parsed again
+    """
+
+    # node kinds of the compiled tree
+    __CONST = 0
+    __SLOT = 1
+    __VAR = 2
+    __DICT = 3
+    __LIST = 4
+
+    def __init__(self, text):
+        self.template = text
+        self.__slots = []
+        self.__root = self.__compile(json.loads(text), ())
+
+    def slots(self):
+        """ returns the location of every placeholder in the template
+
+        Returns:
+            (list) : tuples of (path, str) where path is the keys/indexes leading to the templated string
+        """
+        return list(self.__slots)
+
+    def render(self, variables, **kwargs):
+        """ builds a new message from the template
+
+        Parameters:
+            variables (dict) : substitutions for ${var} placeholders, missing variables are left as is
+            kwargs           : additional substitutions, these take precedence over variables
+
+        Returns:
+            (dict) : the rendered template
+        """
+        if kwargs:
+            variables = dict(variables, **kwargs)
+        return self.__build(self.__root, variables)
+
+    def __compile(self, node, path):
+        if isinstance(node, dict):
+            return (self.__DICT, [(k, self.__compile(v, path + (k,))) for k, v in node.items()])
+        if isinstance(node, list):
+            return (self.__LIST, [self.__compile(v, path + (i,)) for i, v in enumerate(node)])
+        if not isinstance(node, str) or '$' not in node:
+            return (self.__CONST, node)
+
+        self.__slots.append((path, node))
+        # a value that is exactly one placeholder is a dict lookup instead of a substitution
+        match = Template.pattern.fullmatch(node)
+        if match is not None:
+            name = match.group('named') or match.group('braced')
+            if name is not None:
+                return (self.__VAR, (name, node))
+
+        return (self.__SLOT, Template(node))
+
+    def __build(self, node, variables):
+        kind, value = node
+        if kind == self.__CONST:
+            return value
+        if kind == self.__VAR:
+            name, default = value
+            return str(variables[name]) if name in variables else default
+        if kind == self.__SLOT:
+            return value.safe_substitute(variables)
+        if kind == self.__DICT:
+            return {k: self.__build(v, variables) for k, v in value}
+        return [self.__build(v, variables) for v in value]
@@ -0,0 +1,156 @@
+import fnmatch
+import re
+
+
+class Router:
+    """
+     Picks the channels and template of a build notification from slack.routes
+
+     Every matching route adds its channels, the first matching route with a template picks it.
+     Builds matching no route go to slack.channel with the template for their status
+     Routes are compiled once: routes naming repos are indexed by repo name, so a build is only
+     checked against the routes of its repo and the routes that match any repo or a repo pattern
+    """
+
+    CONDITIONS = ('repo', 'branch', 'trigger', 'status')
+    GLOB = re.compile(r'[*?\[]')
+
+    def __init__(self, config):
+        slack = config.get('slack', {}) or {}
+        aliases = (config.get('gcloud', {}) or {}).get('triggers', {}) or {}
+        self.__default_channel = slack.get('channel', '')
+
+        self.__routes = [Router.__compile(i, route, aliases) for i, route in enumerate(slack.get('routes', []) or [])]
+        # routes without an exact repo are checked for every build
+        self.__others = []  # type: list
+        # repo name -> routes for that exact repo and the routes above, in config order
+        self.__by_repo = {}  # type: dict
+        for route in self.__routes:
+            if route['repos'] is None:
+                self.__others.append(route)
+                for routes in self.__by_repo.values():
+                    routes.append(route)
+                continue
+            for repo in route['repos']:
+                self.__by_repo.setdefault(repo, list(self.__others)).append(route)
+
+    def __len__(self):
+        return len(self.__routes)
+
+    def route(self, variables, status, template=''):
+        """ picks where a build notification goes
+
+        Parameters:
+            variables (dict) : variables from BuildStatus.toMessage
+            status    (str)  : build status from the message attributes
+            template  (str)  : template for the status from slack.templates, used when no route sets one
+
+        Returns:
+            (list, str) : channels to post to, possibly none, and the template to render
+        """
+        if len(self.__routes) == 0:
+            return [self.__default_channel], template
+
+        candidates = self.__by_repo.get(variables.get('repo_name', ''), self.__others)
+        channels = []  # type: list
+        chosen = None
+        matched = False
+        for route in candidates:
+            if not Router.__matches(route, variables, status):
+                continue
+            matched = True
+            for channel in route['channels']:
+                if channel not in channels:
+                    channels.append(channel)
+            if chosen is None and route['template'] != '':
+                chosen = route['template']
+
+        if not matched:
+            return [self.__default_channel], template
+        return channels, chosen if chosen is not None else template
+
+    @staticmethod
+    def __matches(route, variables, status):
+        if route['status'] is not None and status not in route['status']:
+            return False
+
+        if route['trigger'] is not None and variables.get('build_trigger_id', '') not in route['trigger']:
+            return False
+
+        if route['repo_pattern'] is not None and route['repo_pattern'].fullmatch(variables.get('repo_name', '')) is None:
+            return False
+
+        if route['branch'] is not None:
+            branch = variables.get('branch_name', '')
+            if branch not in route['branch'][0] and (route['branch'][1] is None or route['branch'][1].fullmatch(branch) is None):
+                return False
+
+        return True
+
+    @staticmethod
+    def __compile(i, route, aliases):
+        name = route.get('name', 'route-%d' % (i + 1))
+        unknown = [k for k in route.keys() if k not in ('name', 'channels', 'template') + Router.CONDITIONS]
+        if unknown != []:
+            raise ValueError('Unknown condition in slack route %s : %s' % (name, ', '.join(unknown)))
+        if 'channels' not in route and 'template' not in route:
+            raise ValueError('Slack route %s needs channels or a template' % name)
+
+        compiled = {
+            'name': name,
+            'channels': Router.__as_list(route.get('channels', [])),
+            'template': route.get('template', ''),
+            'repos': None,
+            'repo_pattern': None,
+            'branch': None,
+            'trigger': None,
+            'status': None
+        }
+
+        if 'repo' in route:
+            exact, pattern = Router.__split(name, Router.__as_list(route['repo']))
+            if pattern is None:
+                compiled['repos'] = exact
+            else:
+                # a route mixing names and patterns is checked for every build
+                compiled['repo_pattern'] = re.compile('|'.join(['(?:%s)' % re.escape(r) for r in exact] + [pattern.pattern]))
+        if 'branch' in route:
+            compiled['branch'] = Router.__split(name, Router.__as_list(route['branch']))
+        if 'status' in route:
+            compiled['status'] = frozenset(s.upper() for s in Router.__as_list(route['status']))
+        if 'trigger' in route:
+            # deferred, config imports this module and command imports config
+            from slackbuild.command import Command
+            compiled['trigger'] = Command.trigger_ids(Router.__as_list(route['trigger']), aliases)
+
+        return compiled
+
+    @staticmethod
+    def __split(name, values):
+        """ separates exact values from patterns, globs such as release/* and regexes written as /regex/,
+        patterns must match the whole value
+
+        Returns:
+            (frozenset, re.Pattern) : exact values, and one compiled regex for all patterns or None
+        """
+        exact = set()
+        patterns = []
+        for value in values:
+            value = str(value)
+            if len(value) > 1 and value.startswith('/') and value.endswith('/'):
+                patterns.append('(?:%s)' % value[1:-1])
+            elif Router.GLOB.search(value):
+                patterns.append(fnmatch.translate(value))
+            else:
+                exact.add(value)
+
+        if patterns == []:
+            return frozenset(exact), None
+        try:
+            return frozenset(exact), re.compile('|'.join(patterns))
+        except re.error as e:
+            raise ValueError('Invalid pattern in slack route %s : %s' % (name, e))
+
+    @staticmethod
+    def __as_list(value):
+        return value if isinstance(value, list) else [value]
@@ -1,33 +1,83 @@
-import hmac
+import atexit
 import json
-import os.path
-from string import Template
+import time
+from slackbuild.colors import Colors
 from slackbuild.config import Config
-from slackclient import SlackClient
+from slackbuild.delivery import Delivery
+from slackbuild.state_store import MemoryStore
+from slackbuild.state_store import new_store
+from slackbuild.template_registry import TemplateRegistry
+from slackbuild.transport import WebApiTransport
+from slackbuild.transport import WebhookTransport
+from slackbuild.transport import new_session
+from slackbuild.webhook_request import WebhookRequest
 
 
 class Slack:
 
     VERSION = 'v0'
 
-    def __init__(self, config: Config, client=None):
+    def __init__(self, config: Config, client=None, message_store=None, clock=time.time, previous=None):
         self.__config = config.get('slack', {})
-        # only get once instead of on each request
-        self.__signing_secret = self.__config.get('signing_secret', '')
-
-        self.__max_content_length = self.__config.get('webhook', {}).get('max_content_length', 50000)  # 50kB default
+        # only get and encode once instead of on each request
+        self.__signing_secret = bytes(self.__config.get('signing_secret', ''), 'utf-8')
+
+        webhook = self.__config.get('webhook', {})
+        self.__max_content_length = webhook.get('max_content_length', 50000)  # 50kB default
+        # requests signed longer ago than this are rejected as replays, 0 disables the check
+        self.__max_request_age = webhook.get('max_request_age', 300)
+        self.__clock = clock
+        # signatures of verified requests, a request can only be replayed within max_request_age
+        self.__seen = MemoryStore(ttl=self.__max_request_age or 300, max_entries=webhook.get('replay_cache_size', 10000), clock=clock)
+        # previous is the instance built before a config reload, its replay cache and posted messages are kept
+        if previous is not None:
+            # a request verified before the reload is still a replay
+            self.__seen = previous.__seen
+        self.__webhook_stats = {'verified': 0, 'rejected_stale': 0, 'rejected_replay': 0, 'rejected_invalid': 0}
 
         if client is None:
-            self.__client = SlackClient(self.__config.get('token', ''))
-        else:
-            self.__client = client
-
-    def render_message(self, variables: dict, template='default.json'):
+            client = Slack.__new_client(self.__config)
+        self.__client = client
+        # used to post delayed responses to slack's response_url
+        self.__responder = None
+
+        self.__delivery = Delivery(self.__client, self.__config.get('delivery', {}))
+        if self.__delivery.is_async():
+            # give queued notifications a chance to be sent before the instance shuts down
+            atexit.register(self.__delivery.drain)
+
+        # compile every configured template once instead of reading it from disk on each render
+        self.__templates = TemplateRegistry(check_mtime=self.__config.get('template_reload', False))
+        routes = [route.get('template', '') for route in self.__config.get('routes', []) or []]
+        digest = self.__config.get('digest', {}) or {}
+        if digest.get('statuses', []):
+            routes.append(digest.get('template', 'digest.json'))
+        self.__templates.preload(['default.json', 'command.json'] + list(self.__config.get('templates', {}).values()) + routes)
+
+        # remembers the channel and ts of the message posted for each build so later statuses edit it
+        self.__messages = None
+        if self.__config.get('update_in_place', False):
+            if message_store is None and previous is not None and previous.__messages is not None and \
+                    previous.__config.get('message_store', {}) == self.__config.get('message_store', {}):
+                message_store = previous.__messages
+            if message_store is None:
+                message_store = new_store(self.__config.get('message_store', {}), table='messages')
+            self.__messages = message_store
+
+    def close(self):
+        """ delivers the queued messages and stops the delivery worker, the instance can still post
+        from the calling thread afterwards """
+        if self.__delivery.is_async():
+            atexit.unregister(self.__delivery.drain)
+        self.__delivery.close()
+
+    def render_message(self, variables: dict, template='default.json', channel=None):
         """ constructs a dict representing a slack message from a json template
 
         Parameters:
-            variables (dict) : substitutions used by builtin string.Template against json template
+            variables (dict) : substitutions for the ${var} placeholders in the json template
             template  (str)  : filename of message template to use
+            channel   (str)  : channel to post to instead of slack.channel
 
         Returns:
             (dict) : represents a slack message, used as input to post_message
@@ -35,15 +85,66 @@ class Slack:
         if template == '':
             template = 'default.json'
 
-        contents = '{}'
-        with open(os.path.dirname(__file__) + '/../templates/' + template, 'r') as f:
-            contents = f.read()
+        return self.__templates.get(template).render(variables, channel=channel or self.__config.get('channel'))
+
+    def template_stats(self):
+        """ returns hit/miss/reload counters of the template registry
+
+        Returns:
+            (dict) : counter name to count
+        """
+        return self.__templates.stats()
+
+    def render_command_result(self, data, success, output):
+        """ constructs the slack message answering a /slash command or interactive message
+
+        Parameters:
+            data    (dict) : Request body from slack
+            success (bool) : True if the command was succesful
+            output  (str)  : output of the command
+
+        Returns:
+            (dict) : represents a slack message
+        """
+        if Slack.is_interactive_message(data):
+            return Slack.render_interactive_message(data, success, output)
+
+        color = Colors.SUCCESS if success else Colors.FAILURE
+        return self.render_message({"result": output, "color": color}, "command.json")
 
-        temp = Template(contents)
+    def respond(self, response_url, msg: dict):
+        """ posts a delayed response to a /slash command or interactive message
+        See: https://api.slack.com/slash-commands#responding_response_url
 
-        msg = temp.safe_substitute(variables, channel=self.__config.get('channel'))
+        Parameters:
+            response_url (str) : response_url from the slack request
+            msg (dict)         : represents a slack message
 
-        return json.loads(msg)
+        Returns:
+            bool : true if slack accepted the response
+        """
+        responder = self.__responder
+        if responder is None:
+            responder = self.__responder = new_session('https://hooks.slack.com/', 1)
+
+        resp = responder.post(response_url, json=msg, timeout=10)
+        print(resp.status_code, resp.text)
+        return resp.status_code == 200
+
+    @staticmethod
+    def __new_client(config):
+        if config.get('transport', 'pooled') == 'slackclient':
+            from slackclient import SlackClient
+            client = SlackClient(config.get('token', ''))
+        else:
+            client = WebApiTransport(config.get('token', ''), pool_size=config.get('pool_size', 4))
+
+        # an incoming webhook can only post new messages, chat.update needs the Web API
+        url = config.get('incoming_webhook_url', '')
+        if url != '' and not config.get('update_in_place', False):
+            client = WebhookTransport(url, client)
+
+        return client
 
     @staticmethod
     def render_interactive_message(data, success, message):
@@ -95,50 +196,96 @@ class Slack:
 
         return resp
 
-    def post_message(self, msg: dict):
+    def post_message(self, msg: dict, key=None):
         """ posts a message to the Slack API
 
+        When slack.update_in_place is set and a message was already posted for key,
+        that message is edited with chat.update instead of posting a new one
+
         Parameters:
            msg (dict) : represents a message for python slack api client
+           key (str)  : identifies what the message is about, such as a build id
 
         Returns:
-           bool : true if slack API returned success
+           bool : true if slack API returned success, always true when delivered asynchronously
         """
+        return self.__delivery.submit(lambda: self.__post_message(msg, key))
 
-        resp = self.__client.api_call("chat.postMessage", **msg)
+    def delivery_stats(self):
+        """ returns queue depth, retry count and latency counters of message delivery
+
+        Returns:
+            (dict) : counter name to value
+        """
+        return self.__delivery.stats()
+
+    def __post_message(self, msg, key):
+        if key is None or self.__messages is None:
+            resp = self.__delivery.call("chat.postMessage", **msg)
+            print(resp)
+            return resp.get('ok', False)
+
+        posted = self.__messages.get(key)
+        if posted is not None:
+            resp = self.__delivery.call("chat.update", **dict(msg, channel=posted['channel'], ts=posted['ts']))
+            print(resp)
+            if resp.get('ok', False):
+                return True
+            # the original message may have been deleted, fall back to posting a new one
+
+        resp = self.__delivery.call("chat.postMessage", **msg)
         print(resp)
-        return resp.get('ok', False)
+        if resp.get('ok', False):
+            self.__messages.set(key, {'channel': resp.get('channel'), 'ts': resp.get('ts')})
+            return True
+
+        return False
 
     def verify_webhook(self, req):
-        """ Verifies req is from slack
+        """ Verifies req is from slack and was not seen before
         See: https://api.slack.com/docs/verifying-requests-from-slack
 
+        Stale and replayed requests are rejected before the body is read or hashed
+
         Parameter:
-            req (flask.Request) : the request object
+            req (WebhookRequest) : the request, a flask.Request is wrapped in a WebhookRequest
 
         Returns:
             (bool, str) : bool is true if request is verified, str is a log message when invalid request
         """
+        if not isinstance(req, WebhookRequest):
+            req = WebhookRequest(req)
+
+        if self.__max_request_age > 0:
+            try:
+                age = abs(self.__clock() - int(req.headers.get('X-Slack-Request-Timestamp', '')))
+            except ValueError:
+                age = float('inf')
+            if age > self.__max_request_age:
+                self.__webhook_stats['rejected_stale'] += 1
+                return (False, 'Slack request timestamp is older than slack.webhook.max_request_age')
+
+        signature = req.headers.get('X-Slack-Signature', '')
+        if self.__seen.get(signature) is not None:
+            self.__webhook_stats['rejected_replay'] += 1
+            return (False, 'Slack request was already received')
+
+        verified, err = req.verify(self.__signing_secret, self.__max_content_length)
+        if not verified:
+            self.__webhook_stats['rejected_invalid'] += 1
+            return (verified, err)
+
+        self.__seen.set(signature, True)
+        self.__webhook_stats['verified'] += 1
+        return (verified, err)
+
+    def webhook_stats(self):
+        """ returns counters of verified requests and of requests rejected as stale, replayed or invalid
 
-        if req.content_length > self.__max_content_length or req.content_length <= 0:
-            return (False, 'Webhook request body is greater than slack.webhook.max_content_length')
-
-        body = req.get_data(as_text=True)
-
-        ts = req.headers.get('X-Slack-Request-Timestamp', '')
-
-        base = Slack.VERSION + ':' + ts + ':' + body
-
-        sig = Slack.VERSION + '=' + hmac.new(
-            bytes(self.__signing_secret, 'utf-8'),
-            bytes(base, 'utf-8'),
-            'sha256'
-        ).hexdigest()
-
-        if hmac.compare_digest(sig, req.headers.get('X-Slack-Signature', '')):
-            return (True, '')
-
-        return (False, 'Slack signature did not match')
+        Returns:
+            (dict) : counter name to count
+        """
+        return dict(self.__webhook_stats)
 
     @staticmethod
     def is_interactive_message(data):
@@ -185,12 +332,15 @@ class Slack:
         """ Turns a Request into a dict of slack hook parameters
 
         Parameters:
-            req (Request) : flask Request object that triggered cloud function
+            req (Request) : flask Request object that triggered cloud function, or a WebhookRequest
 
         Returns:
             dict : slack hook parameters
 
         """
+        if isinstance(req, WebhookRequest):
+            return req.body()
+
         data = req.form.to_dict()
         payload = data.get('payload', '')
         if payload != '':
@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+"""
+   Small key/value stores used to remember state between invocations, such as which
+   slack message belongs to a build. Values must be json serializable.
+   Every store evicts entries older than `ttl` seconds and keeps at most `max_entries`
+"""
+
+
+class MemoryStore:
+    """
+     LRU store local to this function instance, lost when the instance is recycled
+    """
+
+    def __init__(self, ttl=86400, max_entries=10000, clock=time.time):
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__clock = clock
+        # key -> (expires, value), least recently used first
+        self.__data = OrderedDict()  # type: OrderedDict
+
+    def get(self, key, default=None):
+        entry = self.__data.get(key, None)
+        if entry is None:
+            return default
+
+        if entry[0] <= self.__clock():
+            del self.__data[key]
+            return default
+
+        self.__data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self.__data[key] = (self.__clock() + self.__ttl, value)
+        self.__data.move_to_end(key)
+
+        while len(self.__data) > self.__max_entries:
+            self.__data.popitem(last=False)
+
+    def delete(self, key):
+        self.__data.pop(key, None)
+
+    def scan(self, prefix, limit=None):
+        """ returns (key, value) pairs of unexpired keys starting with prefix, up to limit pairs """
+        now = self.__clock()
+        found = []
+        for key, (expires, value) in self.__data.items():
+            if expires > now and key.startswith(prefix):
+                found.append((key, value))
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def __len__(self):
+        return len(self.__data)
+
+
+class SqliteStore:
+    """
+     Store backed by a local sqlite file, can be shared by processes on the same host
+    """
+
+    # how many writes between removing expired and excess entries
+    EVICT_INTERVAL = 100
+
+    def __init__(self, path, table='state', ttl=86400, max_entries=10000, clock=time.time):
+        if not table.isidentifier():
+            raise ValueError('Invalid sqlite table name : %s' % table)
+
+        self.__table = table
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__clock = clock
+        self.__writes = 0
+
+        self.__db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.__db.execute('CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, value TEXT, expires REAL)' % table)
+        self.__db.execute('CREATE INDEX IF NOT EXISTS %s_expires ON %s (expires)' % (table, table))
+
+    def get(self, key, default=None):
+        row = self.__db.execute('SELECT value FROM %s WHERE key = ? AND expires > ?' % self.__table,
+                                (key, self.__clock())).fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        self.__db.execute('INSERT OR REPLACE INTO %s (key, value, expires) VALUES (?, ?, ?)' % self.__table,
+                          (key, json.dumps(value), self.__clock() + self.__ttl))
+
+        self.__writes += 1
+        if self.__writes % self.EVICT_INTERVAL == 0:
+            self.evict()
+
+    def delete(self, key):
+        self.__db.execute('DELETE FROM %s WHERE key = ?' % self.__table, (key,))
+
+    def scan(self, prefix, limit=None):
+        """ returns (key, value) pairs of unexpired keys starting with prefix, up to limit pairs """
+        # a range over the primary key instead of LIKE, which cannot use the index
+        query = 'SELECT key, value FROM %s WHERE key >= ? AND expires > ?' % self.__table
+        args = [prefix, self.__clock()]
+        if prefix != '':
+            query += ' AND key < ?'
+            args.append(prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        query += ' ORDER BY key LIMIT ?'
+        args.append(-1 if limit is None else limit)
+
+        return [(key, json.loads(value)) for key, value in self.__db.execute(query, args)]
+
+    def evict(self):
+        """ removes expired entries, then the entries closest to expiring above max_entries """
+        self.__db.execute('DELETE FROM %s WHERE expires <= ?' % self.__table, (self.__clock(),))
+        self.__db.execute('DELETE FROM %s WHERE key IN (SELECT key FROM %s ORDER BY expires DESC LIMIT -1 OFFSET ?)'
+                          % (self.__table, self.__table), (self.__max_entries,))
+
+    def __len__(self):
+        return self.__db.execute('SELECT COUNT(*) FROM %s' % self.__table).fetchone()[0]
+
+
+# backend name in config -> store class, other backends (firestore, redis) can be registered here
+BACKENDS = {
+    'memory': MemoryStore,
+    'sqlite': SqliteStore
+}
+
+
+def new_store(conf, table='state'):
+    """ creates a store from a config section
+
+    Parameters:
+        conf  (dict) : backend (memory or sqlite), path (sqlite only), ttl, max_entries
+        table (str)  : name of the sqlite table, lets several stores share one file
+
+    Returns:
+        a store with get, set, delete and scan methods
+    """
+    conf = conf or {}
+    backend = conf.get('backend', 'memory')
+    kwargs = {
+        'ttl': conf.get('ttl', 86400),
+        'max_entries': conf.get('max_entries', 10000)
+    }
+
+    if backend not in BACKENDS:
+        raise ValueError('Unknown state store backend : %s' % backend)
+
+    if backend == 'sqlite':
+        kwargs['path'] = conf.get('path', '/tmp/slackbuild.db')
+        kwargs['table'] = table
+
+    return BACKENDS[backend](**kwargs)
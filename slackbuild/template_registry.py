@@ -0,0 +1,72 @@
+import os.path
+from slackbuild.json_template import JsonTemplate
+
+
+class TemplateRegistry:
+    """
+     In memory cache of compiled message templates, keyed by filename
+     Templates are read from disk once and reused across warm invocations
+    """
+
+    TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'templates')
+
+    def __init__(self, directory=TEMPLATE_DIR, check_mtime=False):
+        self.__directory = directory
+        # only stat the template file on each lookup when explicitly asked to (local development)
+        self.__check_mtime = check_mtime
+        # filename -> (mtime, compiled template)
+        self.__templates = {}
+        self.__stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+
+    def preload(self, names):
+        """ loads and compiles templates ahead of the first render
+
+        Parameters:
+            names (iterable) : template filenames, missing files and invalid json are skipped
+        """
+        for name in names:
+            if name == '' or name in self.__templates:
+                continue
+            try:
+                self.__load(name)
+            except (OSError, ValueError):
+                # a misconfigured template should only fail the render that uses it
+                pass
+
+    def get(self, name):
+        """ returns the compiled template for a filename
+
+        Parameters:
+            name (str) : filename of a template in the templates directory
+
+        Returns:
+            (JsonTemplate) : compiled template
+        """
+        entry = self.__templates.get(name, None)
+
+        if entry is None:
+            self.__stats['misses'] += 1
+            return self.__load(name)
+
+        if self.__check_mtime and os.stat(self.__path(name)).st_mtime != entry[0]:
+            self.__stats['reloads'] += 1
+            return self.__load(name)
+
+        self.__stats['hits'] += 1
+        return entry[1]
+
+    def stats(self):
+        """ returns a copy of the hit/miss/reload counters """
+        return dict(self.__stats)
+
+    def __path(self, name):
+        return os.path.join(self.__directory, name)
+
+    def __load(self, name):
+        path = self.__path(name)
+        with open(path, 'r') as f:
+            template = JsonTemplate(f.read())
+            mtime = os.fstat(f.fileno()).st_mtime
+
+        self.__templates[name] = (mtime, template)
+        return template
@@ -0,0 +1,93 @@
+from slackbuild.build_status import BuildStatus
+from slackbuild.config import Config
+from slackbuild.state_store import new_store
+
+
+class Transitions:
+    """
+     Only notifies finished builds whose outcome differs from the previous finished build of the
+     same trigger and branch, such as a build that broke master or fixed it, instead of every build
+     Cancelled builds are not an outcome, they neither break nor continue a streak
+     Queued and working builds are suppressed since their outcome is not known yet, unless
+     in_progress is set. A build notified while in progress always gets its final notification,
+     so a message updated in place is never left showing an unfinished build
+    """
+
+    FINISHED = ('SUCCESS', 'FAILURE', 'INTERNAL_ERROR', 'TIMEOUT', 'CANCELLED')
+    # finished statuses that are compared with the previous build
+    OUTCOMES = ('SUCCESS', 'FAILURE', 'INTERNAL_ERROR', 'TIMEOUT')
+    FAILED = ('FAILURE', 'INTERNAL_ERROR', 'TIMEOUT')
+
+    def __init__(self, config: Config, store=None, progress_store=None):
+        conf = config.get('pubsub', {}).get('transitions', {})
+        self.__enabled = store is not None or conf.get('enabled', False)
+        # keep notifying every failure, only repeated successes are suppressed
+        self.__every_failure = conf.get('every_failure', False)
+        self.__in_progress = conf.get('in_progress', False)
+
+        if store is None and self.__enabled:
+            store = new_store(dict({'ttl': 30 * 86400, 'max_entries': 1000}, **conf.get('store', {})), table='transitions')
+        self.__store = store
+        # ids of the builds notified while in progress, a build runs for a day at most
+        if progress_store is None and self.__enabled and self.__in_progress:
+            progress_store = new_store(dict(dict({'max_entries': 1000}, **conf.get('store', {})), ttl=86400), table='transitions_progress')
+        self.__progress = progress_store
+        self.__stats = {'notified': 0, 'suppressed': 0}
+
+    def check(self, variables, status):
+        """ records the outcome of a finished build and decides if it is worth notifying
+
+        Sets previous_status, streak_length and build_transition in the variables of builds
+        that finished with an outcome
+
+        Parameters:
+            variables (dict) : variables from BuildStatus.toMessage
+            status    (str)  : build status from the message attributes
+
+        Returns:
+            (bool, dict) : true if the build should be notified, and the variables
+        """
+        if not self.__enabled:
+            return True, variables
+
+        build_id = variables.get('build_id', '')
+        if status not in Transitions.FINISHED:
+            notify = self.__in_progress
+            if notify:
+                self.__progress.set(build_id, True)
+            self.__stats['notified' if notify else 'suppressed'] += 1
+            return notify, variables
+
+        notify = False
+        if status in Transitions.OUTCOMES:
+            key = BuildStatus.source_key(variables)
+            previous, streak = self.__store.get(key, ['', 0])
+
+            streak = streak + 1 if previous == status else 1
+            self.__store.set(key, [status, streak])
+
+            variables['previous_status'] = previous
+            variables['streak_length'] = str(streak)
+            variables['build_transition'] = Transitions.transition(previous, status)
+            notify = streak == 1 or (self.__every_failure and status in Transitions.FAILED)
+
+        # the in progress notification of this build is finished even when its outcome is not news
+        if self.__progress is not None and self.__progress.get(build_id) is not None:
+            self.__progress.delete(build_id)
+            notify = True
+
+        self.__stats['notified' if notify else 'suppressed'] += 1
+        return notify, variables
+
+    def stats(self):
+        """ returns counters of notified and suppressed builds """
+        return dict(self.__stats)
+
+    @staticmethod
+    def transition(previous, status):
+        """ names a change of outcome, broken when a build fails after a success, fixed the other way around """
+        if previous == 'SUCCESS' and status in Transitions.FAILED:
+            return 'broken'
+        if previous in Transitions.FAILED and status == 'SUCCESS':
+            return 'fixed'
+        return ''
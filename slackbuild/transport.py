@@ -0,0 +1,93 @@
+"""
+   HTTP transports for Slack, each exposes the same api_call(method, **args) -> dict
+   interface as slackclient.SlackClient
+"""
+
+
+class WebApiTransport:
+    """
+     Slack Web API client reusing keep-alive connections across calls and warm invocations
+     See: https://api.slack.com/web
+    """
+
+    BASE_URL = 'https://slack.com/api/'
+
+    def __init__(self, token, base_url=BASE_URL, pool_size=4, timeout=10):
+        self.__base_url = base_url
+        self.__token = token
+        self.__pool_size = pool_size
+        self.__timeout = timeout
+        # created on first call, importing requests is slow and not every invocation posts to slack
+        self.__session = None
+
+    def api_call(self, method, **args):
+        """ calls a Slack Web API method with a json body
+
+        Parameters:
+            method (str) : Slack API method, such as chat.postMessage
+            args         : arguments to the API method
+
+        Returns:
+            (dict) : the json response, with the response headers under "headers"
+        """
+        if self.__session is None:
+            self.__session = new_session(self.__base_url, self.__pool_size)
+            self.__session.headers['Authorization'] = 'Bearer ' + self.__token
+
+        resp = self.__session.post(self.__base_url + method, json=args, timeout=self.__timeout)
+
+        if resp.status_code == 429:
+            body = {'ok': False, 'error': 'ratelimited'}
+        else:
+            body = resp.json()
+
+        # a requests CaseInsensitiveDict, Retry-After is found whatever the case slack sends it in
+        body['headers'] = resp.headers
+        return body
+
+
+class WebhookTransport:
+    """
+     Posts messages to a Slack incoming webhook, a single request with no token or channel lookup
+     Methods other than chat.postMessage are sent through the fallback transport
+     See: https://api.slack.com/incoming-webhooks
+    """
+
+    def __init__(self, url, fallback, timeout=10):
+        self.__url = url
+        self.__fallback = fallback
+        self.__timeout = timeout
+        self.__session = None
+
+    def api_call(self, method, **args):
+        if method != 'chat.postMessage':
+            return self.__fallback.api_call(method, **args)
+
+        if self.__session is None:
+            self.__session = new_session(self.__url, 1)
+
+        resp = self.__session.post(self.__url, json=args, timeout=self.__timeout)
+
+        # incoming webhooks answer with plain text instead of json
+        if resp.status_code == 200:
+            body = {'ok': True}
+        elif resp.status_code == 429:
+            body = {'ok': False, 'error': 'ratelimited'}
+        elif resp.status_code >= 500:
+            body = {'ok': False, 'error': 'service_unavailable'}
+        else:
+            body = {'ok': False, 'error': resp.text}
+
+        # a requests CaseInsensitiveDict, Retry-After is found whatever the case slack sends it in
+        body['headers'] = resp.headers
+        return body
+
+
+def new_session(url, pool_size):
+    """ creates a requests.Session keeping up to pool_size connections to url open """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount(url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    return session
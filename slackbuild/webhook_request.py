@@ -0,0 +1,77 @@
+import hmac
+import json
+from typing import Optional
+from urllib.parse import parse_qsl
+
+
+class WebhookRequest:
+    """
+     A request from slack whose body is read once as bytes and shared by signature
+     verification and parsing. The form and interactive message payload are only parsed
+     when asked for, so requests rejected by verify cost a single read and hmac
+    """
+
+    VERSION = b'v0'
+
+    def __init__(self, req):
+        self.headers = req.headers
+        # missing for chunked requests, which slack does not send
+        self.content_length = req.content_length or 0
+        self.__req = req
+        self.__raw = None  # type: Optional[bytes]
+        self.__body = None  # type: Optional[dict]
+
+    def raw(self):
+        """ returns the request body as bytes, read from the request on first call """
+        if self.__raw is None:
+            raw = self.__req.get_data(as_text=False)
+            self.__raw = raw.encode('utf-8') if isinstance(raw, str) else raw
+        return self.__raw
+
+    def verify(self, signing_secret: bytes, max_content_length):
+        """ checks the size of the request and its slack signature
+        See: https://api.slack.com/docs/verifying-requests-from-slack
+
+        Parameters:
+            signing_secret (bytes)   : slack app signing secret
+            max_content_length (int) : largest body accepted, in bytes
+
+        Returns:
+            (bool, str) : bool is true if request is verified, str is a log message when invalid request
+        """
+        if self.content_length > max_content_length or self.content_length <= 0:
+            return (False, 'Webhook request body is greater than slack.webhook.max_content_length')
+
+        # werkzeug never reads past Content-Length, so the body is not read for oversized requests
+        raw = self.raw()
+
+        # the signed base string is v0:timestamp:body, fed in parts instead of building a copy of the body
+        mac = hmac.new(signing_secret, WebhookRequest.VERSION + b':', 'sha256')
+        mac.update(self.headers.get('X-Slack-Request-Timestamp', '').encode('utf-8'))
+        mac.update(b':')
+        mac.update(raw)
+
+        sig = WebhookRequest.VERSION + b'=' + mac.hexdigest().encode('ascii')
+        if hmac.compare_digest(sig, self.headers.get('X-Slack-Signature', '').encode('utf-8')):
+            return (True, '')
+
+        return (False, 'Slack signature did not match')
+
+    def body(self):
+        """ returns the slack hook parameters, the json payload for interactive messages
+
+        Returns:
+            dict : slack hook parameters, parsed on first call
+        """
+        if self.__body is None:
+            data = {}  # type: dict
+            for key, value in parse_qsl(self.raw().decode('utf-8')):
+                # like werkzeug's form.to_dict(), the first value of a repeated key wins
+                data.setdefault(key, value)
+
+            payload = data.get('payload', '')
+            if payload != '':
+                data = json.loads(payload)
+            self.__body = data
+
+        return self.__body
@@ -0,0 +1,93 @@
+import base64
+import json
+import unittest
+from datetime import datetime
+from datetime import timezone
+from slackbuild.build_event import BuildEvent
+from slackbuild.build_status import BuildStatus
+
+
+def load(fixture):
+    with open('mocks/pubsub/%s' % fixture) as f:
+        return json.load(f)
+
+
+class TestBuildEvent(unittest.TestCase):
+
+    def test_attributes(self):
+        event = BuildEvent(load('success_triggered.json'))
+        self.assertEqual(event.build_id, 'cc905bd4-4611-40f7-9811-ae28003e8216')
+        self.assertEqual(event.status, 'SUCCESS')
+        self.assertFalse(event.oversized)
+
+        event = BuildEvent({})
+        self.assertEqual(event.build_id, 'UNKNOWN')
+        self.assertEqual(event.status, '')
+        self.assertEqual(event.get('projectId', 'none'), 'none')
+
+    def test_slots(self):
+        event = BuildEvent({})
+        with self.assertRaises(AttributeError):
+            event.extra = 1
+
+    def test_only_kept_fields(self):
+        event = BuildEvent(load('success_triggered.json'))
+
+        self.assertEqual(event.get('projectId'), 'my-project')
+        self.assertEqual(event.get('buildTriggerId'), 'e9328cda-ac3a-4af3-9625-532d47df9032')
+        self.assertEqual(event.get('sourceProvenance')['resolvedRepoSource']['repoName'], 'testrepo')
+        # unused fields are dropped after decoding
+        self.assertIsNone(event.get('results'))
+        self.assertIsNone(event.get('options'))
+        self.assertEqual(event.get('steps')[0]['timing'], {'startTime': '2019-01-20T21:09:30.568278630Z', 'endTime': '2019-01-20T21:09:33.072996875Z'})
+        # only what the slowest steps need is kept of each step
+        for step in event.get('steps'):
+            self.assertLessEqual(set(step), set(BuildEvent.STEP_FIELDS))
+        self.assertIn('name', event.get('steps')[0])
+
+    def test_lazy(self):
+        # invalid data is only noticed once a field is needed
+        event = BuildEvent({'attributes': {'buildId': 'a', 'status': 'QUEUED'}, 'data': '!!not base64!!'})
+        self.assertEqual(event.status, 'QUEUED')
+        self.assertIsNone(event.get('projectId'))
+
+        data = base64.b64encode(b'[1, 2]').decode('utf-8')
+        self.assertIsNone(BuildEvent({'data': data}).get('projectId'))
+
+    def test_max_size(self):
+        data = load('success_triggered.json')
+
+        event = BuildEvent(data, max_size=100)
+        self.assertTrue(event.oversized)
+        self.assertGreater(event.size, 100)
+        self.assertEqual(event.build_id, 'cc905bd4-4611-40f7-9811-ae28003e8216')
+        self.assertIsNone(event.get('projectId'))
+
+        msg, _ = BuildStatus.toMessage(data, {'pubsub': {'max_payload_size': 100}})
+        self.assertEqual(msg['build_id_short'], 'cc905bd4')
+        self.assertEqual(msg['build_status'], 'Finished successfully')
+        self.assertEqual(msg['project_id'], 'unknown project id')
+        self.assertEqual(msg['build_duration'], '')
+
+    def test_to_message(self):
+        data = load('success_triggered.json')
+        self.assertEqual(BuildStatus.toMessage(BuildEvent(data), {}), BuildStatus.toMessage(data, {}))
+
+    def test_parse_time(self):
+        self.assertEqual(BuildEvent.parse_time('2019-01-20T21:09:20.577629622Z'),
+                         datetime(2019, 1, 20, 21, 9, 20, 577629, tzinfo=timezone.utc))
+        self.assertEqual(BuildEvent.parse_time('2019-01-20T21:09:34.1Z'),
+                         datetime(2019, 1, 20, 21, 9, 34, 100000, tzinfo=timezone.utc))
+        self.assertEqual(BuildEvent.parse_time('2019-01-20T21:09:34Z'),
+                         datetime(2019, 1, 20, 21, 9, 34, tzinfo=timezone.utc))
+        # other offsets fall back to dateutil
+        self.assertEqual(BuildEvent.parse_time('2019-01-20T22:09:34+01:00'),
+                         datetime(2019, 1, 20, 21, 9, 34, tzinfo=timezone.utc))
+
+        self.assertIsNone(BuildEvent.parse_time(None))
+        self.assertIsNone(BuildEvent.parse_time(''))
+        self.assertIsNone(BuildEvent.parse_time('yesterday at noon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
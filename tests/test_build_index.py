@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from slackbuild.build_index import BuildIndex
+from slackbuild.build_status import BuildStatus
+from slackbuild.command import Command
+from slackbuild.config import Config
+from slackbuild.state_store import MemoryStore
+from slackbuild.state_store import SqliteStore
+
+
+class Mock_Clock():
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Mock_CancelCloudBuild():
+    """ records the build ids cancelled through projects().builds().cancel() """
+
+    def __init__(self):
+        self.cancelled = []
+
+    def projects(self):
+        return self
+
+    def builds(self):
+        return self
+
+    def cancel(self, projectId, id):
+        self.cancelled.append(id)
+        return self
+
+    def execute(self):
+        return {}
+
+
+def variables(build_id, **extra):
+    return dict({'build_id': build_id, 'repo_name': 'testrepo', 'revision': 'master'}, **extra)
+
+
+class TestBuildIndex(unittest.TestCase):
+
+    config = {'gcloud': {'project_id': 'myproject'}}
+
+    def setUp(self):
+        self.clock = Mock_Clock()
+
+    def new(self, store=None):
+        if store is None:
+            store = MemoryStore(clock=self.clock)
+        return BuildIndex(Config(config_override={}), store=store, clock=self.clock)
+
+    def test_disabled(self):
+        index = BuildIndex(Config(config_override={}))
+
+        index.record(variables('cc905bd4-4611-40f7-9811-ae28003e8216'), 'SUCCESS')
+        self.assertFalse(index.is_enabled())
+        self.assertEqual(index.resolve('cc905bd4'), (None, None))
+        self.assertIsNone(index.get('cc905bd4-4611-40f7-9811-ae28003e8216'))
+
+    def test_enabled_from_config(self):
+        index = BuildIndex(Config(config_override={'build_index': {'enabled': True}}))
+
+        index.record(variables('cc905bd4-4611-40f7-9811-ae28003e8216'), 'SUCCESS')
+        self.assertEqual(index.resolve('cc905bd4')[0], 'cc905bd4-4611-40f7-9811-ae28003e8216')
+
+    def test_record_pubsub(self):
+        index = self.new()
+
+        with open('mocks/pubsub/success_triggered.json') as f:
+            data = json.load(f)
+        build, _ = BuildStatus.toMessage(data, {})
+        index.record(build, data['attributes']['status'])
+
+        self.assertEqual(index.get('cc905bd4-4611-40f7-9811-ae28003e8216'), {
+            'status': 'SUCCESS',
+            'repo_name': 'testrepo',
+            'revision': '4f6fbcd4c4f7e90a0a290aae1e3e284eb770208d',
+            'trigger_id': 'e9328cda-ac3a-4af3-9625-532d47df9032',
+            'created': '2019-01-20T21:09:20.577629622Z',
+            'updated': 1000.0
+        })
+        self.assertEqual(index.resolve(build['build_id_short']), ('cc905bd4-4611-40f7-9811-ae28003e8216', None))
+
+        # messages without a build id are not recorded
+        index.record(BuildStatus.toMessage({}, {})[0], '')
+        self.assertIsNone(index.get('UNKNOWN'))
+
+    def test_resolve(self):
+        index = self.new()
+        index.record(variables('cc905bd4-4611-40f7-9811-ae28003e8216'), 'WORKING')
+        index.record(variables('cc905bd4-aaaa-40f7-9811-ae28003e8216'), 'WORKING')
+        index.record(variables('2a246431-3b50-4b00-8fc2-345f4d8f3fd8'), 'WORKING')
+
+        self.assertEqual(index.resolve('2A24'), ('2a246431-3b50-4b00-8fc2-345f4d8f3fd8', None))
+        self.assertEqual(index.resolve('cc905bd4-a'), ('cc905bd4-aaaa-40f7-9811-ae28003e8216', None))
+        self.assertEqual(index.resolve('ffffffff'), (None, None))
+        # too short to look up
+        self.assertEqual(index.resolve('2a2'), (None, None))
+
+        build_id, err = index.resolve('cc905bd4')
+        self.assertIsNone(build_id)
+        self.assertEqual(err, "Build ID cc905bd4 is ambiguous, it matches "
+                              "cc905bd4-4611-40f7-9811-ae28003e8216, cc905bd4-aaaa-40f7-9811-ae28003e8216")
+
+    def test_resolve_empty(self):
+        index = self.new()
+
+        with mock.patch('builtins.print') as printed:
+            self.assertEqual(index.resolve('cc905bd4'), (None, None))
+        self.assertIn("Build index is empty", printed.call_args[0][0])
+
+        index.record(variables('2a246431-3b50-4b00-8fc2-345f4d8f3fd8'), 'WORKING')
+        with mock.patch('builtins.print') as printed:
+            self.assertEqual(index.resolve('cc905bd4'), (None, None))
+        printed.assert_not_called()
+
+    def test_ambiguous_many(self):
+        index = self.new()
+        for i in range(BuildIndex.MAX_MATCHES + 3):
+            index.record(variables('abcd%04d-4611-40f7-9811-ae28003e8216' % i), 'QUEUED')
+
+        build_id, err = index.resolve('abcd')
+        self.assertIsNone(build_id)
+        self.assertTrue(err.endswith(" and more"))
+        self.assertEqual(err.count("abcd0"), BuildIndex.MAX_MATCHES)
+
+    def test_eviction(self):
+        index = self.new(store=MemoryStore(ttl=60, max_entries=2, clock=self.clock))
+
+        index.record(variables('11111111-4611-40f7-9811-ae28003e8216'), 'QUEUED')
+        index.record(variables('22222222-4611-40f7-9811-ae28003e8216'), 'QUEUED')
+        index.record(variables('33333333-4611-40f7-9811-ae28003e8216'), 'QUEUED')
+        self.assertEqual(index.resolve('1111'), (None, None))
+        self.assertEqual(index.resolve('3333')[0], '33333333-4611-40f7-9811-ae28003e8216')
+
+        self.clock.now += 61
+        self.assertEqual(index.resolve('3333'), (None, None))
+
+    def test_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.db')
+            clock = Mock_Clock()
+            writer = BuildIndex({}, store=SqliteStore(path, table='build_index', clock=clock), clock=clock)
+            reader = BuildIndex({}, store=SqliteStore(path, table='build_index', clock=clock), clock=clock)
+
+            writer.record(variables('cc905bd4-4611-40f7-9811-ae28003e8216'), 'WORKING')
+            writer.record(variables('cc905bd5-4611-40f7-9811-ae28003e8216'), 'WORKING')
+
+            self.assertEqual(reader.resolve('cc905bd4'), ('cc905bd4-4611-40f7-9811-ae28003e8216', None))
+            self.assertIsNotNone(reader.resolve('cc905bd')[1])
+            self.assertEqual(reader.get('cc905bd4-4611-40f7-9811-ae28003e8216')['status'], 'WORKING')
+
+    def test_command_short_id(self):
+        index = self.new()
+        index.record(variables('cc905bd4-4611-40f7-9811-ae28003e8216'), 'WORKING')
+        cloudbuild = Mock_CancelCloudBuild()
+
+        actual, success = Command.run(['cancel', 'cc905bd4'], cloudbuild, self.config, index)
+        self.assertTrue(success)
+        self.assertEqual(actual, "cancelled build")
+        self.assertEqual(cloudbuild.cancelled, ['cc905bd4-4611-40f7-9811-ae28003e8216'])
+
+        self.assertEqual(Command.validate(['cancel', 'cc905bd4'], self.config, index), (None, True))
+
+        # without an index, or for builds that were not recorded, short ids are still rejected
+        self.assertEqual(Command.run(['cancel', 'cc905bd4'], cloudbuild, self.config), ("Invalid build ID", False))
+        self.assertEqual(Command.validate(['retry', 'ffffffff'], self.config, index), ("Invalid build ID", False))
+
+    def test_command_ambiguous(self):
+        index = self.new()
+        index.record(variables('cc905bd4-4611-40f7-9811-ae28003e8216'), 'WORKING')
+        index.record(variables('cc905bd4-aaaa-40f7-9811-ae28003e8216'), 'WORKING')
+        cloudbuild = Mock_CancelCloudBuild()
+
+        actual, success = Command.run(['cancel', 'cc905bd4'], cloudbuild, self.config, index)
+        self.assertFalse(success)
+        self.assertTrue(actual.startswith("Build ID cc905bd4 is ambiguous"))
+        self.assertEqual(cloudbuild.cancelled, [])
+
+        actual, success = Command.validate(['status', 'cc905bd4'], self.config, index)
+        self.assertFalse(success)
+        self.assertTrue(actual.startswith("Build ID cc905bd4 is ambiguous"))
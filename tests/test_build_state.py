@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from slackbuild.build_state import BuildState
+from slackbuild.config import Config
+from slackbuild.state_store import SqliteStore
+
+
+class TestBuildState(unittest.TestCase):
+
+    config = Config(config_override={})
+
+    def test_forward(self):
+        states = BuildState(self.config)
+
+        for status in ['QUEUED', 'WORKING', 'SUCCESS']:
+            self.assertEqual(states.advance('a', status), (True, ''))
+
+        # statuses can be skipped
+        self.assertTrue(states.advance('b', 'FAILURE')[0])
+        self.assertEqual(states.stats(), {'accepted': 4, 'duplicate': 0, 'stale': 0})
+
+    def test_duplicate(self):
+        states = BuildState(self.config)
+
+        self.assertTrue(states.advance('a', 'SUCCESS')[0])
+        self.assertEqual(states.advance('a', 'SUCCESS'), (False, 'Build a was already notified as SUCCESS'))
+        self.assertEqual(states.advance('a', 'WORKING'), (False, 'Build a is already SUCCESS, ignoring WORKING'))
+        # other builds are not affected
+        self.assertTrue(states.advance('b', 'SUCCESS')[0])
+
+        self.assertEqual(states.stats(), {'accepted': 2, 'duplicate': 1, 'stale': 1})
+
+    def test_backwards(self):
+        states = BuildState(self.config)
+
+        self.assertTrue(states.advance('a', 'WORKING')[0])
+        self.assertFalse(states.advance('a', 'QUEUED')[0])
+        self.assertTrue(states.advance('a', 'CANCELLED')[0])
+        # a terminal status is final, even when another terminal status follows
+        self.assertFalse(states.advance('a', 'FAILURE')[0])
+
+    def test_ignored(self):
+        states = BuildState(self.config)
+
+        self.assertTrue(states.advance('UNKNOWN', 'SUCCESS')[0])
+        self.assertTrue(states.advance('UNKNOWN', 'SUCCESS')[0])
+        self.assertTrue(states.advance('a', 'NEW_STATUS')[0])
+        self.assertTrue(states.advance('a', 'NEW_STATUS')[0])
+
+        states = BuildState(Config(config_override={'pubsub': {'state': {'enabled': False}}}))
+        self.assertTrue(states.advance('a', 'SUCCESS')[0])
+        self.assertTrue(states.advance('a', 'SUCCESS')[0])
+
+    def test_bounded(self):
+        states = BuildState(Config(config_override={'pubsub': {'state': {'max_entries': 1}}}))
+
+        self.assertTrue(states.advance('a', 'SUCCESS')[0])
+        self.assertTrue(states.advance('b', 'SUCCESS')[0])
+        # a was evicted
+        self.assertTrue(states.advance('a', 'SUCCESS')[0])
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'state.db')
+
+            states = BuildState(self.config, store=SqliteStore(path, table='build_state'))
+            self.assertTrue(states.advance('a', 'SUCCESS')[0])
+
+            # a new instance with an empty memory cache
+            recycled = BuildState(Config(config_override={'pubsub': {'state': {'store': {'backend': 'sqlite', 'path': path}}}}))
+            self.assertFalse(recycled.advance('a', 'WORKING')[0])
+            self.assertFalse(recycled.advance('a', 'SUCCESS')[0])
+            self.assertTrue(recycled.advance('b', 'QUEUED')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import base64
 import json
 import unittest
 from slackbuild.build_status import BuildStatus
@@ -72,6 +73,53 @@ class TestBuildStatus(unittest.TestCase):
         self.assertEqual(msg.get('revision_sha_short', ''), '123')
         self.assertEqual(msg.get('revision_url', ''), 'http://github.com/mmercedes/testrepo/commits/123')
 
+    def test_timing(self):
+        f = open('mocks/pubsub/success_triggered.json')
+        data = json.load(f)
+        f.close()
+
+        msg, template = BuildStatus.toMessage(data, {})
+        self.assertEqual(msg['build_queue_time'], '2 seconds')
+        self.assertEqual(msg['build_phase_fetchsource'], '3 seconds')
+        self.assertEqual(msg['build_phase_build'], '2 seconds')
+        self.assertEqual(msg['build_phase_push'], '')
+        self.assertEqual(msg['build_slowest_steps'], 'gsutil (2s)')
+        self.assertEqual(msg['build_timing'], 'queued 2s | fetchsource 3s | build 2s | slowest: gsutil (2s)')
+
+    def test_timing_unknown(self):
+        msg, template = BuildStatus.toMessage({}, {})
+        for name in ['build_duration', 'build_queue_time', 'build_phase_fetchsource', 'build_phase_build',
+                     'build_phase_push', 'build_slowest_steps', 'build_timing']:
+            self.assertEqual(msg[name], '')
+
+    def test_timing_steps(self):
+        def span(start, end):
+            return {'startTime': '2019-01-20T%sZ' % start, 'endTime': '2019-01-20T%sZ' % end}
+
+        build = {
+            'createTime': '2019-01-19T10:00:00Z',
+            'startTime': '2019-01-19T10:00:30.5Z',
+            'finishTime': '2019-01-20T11:00:31Z',
+            'timing': {'PUSH': span('10:59:00', '11:00:31')},
+            'steps': [
+                {'name': 'gcr.io/cloud-builders/docker', 'timing': span('10:00:00', '10:00:10')},
+                {'name': 'gcr.io/cloud-builders/gsutil', 'id': 'upload', 'timing': span('10:00:10', '11:02:10')},
+                {'name': 'gcr.io/cloud-builders/docker', 'timing': span('10:00:00', '10:00:10')},
+                {'name': 'ubuntu', 'timing': span('10:00:00', '10:03:05')},
+                {'name': 'gcr.io/cloud-builders/git'}
+            ]
+        }
+        data = {'attributes': {'status': 'SUCCESS'}, 'data': base64.b64encode(json.dumps(build).encode('utf-8'))}
+
+        msg, template = BuildStatus.toMessage(data, {'slack': {'slowest_steps': 3}})
+        # durations longer than a day are not truncated to the seconds of the last day
+        self.assertEqual(msg['build_duration'], '90000 seconds')
+        self.assertEqual(msg['build_queue_time'], '30 seconds')
+        self.assertEqual(msg['build_phase_push'], '91 seconds')
+        # ties keep the order of the steps
+        self.assertEqual(msg['build_slowest_steps'], 'upload (1h 02m), ubuntu (3m 05s), docker (10s)')
+        self.assertEqual(msg['build_timing'], 'queued 30s | push 1m 31s | slowest: upload (1h 02m), ubuntu (3m 05s), docker (10s)')
+
     def test_template_config(self):
 
         for status in BuildStatus.statuses.keys():
@@ -0,0 +1,153 @@
+import threading
+import unittest
+import httplib2
+from googleapiclient.errors import HttpError
+from slackbuild.cloudbuild import CloudBuild
+from slackbuild.command import Command
+
+
+class TestCloudBuild(unittest.TestCase):
+
+    def test_new_client(self):
+        client = CloudBuild.new_client(http=httplib2.Http())
+        method = client.projects().builds().cancel(projectId='myproject', id='12345678-9012-3456-7890-123456789012')
+
+        self.assertEqual(method.method, 'POST')
+        self.assertEqual(method.uri, 'https://cloudbuild.googleapis.com/v1/projects/myproject/builds/12345678-9012-3456-7890-123456789012:cancel?alt=json')
+
+    def test_lazy(self):
+        created = []
+
+        def factory(http):
+            created.append(1)
+            return CloudBuild.new_client(http=http)
+
+        cloudbuild = CloudBuild(factory=factory, http_factory=httplib2.Http)
+        self.assertEqual(created, [])
+
+        cloudbuild.projects().builds()
+        cloudbuild.projects().triggers()
+        self.assertEqual(created, [1])
+
+    def test_client_per_thread(self):
+        cloudbuild = CloudBuild(factory=Mock_Client, http_factory=object)
+        clients = []
+
+        def run():
+            clients.append(cloudbuild.client())
+            clients.append(cloudbuild.client())
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        run()
+
+        self.assertIs(clients[0], clients[1])
+        self.assertIs(clients[2], clients[3])
+        self.assertIsNot(clients[0], clients[2])
+        self.assertEqual(cloudbuild.stats()['clients'], 2)
+
+    def test_reconnect(self):
+        cloudbuild = CloudBuild(factory=Mock_Client, http_factory=object, sleep=lambda s: None)
+        stale = cloudbuild.http()
+        self.assertIs(cloudbuild.client().http, stale)
+
+        # first attempt fails on the stale connection, the retry uses the new client
+        request = Mock_Request([ConnectionResetError(104, 'Connection reset by peer'), {'done': True}])
+        self.assertEqual(cloudbuild.execute(request, idempotent=True), {'done': True})
+
+        self.assertEqual(request.https[0], None)
+        self.assertIsNot(request.https[1], stale)
+        self.assertIs(request.https[1], cloudbuild.http())
+        self.assertEqual(cloudbuild.stats(), {'clients': 2, 'reconnects': 1, 'retries': 1})
+
+    def test_reconnect_not_idempotent(self):
+        cloudbuild = CloudBuild(factory=Mock_Client, http_factory=object, sleep=lambda s: None)
+        stale = cloudbuild.http()
+
+        # the request may have reached the API, it is not sent again but the next one gets a new connection
+        request = Mock_Request([ConnectionResetError(104, 'reset'), {}])
+        with self.assertRaises(ConnectionResetError):
+            cloudbuild.execute(request)
+        self.assertEqual(len(request.https), 1)
+        self.assertIsNot(cloudbuild.http(), stale)
+        self.assertEqual(cloudbuild.stats(), {'clients': 2, 'reconnects': 1, 'retries': 0})
+
+        # a refused connection never sent the request, it is retried once
+        request = Mock_Request([ConnectionRefusedError(111, 'refused'), {'done': True}])
+        self.assertEqual(cloudbuild.execute(request), {'done': True})
+        request = Mock_Request([ConnectionRefusedError(111, 'refused'), ConnectionRefusedError(111, 'refused'), {}])
+        with self.assertRaises(ConnectionRefusedError):
+            cloudbuild.execute(request)
+
+    def test_retry_idempotent(self):
+        slept = []
+        cloudbuild = CloudBuild(factory=Mock_Client, http_factory=object, max_retries=2, sleep=slept.append)
+        unavailable = HttpError(Mock_Response(503, "Unavailable"), b'', "https://cloudbuild.googleapis.com/v1/projects/myproject/builds")
+
+        request = Mock_Request([unavailable, BrokenPipeError(32, 'Broken pipe'), {}])
+        self.assertEqual(cloudbuild.execute(request, idempotent=True), {})
+        self.assertEqual(len(slept), 2)
+        self.assertEqual(cloudbuild.stats()['retries'], 2)
+
+        request = Mock_Request([unavailable, unavailable, unavailable, {}])
+        with self.assertRaises(HttpError):
+            cloudbuild.execute(request, idempotent=True)
+
+        # not retried, the build may have been created
+        request = Mock_Request([unavailable, {}])
+        with self.assertRaises(HttpError):
+            cloudbuild.execute(request)
+
+    def test_command(self):
+        cloudbuild = CloudBuild(factory=Mock_Client, http_factory=object, sleep=lambda s: None)
+        request = Mock_Request([ConnectionResetError(104, 'reset'), {}])
+        cloudbuild.client().request = request
+
+        # a cancel that may have been sent is reported instead of sent again
+        actual, success = Command.run(["cancel", "12345678-9012-3456-7890-123456789012"], cloudbuild, {"gcloud": {"project_id": "myproject"}})
+        self.assertFalse(success)
+        self.assertEqual(len(request.https), 1)
+        self.assertEqual(cloudbuild.stats()['reconnects'], 1)
+
+
+class Mock_Client():
+
+    def __init__(self, http=None):
+        self.http = http
+        self.request = None
+
+    def projects(self):
+        return self
+
+    def builds(self):
+        return self
+
+    def cancel(self, **kwargs):
+        return self.request
+
+
+class Mock_Request():
+    """ raises or returns the given results in order, recording the http object used each time """
+
+    def __init__(self, results):
+        self.results = results
+        self.https = []
+
+    def execute(self, http=None):
+        self.https.append(http)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class Mock_Response():
+
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+if __name__ == '__main__':
+    unittest.main()
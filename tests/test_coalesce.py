@@ -0,0 +1,69 @@
+import unittest
+from slackbuild.coalesce import Coalescer
+from slackbuild.config import Config
+from slackbuild.state_store import MemoryStore
+
+
+def event(build_id, status):
+    return {'attributes': {'buildId': build_id, 'status': status}}
+
+
+class Mock_Clock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCoalescer(unittest.TestCase):
+
+    config = Config(config_override={'pubsub': {'coalesce': {'window': 2}}})
+
+    def new(self):
+        clock = Mock_Clock()
+        return Coalescer(self.config, store=MemoryStore(), clock=clock), clock
+
+    def test_disabled(self):
+        coalescer = Coalescer(Config(config_override={}))
+
+        self.assertTrue(coalescer.offer(event('a', 'QUEUED')))
+        self.assertTrue(coalescer.offer(event('a', 'WORKING')))
+        self.assertTrue(coalescer.offer({}))
+
+    def test_terminal_never_skipped(self):
+        coalescer, _ = self.new()
+
+        self.assertTrue(coalescer.offer(event('a', 'QUEUED')))
+        for status in Coalescer.TERMINAL_STATUSES:
+            self.assertTrue(coalescer.offer(event('a', status)))
+
+    def test_within_window(self):
+        coalescer, clock = self.new()
+
+        self.assertTrue(coalescer.offer(event('a', 'QUEUED')))
+        clock.now += 1
+        self.assertFalse(coalescer.offer(event('a', 'WORKING')))
+        self.assertTrue(coalescer.offer(event('a', 'SUCCESS')))
+
+    def test_after_window(self):
+        coalescer, clock = self.new()
+
+        self.assertTrue(coalescer.offer(event('a', 'QUEUED')))
+        clock.now += 2
+        self.assertTrue(coalescer.offer(event('a', 'WORKING')))
+        # the window starts again from the last notified event
+        clock.now += 1
+        self.assertFalse(coalescer.offer(event('a', 'WORKING')))
+
+    def test_builds_independent(self):
+        coalescer, _ = self.new()
+
+        self.assertTrue(coalescer.offer(event('a', 'QUEUED')))
+        self.assertTrue(coalescer.offer(event('b', 'QUEUED')))
+        self.assertFalse(coalescer.offer(event('a', 'WORKING')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 import json
+import threading
+import time
 import unittest
+from unittest import mock
 from slackbuild.config import Config
 from slackbuild.command import Command
 from slackbuild.slack import Slack
@@ -135,6 +138,332 @@ class TestCommand(unittest.TestCase):
         self.assertFalse(success)
         self.assertEqual("Server error", actual)
 
+    def test_run_batch(self):
+        ids = ["12345678-9012-3456-7890-12345678901%d" % i for i in range(3)]
+        err = HttpError(Mock_Response("404", "Entity not found"), b'', "https://cloudbuild.googleapis.com/v1/projects/myproject/builds/1234:cancel")
+
+        cloudbuild = Mock_BatchCloudBuild()
+        actual, success = Command.run(["cancel"] + ids + [ids[0]], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual(actual, "\n".join(["%s : cancelled" % i for i in ids] + ["cancelled 3 of 3 builds"]))
+        # one batch, duplicate IDs only cancelled once
+        self.assertEqual(cloudbuild.batches, [[("cancel", {"projectId": "myproject", "id": i}) for i in ids]])
+
+        cloudbuild = Mock_BatchCloudBuild(errors={ids[1]: err})
+        actual, success = Command.run(["retry"] + ids, cloudbuild, self.config_override)
+        self.assertFalse(success)
+        self.assertEqual(actual, "\n".join([
+            "%s : submitted retry" % ids[0],
+            "%s : no build found in myproject" % ids[1],
+            "%s : submitted retry" % ids[2],
+            "submitted retry 2 of 3 builds"
+        ]))
+        self.assertEqual(cloudbuild.batches, [[("retry", {"projectId": "myproject", "id": i}) for i in ids]])
+
+        actual, success = Command.run(["cancel", ids[0], "1234"], Mock_BatchCloudBuild(), self.config_override)
+        self.assertFalse(success)
+        self.assertEqual(actual, "Invalid build ID 1234")
+
+    def test_run_cancel_all_working(self):
+        ids = ["12345678-9012-3456-7890-12345678901%d" % i for i in range(3)]
+        pages = [{"builds": [{"id": ids[0]}, {"id": ids[1]}], "nextPageToken": "a"}, {"builds": [{"id": ids[2]}]}]
+
+        cloudbuild = Mock_BatchCloudBuild(pages=pages)
+        actual, success = Command.run(["cancel", "--all-working"], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual(actual.split("\n")[-1], "cancelled 3 of 3 builds")
+        self.assertEqual(cloudbuild.batches, [[("cancel", {"projectId": "myproject", "id": i}) for i in ids]])
+        self.assertEqual(cloudbuild.lists, [{"projectId": "myproject", "pageSize": 100, "filter": 'status="WORKING" OR status="QUEUED"'}])
+
+        cloudbuild = Mock_BatchCloudBuild(pages=[{}])
+        actual, success = Command.run(["cancel", "--all-working"], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual(actual, "No builds in progress in myproject")
+        self.assertEqual(cloudbuild.batches, [])
+
+        actual, success = Command.run(["retry", "--all-working"], cloudbuild, self.config_override)
+        self.assertFalse(success)
+        self.assertEqual(actual, "Invalid build ID")
+
+    def test_run_list(self):
+        builds = [
+            {"id": "aaaaaaaa-1", "status": "SUCCESS", "buildTriggerId": "12345678-9012-3456-7890-123456789012",
+             "source": {"repoSource": {"branchName": "master"}}, "createTime": "2019-01-20T21:09:20.577629622Z"},
+            {"id": "bbbbbbbb-2", "status": "FAILURE", "substitutions": {"BRANCH_NAME": "dev"}, "createTime": "2019-01-20T21:08:00Z"},
+            {"id": "cccccccc-3", "status": "SUCCESS", "buildTriggerId": "12345678-9012-3456-7890-123456789012",
+             "source": {"repoSource": {"branchName": "master"}}, "createTime": "2019-01-20T21:07:00Z"}
+        ]
+        pages = [{"builds": builds[:2], "nextPageToken": "a"}, {"builds": builds[2:]}]
+        Command.clear_cache()
+
+        # stops paging once enough builds were found
+        cloudbuild = Mock_BatchCloudBuild(pages=pages)
+        actual, success = Command.run(["list", "limit=2"], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual(actual.split("\n"), [
+            "aaaaaaaa  SUCCESS        testrepo             master               2019-01-20 21:09",
+            "bbbbbbbb  FAILURE        manual               dev                  2019-01-20 21:08"
+        ])
+        self.assertEqual(cloudbuild.lists, [{"projectId": "myproject", "pageSize": 4, "filter": ""}])
+        self.assertEqual(cloudbuild.pages_read, 1)
+
+        # the same query is answered from the cache
+        actual, success = Command.run(["list", "limit=2"], cloudbuild, self.config_override)
+        self.assertEqual(len(actual.split("\n")), 2)
+        self.assertEqual(cloudbuild.pages_read, 1)
+
+        # branch is matched while paging, trigger and status are sent as a filter
+        cloudbuild = Mock_BatchCloudBuild(pages=pages)
+        actual, success = Command.run(["list", "trigger=testrepo", "status=success", "branch=master"], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual([line.split(" ")[0] for line in actual.split("\n")], ["aaaaaaaa", "cccccccc"])
+        self.assertEqual(cloudbuild.lists[0]["filter"], 'trigger_id="12345678-9012-3456-7890-123456789012" AND status="SUCCESS"')
+        self.assertEqual(cloudbuild.lists[0]["pageSize"], 100)
+        self.assertEqual(cloudbuild.pages_read, 2)
+
+        for argv in (["list", "foo"], ["list", "limit=0"], ["list", "status=foo"], ["list", "trigger=foo"]):
+            actual, success = Command.run(argv, cloudbuild, self.config_override)
+            self.assertFalse(success)
+
+        # cancelling a build clears cached lists
+        cloudbuild = Mock_CloudBuild('cloudbuild.projects.builds.cancel.execute',
+                                     {'projectId': 'myproject', 'id': '12345678-9012-3456-7890-123456789012'}, {})
+        self.assertTrue(Command.run(["cancel", "12345678-9012-3456-7890-123456789012"], cloudbuild, self.config_override)[1])
+        cloudbuild = Mock_BatchCloudBuild(pages=[{}])
+        actual, success = Command.run(["list", "limit=2"], cloudbuild, self.config_override)
+        self.assertEqual(actual, "No builds found")
+
+    def test_run_list_branch_truncated(self):
+        other = {"id": "aaaaaaaa-1", "status": "SUCCESS", "source": {"repoSource": {"branchName": "master"}}, "createTime": "2019-01-20T21:09:20Z"}
+        pages = [{"builds": [other], "nextPageToken": str(i)} for i in range(Command.MAX_LIST_PAGES + 2)]
+        Command.clear_cache()
+
+        # a branch without recent builds does not page through the whole history
+        cloudbuild = Mock_BatchCloudBuild(pages=pages)
+        actual, success = Command.run(["list", "branch=dev"], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual(actual, "No builds found\nOnly the latest %d pages of builds were searched for branch dev, "
+                                 "add trigger= or status= to search further back" % Command.MAX_LIST_PAGES)
+        self.assertEqual(cloudbuild.pages_read, Command.MAX_LIST_PAGES)
+
+        # other lists read every page
+        Command.clear_cache()
+        cloudbuild = Mock_BatchCloudBuild(pages=pages)
+        actual, success = Command.run(["list", "limit=50"], cloudbuild, self.config_override)
+        self.assertEqual(len(actual.split("\n")), len(pages))
+        self.assertEqual(cloudbuild.pages_read, len(pages))
+
+    def test_run_status(self):
+        build = {"id": "12345678-9012-3456-7890-123456789012", "status": "WORKING", "buildTriggerId": "12345678-9012-3456-7890-123456789012",
+                 "source": {"repoSource": {"branchName": "master"}}, "createTime": "2019-01-20T21:09:20Z", "logUrl": "http://logs"}
+        Command.clear_cache()
+
+        cloudbuild = Mock_BatchCloudBuild(pages=[build])
+        actual, success = Command.run(["status", build["id"]], cloudbuild, self.config_override)
+        self.assertTrue(success)
+        self.assertEqual(actual, "\n".join([
+            "ID: 12345678-9012-3456-7890-123456789012",
+            "Status: In progress",
+            "Trigger: testrepo",
+            "Branch: master",
+            "Created: 2019-01-20 21:09",
+            "Logs: http://logs"
+        ]))
+
+        Command.run(["status", build["id"]], cloudbuild, self.config_override)
+        self.assertEqual(cloudbuild.gets, [{"projectId": "myproject", "id": build["id"]}])
+
+        err = HttpError(Mock_Response("404", "Entity not found"), b'', "https://cloudbuild.googleapis.com/v1/projects/myproject/builds/1234")
+        cloudbuild = Mock_CloudBuild('cloudbuild.projects.builds.get.execute', {'projectId': 'myproject', 'id': '12345678-9012-3456-7890-123456789000'}, None, error=err)
+        actual, success = Command.run(["status", "12345678-9012-3456-7890-123456789000"], cloudbuild, self.config_override)
+        self.assertFalse(success)
+        self.assertEqual(actual, "No build found in myproject with ID 12345678-9012-3456-7890-123456789000")
+
+        actual, success = Command.run(["status"], cloudbuild, self.config_override)
+        self.assertEqual(actual, "Usage: status <buildId>")
+
+    def test_reset(self):
+        pages = [{"builds": [{"id": "aaaaaaaa-1", "status": "SUCCESS"}]}]
+        Command.clear_cache()
+        Command.run(["list"], Mock_BatchCloudBuild(pages=pages), self.config_override)
+        Command.run(["trigger", "web,api", "master"], Mock_TriggerCloudBuild(),
+                    {"gcloud": {"project_id": "myproject", "triggers": {"api": "api-trigger", "web": "web-trigger"}}})
+
+        # after a config reload, nothing is answered from the cache of the previous config
+        Command.reset()
+        cloudbuild = Mock_BatchCloudBuild(pages=pages)
+        Command.run(["list"], cloudbuild, self.config_override)
+        self.assertEqual(cloudbuild.pages_read, 1)
+
+    def test_trigger_ids(self):
+        aliases = {"api": "api-trigger", "web": "web-trigger", "services": ["api", "web", "missing"]}
+        self.assertEqual(Command.trigger_ids(["services"], aliases), frozenset(["api-trigger", "web-trigger", "missing"]))
+        self.assertEqual(Command.trigger_ids(["api", "1234"], aliases), frozenset(["api-trigger", "1234"]))
+        self.assertEqual(Command.trigger_ids([], aliases), frozenset())
+
+    def test_run_trigger_fan_out_sync_deadline(self):
+        config = {"gcloud": {"project_id": "myproject", "triggers": {"api": "api-trigger", "web": "web-trigger"}}}
+
+        # slack waits for the answer, the default deadline would outlast its 3 second timeout
+        with mock.patch.object(Command, "SYNC_DEADLINE", 0.2):
+            actual, success = Command.run(["trigger", "web,api", "master"], Mock_TriggerCloudBuild(delays={"web-trigger": 1}), config)
+        self.assertFalse(success)
+        self.assertEqual(actual.split("\n")[0], "web : still pending after 0.2 seconds, check /builds list")
+
+        # the answer is posted to the response_url, the configured deadline applies
+        config["slack"] = {"webhook": {"deferred": True}}
+        config["gcloud"]["command_deadline"] = 5
+        with mock.patch.object(Command, "SYNC_DEADLINE", 0.2):
+            actual, success = Command.run(["trigger", "web,api", "master"], Mock_TriggerCloudBuild(delays={"web-trigger": 0.5}), config)
+        self.assertTrue(success)
+
+    def test_run_trigger_fan_out(self):
+        config = {
+            "gcloud": {
+                "project_id": "myproject",
+                "command_deadline": 0.5,
+                "triggers": {
+                    "api": "api-trigger",
+                    "web": "web-trigger",
+                    "worker": "worker-trigger",
+                    "services": ["api", "worker"]
+                }
+            }
+        }
+        err = HttpError(Mock_Response("404", "Entity not found"), b'', "https://cloudbuild.googleapis.com/v1/projects/myproject/triggers/1234:run")
+
+        cloudbuild = Mock_TriggerCloudBuild()
+        actual, success = Command.run(["trigger", "web,services,api", "master"], cloudbuild, config)
+        self.assertTrue(success)
+        self.assertEqual(actual, "web : submitted\napi : submitted\nworker : submitted\nsubmitted 3 of 3 trigger requests for master")
+        self.assertEqual(sorted(cloudbuild.runs, key=lambda r: r["triggerId"]), [
+            {"projectId": "myproject", "triggerId": t, "body": {"branchName": "master"}} for t in ["api-trigger", "web-trigger", "worker-trigger"]
+        ])
+        # ran concurrently on other threads
+        self.assertNotIn(threading.get_ident(), cloudbuild.threads)
+
+        cloudbuild = Mock_TriggerCloudBuild(errors={"worker-trigger": err}, delays={"web-trigger": 2})
+        actual, success = Command.run(["trigger", "web,services", "master"], cloudbuild, config)
+        self.assertFalse(success)
+        self.assertEqual(actual, "\n".join([
+            "web : still pending after 0.5 seconds, check /builds list",
+            "api : submitted",
+            "worker : no trigger found with ID worker-trigger",
+            "submitted 1 of 3 trigger requests for master, 1 still pending"
+        ]))
+
+        actual, success = Command.run(["trigger", "web,foo,bar", "master"], cloudbuild, config)
+        self.assertFalse(success)
+        self.assertEqual(actual, "Unknown trigger alias : foo, bar")
+
+        actual, success = Command.run(["trigger", "services"], cloudbuild, config)
+        self.assertFalse(success)
+        self.assertEqual(actual, "Usage: trigger <alias> <branch>")
+
+
+class Mock_TriggerCloudBuild():
+    """ thread safe cloudbuild client for projects().triggers().run() """
+
+    def __init__(self, errors={}, delays={}):
+        self.errors = errors
+        self.delays = delays
+        self.runs = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def projects(self):
+        return self
+
+    def triggers(self):
+        return self
+
+    def run(self, **kwargs):
+        with self.lock:
+            self.runs.append(kwargs)
+            self.threads.add(threading.get_ident())
+        return Mock_TriggerRun(self, kwargs["triggerId"])
+
+
+class Mock_TriggerRun():
+
+    def __init__(self, cloudbuild, triggerId):
+        self.cloudbuild = cloudbuild
+        self.triggerId = triggerId
+
+    def execute(self):
+        time.sleep(self.cloudbuild.delays.get(self.triggerId, 0))
+        if self.triggerId in self.cloudbuild.errors:
+            raise self.cloudbuild.errors[self.triggerId]
+        return {}
+
+
+class Mock_BatchCloudBuild():
+    """ cloudbuild client supporting batched cancel/retry and paginated builds.list """
+
+    def __init__(self, errors={}, pages=[]):
+        self.errors = errors
+        self.pages = pages
+        self.batches = []
+        self.lists = []
+        self.gets = []
+        self.pages_read = 0
+
+    def projects(self):
+        return self
+
+    def builds(self):
+        return self
+
+    def cancel(self, **kwargs):
+        return ("cancel", kwargs)
+
+    def retry(self, **kwargs):
+        return ("retry", kwargs)
+
+    def list(self, **kwargs):
+        self.lists.append(kwargs)
+        return Mock_Method(self, 0)
+
+    def get(self, **kwargs):
+        self.gets.append(kwargs)
+        return Mock_Method(self, 0)
+
+    def list_next(self, request, response):
+        if request.page + 1 >= len(self.pages):
+            return None
+        return Mock_Method(self, request.page + 1)
+
+    def new_batch_http_request(self, callback):
+        self.batches.append([])
+        return Mock_Batch(self, callback)
+
+
+class Mock_Batch():
+
+    def __init__(self, cloudbuild, callback):
+        self.cloudbuild = cloudbuild
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.cloudbuild.batches[-1].append(request)
+        self.requests.append(request_id)
+
+    def execute(self):
+        for request_id in self.requests:
+            self.callback(request_id, {}, self.cloudbuild.errors.get(request_id, None))
+
+
+class Mock_Method():
+
+    def __init__(self, cloudbuild, page):
+        self.cloudbuild = cloudbuild
+        self.page = page
+
+    def execute(self):
+        self.cloudbuild.pages_read += 1
+        return self.cloudbuild.pages[self.page]
+
 
 class Mock_CloudBuild():
 
@@ -1,5 +1,18 @@
+import json
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 from slackbuild.config import Config
+from slackbuild.template_registry import TemplateRegistry
+
+
+def write(filename, contents, mtime=None):
+    with open(filename, 'w') as f:
+        f.write(contents)
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
 
 
 class TestConfig(unittest.TestCase):
@@ -43,3 +56,153 @@ class TestConfig(unittest.TestCase):
         conf = Config(filename=configfile)
         self.assertEqual(conf.get('slack', {}).get('channel', ''), '#test')
         self.assertEqual(conf.get('gcloud', {}).get('project_id', ''), 'my-project')
+        self.assertEqual(conf.validate(), [])
+
+    def test_value(self):
+        conf = Config(config_override={'slack': {'channel': '#test', 'webhook': {'max_request_age': 60, 'deferred': True}}, 'rate': 2})
+        self.assertEqual(conf.value('slack.channel', ''), '#test')
+        self.assertEqual(conf.value('slack.webhook.max_request_age', 300), 60)
+        self.assertEqual(conf.value('slack.webhook.max_request_age', 300), 60)
+        self.assertEqual(conf.value('slack.webhook.replay_cache_size', 10000), 10000)
+        self.assertEqual(conf.value('slack.channel.name', 'none'), 'none')
+        self.assertEqual(conf.value('rate', 1.0), 2)
+        self.assertTrue(conf.value('slack.webhook.deferred', False))
+        self.assertEqual(conf.value('slack.webhook')['max_request_age'], 60)
+
+        with self.assertRaises(ValueError):
+            conf.value('slack.channel', 0)
+        with self.assertRaises(ValueError):
+            conf.value('slack.webhook.deferred', 0)
+        with self.assertRaises(ValueError):
+            conf.value('slack.webhook.max_request_age', False)
+
+    def test_validate(self):
+        conf = Config(config_override={
+            'slack': {
+                'templates': {'default': 'default.json', 'failure': 'missing.json'},
+                'routes': [{'repo': 'testrepo', 'channels': ['#team', ''], 'template': 'nope.json'}],
+                'digest': {'statuses': ['success']}
+            },
+            'gcloud': {
+                'triggers': {
+                    'testrepo': '12345678-9012-3456-7890-123456789012',
+                    'typo': '12345678-9012-3456-7890',
+                    'services': ['testrepo', 'api']
+                }
+            }
+        })
+        self.assertEqual(conf.validate(), [
+            'slack.channel is required',
+            'slack.templates.failure : no template named missing.json in templates/',
+            'slack.routes[0].template : no template named nope.json in templates/',
+            "slack.routes[0].channels : '' is not a channel",
+            'gcloud.triggers.typo : 12345678-9012-3456-7890 is not a trigger id',
+            'gcloud.triggers.services : api are not trigger aliases'
+        ])
+
+    def test_validate_invalid_template(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, 'count.json'), 'w') as f:
+                f.write('{"n": ${count}}')
+            conf = Config(config_override={'slack': {'channel': '#builds', 'templates': {'success': 'count.json'}}})
+            with mock.patch.object(TemplateRegistry, 'TEMPLATE_DIR', directory):
+                errors = conf.validate()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('slack.templates.success : count.json is not valid json : '))
+
+
+class TestConfigSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'config.yaml')
+        self.snapshot = os.path.join(self.directory, 'config.snapshot.json')
+        write(self.filename, "slack:\n  channel: '#test'\n", mtime=1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compile(self):
+        self.assertEqual(Config.compile(self.filename), self.snapshot)
+        with open(self.snapshot) as f:
+            compiled = json.load(f)
+        # secrets from the environment are not written
+        self.assertEqual(compiled['data'], {'slack': {'channel': '#test'}})
+
+        # loaded from the snapshot, with the secrets from the environment
+        with open(self.snapshot, 'w') as f:
+            json.dump(dict(compiled, data={'slack': {'channel': '#snapshot'}}), f)
+        conf = Config(self.filename)
+        self.assertEqual(conf.get('slack')['channel'], '#snapshot')
+        self.assertIn('token', conf.get('slack'))
+
+    def test_stale_snapshot(self):
+        Config.compile(self.filename)
+        # same mtime, different contents
+        write(self.filename, "slack:\n  channel: '#edited'\n", mtime=1000)
+        self.assertEqual(Config(self.filename).get('slack')['channel'], '#edited')
+
+    def test_compile_invalid(self):
+        write(self.filename, "slack:\n  templates:\n    default: 'missing.json'\n")
+        with self.assertRaises(ValueError):
+            Config.compile(self.filename)
+        self.assertFalse(os.path.exists(self.snapshot))
+
+    def test_reload(self):
+        conf = Config(self.filename)
+        write(self.filename, "slack:\n  channel: '#edited'\n", mtime=2000)
+        # only when config_reload is set
+        self.assertFalse(conf.reload())
+        self.assertEqual(conf.value('slack.channel', ''), '#test')
+
+        write(self.filename, "config_reload: true\nslack:\n  channel: '#test'\n", mtime=1000)
+        conf = Config(self.filename)
+        self.assertFalse(conf.reload())
+
+        write(self.filename, "config_reload: true\nslack:\n  channel: '#edited'\n  routes: [{repo: testrepo, channels: ['#team']}]\n", mtime=2000)
+        self.assertTrue(conf.reload())
+        self.assertEqual(conf.value('slack.channel', ''), '#edited')
+        self.assertEqual(len(conf.router()), 1)
+        self.assertFalse(conf.reload())
+
+        # a missing file keeps the current settings
+        os.remove(self.filename)
+        self.assertFalse(conf.reload())
+        self.assertEqual(conf.value('slack.channel', ''), '#edited')
+
+    def test_reload_invalid(self):
+        write(self.filename, "config_reload: true\nslack:\n  channel: '#test'\n", mtime=1000)
+        conf = Config(self.filename)
+        router = conf.router()
+
+        # a route that does not compile keeps every current setting
+        write(self.filename, "config_reload: true\nslack:\n  channel: '#edited'\n  routes: [{repo: '/[/', channels: ['#team']}]\n", mtime=2000)
+        with mock.patch('builtins.print') as printed:
+            self.assertFalse(conf.reload())
+        self.assertIn("Invalid pattern", printed.call_args[0][0])
+        self.assertEqual(conf.value('slack.channel', ''), '#test')
+        self.assertIs(conf.router(), router)
+
+        # and is not parsed again until the file changes
+        with mock.patch('builtins.print') as printed:
+            self.assertFalse(conf.reload())
+        printed.assert_not_called()
+
+        # a half written file is not valid yaml
+        write(self.filename, "config_reload: true\nslack:\n  channel: '#edi", mtime=3000)
+        with mock.patch('builtins.print') as printed:
+            self.assertFalse(conf.reload())
+        self.assertIn("Invalid yaml", printed.call_args[0][0])
+        self.assertEqual(conf.value('slack.channel', ''), '#test')
+
+        write(self.filename, "config_reload: true\nslack:\n  channel: '#edited'\n", mtime=4000)
+        self.assertTrue(conf.reload())
+        self.assertEqual(conf.value('slack.channel', ''), '#edited')
+
+    def test_override_never_reloads(self):
+        conf = Config(config_override={'config_reload': True})
+        self.assertFalse(conf.reload())
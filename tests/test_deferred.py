@@ -0,0 +1,164 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from slackbuild.command import Command
+from slackbuild.config import Config
+from slackbuild.deferred import Deferred
+from slackbuild.slack import Slack
+
+
+class Mock_Server(ThreadingMixIn, HTTPServer):
+    """ http.server.ThreadingHTTPServer, which python 3.6 does not have """
+
+    daemon_threads = True
+
+
+class Mock_ResponseUrlHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    responses = []  # type: list
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        Mock_ResponseUrlHandler.responses.append((self.path, json.loads(body)))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Mock_SlowCloudBuild():
+    """ answers every api call with an empty operation after a delay """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def __getattr__(self, attr):
+        return self
+
+    def __call__(self, **kwargs):
+        return self
+
+    def execute(self):
+        time.sleep(self.delay)
+        return {}
+
+
+class TestDeferred(unittest.TestCase):
+
+    config_override = {
+        "slack": {
+            "channel": "#test",
+            "token": "test",
+            "webhook": {
+                "deferred": True
+            }
+        },
+        "gcloud": {
+            "project_id": "myproject",
+            "triggers": {
+                "testrepo": "12345678-9012-3456-7890-123456789012"
+            }
+        }
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Mock_Server(('127.0.0.1', 0), Mock_ResponseUrlHandler)
+        cls.url = 'http://127.0.0.1:%d/commands/T1/1/abc' % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Mock_ResponseUrlHandler.responses = []
+        self.config = Config(config_override=self.config_override)
+        self.slack = Slack(self.config, client=object())
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.deferred = Deferred(self.config, self.slack, executor=self.executor)
+
+    def test_acknowledge_then_respond(self):
+        body = {"text": "cancel 12345678-9012-3456-7890-123456789012", "response_url": self.url}
+        argv = Slack.parse_command(body)
+
+        start = time.perf_counter()
+        ack = self.deferred.handle(body, argv, Mock_SlowCloudBuild(0.5))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(ack, Deferred.ACK)
+        self.assertLess(elapsed, 0.5)
+        self.assertLess(self.deferred.stats()['ack_latency_max'], 0.5)
+
+        self.executor.shutdown(wait=True)
+        self.assertEqual(Mock_ResponseUrlHandler.responses, [
+            ('/commands/T1/1/abc', self.slack.render_command_result(body, True, "cancelled build"))
+        ])
+        self.assertEqual(self.deferred.stats()['responded'], 1)
+
+    def test_interactive_message(self):
+        with open('mocks/webhook/interactive_message_payload.json') as f:
+            body = json.load(f)
+        body['response_url'] = self.url
+        argv = Slack.parse_command(body)
+
+        self.assertEqual(self.deferred.handle(body, argv, Mock_SlowCloudBuild(0)), Deferred.ACK)
+
+        self.executor.shutdown(wait=True)
+        path, msg = Mock_ResponseUrlHandler.responses[0]
+        self.assertTrue(msg['replace_original'])
+        self.assertEqual(msg['attachments'][-1]['fields'], [{'value': '<@UAB1C2DE3> cancelled build', 'short': False}])
+
+    def test_answered_synchronously(self):
+        cases = [
+            # invalid arguments and help do not need the api
+            ["cancel", "1234"],
+            ["trigger", "foo", "master"],
+            ["help"],
+            ["foo"]
+        ]
+        for argv in cases:
+            self.assertIsNone(self.deferred.handle({"response_url": self.url}, argv, None))
+
+        # no response_url to post the result to
+        self.assertIsNone(self.deferred.handle({}, ["cancel", "12345678-9012-3456-7890-123456789012"], None))
+
+        # disabled
+        deferred = Deferred(Config(config_override={}), self.slack)
+        self.assertIsNone(deferred.handle({"response_url": self.url}, ["cancel", "12345678-9012-3456-7890-123456789012"], None))
+        self.assertEqual(self.deferred.stats()['deferred'], 0)
+
+
+class TestValidate(unittest.TestCase):
+
+    def test_validate(self):
+        config = TestDeferred.config_override
+        self.assertEqual(Command.validate([], config), (Command.BAD_INPUT, False))
+        self.assertEqual(Command.validate(["foo"], config), (Command.BAD_INPUT, False))
+        self.assertEqual(Command.validate(["help"], config), Command.help())
+        self.assertEqual(Command.validate(["retry"], config), ("Usage: retry <buildId>", False))
+        self.assertEqual(Command.validate(["cancel", "1234"], config), ("Invalid build ID", False))
+        self.assertEqual(Command.validate(["trigger", "testrepo"], config), ("Usage: trigger <alias> <branch>", False))
+
+        self.assertEqual(Command.validate(["cancel", "12345678-9012-3456-7890-123456789012"], config), (None, True))
+        self.assertEqual(Command.validate(["retry", "12345678-9012-3456-7890-123456789012"], config), (None, True))
+        self.assertEqual(Command.validate(["trigger", "testrepo", "master"], config), (None, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
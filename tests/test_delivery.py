@@ -0,0 +1,188 @@
+import threading
+import time
+import unittest
+from slackbuild.delivery import Delivery
+from slackbuild.delivery import TokenBucket
+
+
+class Mock_Clock():
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class Mock_SlackClient():
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def api_call(self, call, **args):
+        self.calls.append((call, args))
+        resp = self.responses.pop(0)
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_take(self):
+        clock = Mock_Clock()
+        bucket = TokenBucket(1.0, 2, clock=clock)
+
+        self.assertEqual(bucket.take(), 0.0)
+        self.assertEqual(bucket.take(), 0.0)
+        self.assertEqual(bucket.take(), 1.0)
+        self.assertEqual(bucket.take(), 2.0)
+
+        clock.now += 10
+        self.assertEqual(bucket.take(), 0.0)
+
+
+class TestDelivery(unittest.TestCase):
+
+    def new(self, responses, **config):
+        self.clock = Mock_Clock()
+        self.client = Mock_SlackClient(responses)
+        return Delivery(self.client, config, clock=self.clock, sleep=self.clock.sleep, jitter=lambda: 0.5)
+
+    def test_call_success(self):
+        delivery = self.new([{'ok': True}])
+
+        self.assertEqual(delivery.call('chat.postMessage', channel='#test', text='hi'), {'ok': True})
+        self.assertEqual(self.client.calls, [('chat.postMessage', {'channel': '#test', 'text': 'hi'})])
+        self.assertEqual(self.clock.slept, [])
+
+    def test_call_retry_after(self):
+        delivery = self.new([
+            {'ok': False, 'error': 'ratelimited', 'headers': {'Retry-After': '5'}},
+            ConnectionResetError(104, 'Connection reset by peer'),
+            {'ok': True}
+        ], backoff=1.0)
+
+        self.assertEqual(delivery.call('chat.postMessage', channel='#test'), {'ok': True})
+        self.assertEqual(self.clock.slept, [5.0, 2.0])
+        self.assertEqual(delivery.stats()['retries'], 2)
+
+    def test_call_bad_retry_after(self):
+        delivery = self.new([
+            {'ok': False, 'error': 'ratelimited', 'headers': {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}},
+            {'ok': True}
+        ], backoff=1.0)
+
+        # an unreadable Retry-After falls back to the backoff
+        self.assertEqual(delivery.call('chat.postMessage', channel='#test'), {'ok': True})
+        self.assertEqual(self.clock.slept, [1.0])
+
+        self.assertEqual(Delivery.retry_after({'headers': {'Retry-After': None}}), 0.0)
+        self.assertEqual(Delivery.retry_after({'headers': {'Retry-After': '-3'}}), 0.0)
+        self.assertEqual(Delivery.retry_after({'headers': {'retry-after': '7'}}), 7.0)
+        self.assertEqual(Delivery.retry_after({'headers': {'RETRY-AFTER': '2.5'}}), 2.5)
+        self.assertEqual(Delivery.retry_after({}), 0.0)
+        self.assertEqual(Delivery.retry_after({}), 0.0)
+
+    def test_call_gives_up(self):
+        delivery = self.new([{'ok': False, 'error': 'internal_error'}] * 3, max_retries=2, backoff=1.0, max_backoff=1.5)
+
+        self.assertEqual(delivery.call('chat.postMessage'), {'ok': False, 'error': 'internal_error'})
+        self.assertEqual(self.clock.slept, [1.0, 1.5])
+
+        # permanent errors are not retried
+        delivery = self.new([{'ok': False, 'error': 'channel_not_found'}])
+        self.assertEqual(delivery.call('chat.postMessage'), {'ok': False, 'error': 'channel_not_found'})
+        self.assertEqual(len(self.client.calls), 1)
+
+    def test_call_rate_limit_per_channel(self):
+        delivery = self.new([{'ok': True}] * 4, rate=1.0, burst=1)
+
+        delivery.call('chat.postMessage', channel='#a')
+        delivery.call('chat.postMessage', channel='#b')
+        self.assertEqual(self.clock.slept, [])
+
+        delivery.call('chat.postMessage', channel='#a')
+        self.assertEqual(self.clock.slept, [1.0])
+
+    def test_submit_sync(self):
+        delivery = self.new([])
+
+        self.assertTrue(delivery.submit(lambda: True))
+        self.assertFalse(delivery.submit(lambda: False))
+        self.assertFalse(delivery.submit(lambda: 1 / 0))
+
+        stats = delivery.stats()
+        self.assertEqual(stats['delivered'], 1)
+        self.assertEqual(stats['failed'], 2)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_submit_async(self):
+        delivery = Delivery(None, {'async': True, 'queue_size': 1})
+        release = threading.Event()
+        done = []
+
+        # blocks the worker so the queue fills up
+        self.assertTrue(delivery.submit(lambda: release.wait(5)))
+        while delivery.stats()['queue_depth'] > 0:
+            pass
+        self.assertTrue(delivery.submit(lambda: done.append('queued') or True))
+        # queue is full, delivered from the calling thread
+        self.assertTrue(delivery.submit(lambda: done.append('overflow') or True))
+        self.assertEqual(done, ['overflow'])
+
+        release.set()
+        self.assertTrue(delivery.drain(timeout=5))
+        self.assertEqual(done, ['overflow', 'queued'])
+
+        stats = delivery.stats()
+        self.assertEqual(stats['delivered'], 3)
+        self.assertEqual(stats['overflow'], 1)
+
+    def test_close(self):
+        delivery = Delivery(None, {'async': True})
+        workers = threading.active_count()
+        done = []
+
+        self.assertTrue(delivery.submit(lambda: done.append('queued') or True))
+        self.assertTrue(delivery.close(timeout=5))
+        self.assertEqual(done, ['queued'])
+        self.assertFalse(delivery.is_async())
+
+        # the worker stopped, later jobs run on the calling thread
+        for _ in range(100):
+            if threading.active_count() < workers:
+                break
+            time.sleep(0.01)
+        self.assertEqual(threading.active_count(), workers - 1)
+        self.assertTrue(delivery.submit(lambda: done.append('sync') or True))
+        self.assertEqual(done, ['queued', 'sync'])
+
+    def test_stats_threads(self):
+        # the worker and calling threads update the counters at once
+        delivery = Delivery(None, {'async': True, 'queue_size': 10})
+
+        def submit():
+            for i in range(200):
+                delivery.submit(lambda i=i: i % 2 == 0)
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertTrue(delivery.drain(timeout=5))
+
+        stats = delivery.stats()
+        self.assertEqual(stats['delivered'] + stats['failed'], 800)
+        self.assertEqual(stats['delivered'], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import json
+import os
+import tempfile
+import unittest
+from slackbuild.build_status import BuildStatus
+from slackbuild.colors import Colors
+from slackbuild.config import Config
+from slackbuild.digest import Digest
+from slackbuild.digest import FileBuffer
+from slackbuild.digest import MemoryBuffer
+from slackbuild.slack import Slack
+
+
+class Mock_Clock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def variables(build_id, seconds='', repo='testrepo'):
+    return {
+        'build_id': build_id,
+        'build_id_short': build_id[:8],
+        'build_log_url': 'https://logs/%s' % build_id,
+        'repo_name': repo,
+        'branch_name': 'master',
+        'build_duration_seconds': seconds,
+        'build_status': 'ignored'
+    }
+
+
+class TestDigest(unittest.TestCase):
+
+    def new(self, clock=None, **conf):
+        conf = dict({'statuses': ['success', 'failure'], 'interval': 300, 'max_events': 5}, **conf)
+        return Digest(Config(config_override={'slack': {'digest': conf}}), clock=clock or Mock_Clock())
+
+    def test_disabled(self):
+        digest = Digest(Config(config_override={}))
+        self.assertFalse(digest.accepts('SUCCESS'))
+        self.assertIsNone(digest.poll())
+        self.assertIsNone(digest.flush())
+
+    def test_accepts(self):
+        digest = self.new()
+        self.assertTrue(digest.accepts('SUCCESS'))
+        self.assertTrue(digest.accepts('FAILURE'))
+        self.assertFalse(digest.accepts('WORKING'))
+
+    def test_unknown_buffer(self):
+        with self.assertRaises(ValueError):
+            self.new(buffer='redis')
+
+    def test_interval(self):
+        clock = Mock_Clock()
+        digest = self.new(clock=clock)
+
+        self.assertIsNone(digest.add(variables('aaaaaaaa-1', '60'), 'SUCCESS'))
+        clock.now += 200
+        self.assertIsNone(digest.add(variables('bbbbbbbb-2', '90'), 'FAILURE'))
+        self.assertIsNone(digest.poll())
+
+        # due once the oldest build waited the interval
+        clock.now += 100
+        summary = digest.poll()
+        self.assertEqual(summary['digest_count'], '2')
+        self.assertEqual(summary['digest_summary'], '1 failure, 1 success')
+        self.assertEqual(summary['digest_minutes'], '3')
+        digest.posted(summary)
+        self.assertIsNone(digest.poll())
+        self.assertEqual(digest.stats(), {'buffered': 2, 'digests': 1})
+
+    def test_post_failed(self):
+        clock = Mock_Clock()
+        digest = self.new(clock=clock)
+        digest.add(variables('aaaaaaaa-1'), 'SUCCESS')
+        clock.now += 300
+
+        # not posted, the builds are kept for the next digest
+        self.assertEqual(digest.poll()['digest_count'], '1')
+        summary = digest.add(variables('bbbbbbbb-2'), 'FAILURE')
+        self.assertEqual(summary['digest_count'], '2')
+        self.assertEqual(digest.stats(), {'buffered': 2, 'digests': 0})
+
+        # builds buffered while the digest was being posted stay for the next one
+        digest.add(variables('cccccccc-3'), 'SUCCESS')
+        digest.posted(summary)
+        self.assertEqual(digest.flush()['digest_count'], '1')
+
+    def test_due_on_add(self):
+        clock = Mock_Clock()
+        digest = self.new(clock=clock)
+
+        digest.add(variables('aaaaaaaa-1'), 'SUCCESS')
+        clock.now += 301
+        summary = digest.add(variables('bbbbbbbb-2'), 'SUCCESS')
+        self.assertEqual(summary['digest_count'], '2')
+
+    def test_max_events(self):
+        digest = self.new()
+        for i in range(4):
+            self.assertIsNone(digest.add(variables('build-%d' % i), 'SUCCESS'))
+        summary = digest.add(variables('build-4'), 'SUCCESS')
+        self.assertEqual(summary['digest_count'], '5')
+        self.assertEqual(summary['digest_summary'], '5 success')
+        self.assertEqual(summary['digest_minutes'], '1')
+
+    def test_summarize(self):
+        clock = Mock_Clock()
+        digest = self.new(clock=clock, slowest=2, max_events=10)
+
+        digest.add(variables('aaaaaaaa-1', '60'), 'SUCCESS')
+        digest.add(variables('bbbbbbbb-2', '240', repo='other'), 'FAILURE')
+        digest.add(variables('cccccccc-3', '120'), 'SUCCESS')
+        digest.add(variables('dddddddd-4', '240'), 'SUCCESS')
+        summary = digest.flush()
+        digest.posted(summary)
+
+        self.assertEqual(summary['digest_failures'], '<https://logs/bbbbbbbb-2|bbbbbbbb> other master')
+        self.assertEqual(summary['digest_slowest'],
+                         '<https://logs/bbbbbbbb-2|bbbbbbbb> other master (240 seconds)\n'
+                         '<https://logs/dddddddd-4|dddddddd> testrepo master (240 seconds)')
+        self.assertEqual(summary['digest_color'], Colors.FAILURE)
+
+        digest.add(variables('aaaaaaaa-1'), 'SUCCESS')
+        summary = digest.flush()
+        self.assertEqual(summary['digest_failures'], '')
+        self.assertEqual(summary['digest_slowest'], '')
+        self.assertEqual(summary['digest_color'], Colors.SUCCESS)
+
+    def test_previous(self):
+        clock = Mock_Clock()
+        previous = self.new(clock=clock)
+        previous.add(variables('aaaaaaaa-1'), 'SUCCESS')
+
+        # a config reload keeps the buffered builds
+        digest = Digest(Config(config_override={'slack': {'digest': {'statuses': ['success'], 'interval': 60}}}), clock=clock, previous=previous)
+        clock.now += 60
+        self.assertEqual(digest.poll()['digest_count'], '1')
+
+        # unless the buffer itself changed
+        digest = self.new(clock=clock, buffer='file', path='/nonexistent/digest.jsonl')
+        self.assertIsNone(Digest(Config(config_override={'slack': {'digest': {'statuses': ['success'], 'buffer': 'memory'}}}), previous=digest).poll())
+
+    def test_memory_buffer(self):
+        buffer = MemoryBuffer()
+        self.assertIsNone(buffer.first())
+        self.assertEqual(buffer.append({'a': 1}), 1)
+        self.assertEqual(buffer.append({'a': 2}), 2)
+        self.assertEqual(buffer.first(), {'a': 1})
+        self.assertEqual(buffer.peek(), [{'a': 1}, {'a': 2}])
+        buffer.remove(1)
+        self.assertEqual(buffer.peek(), [{'a': 2}])
+        buffer.remove(1)
+        self.assertEqual(buffer.peek(), [])
+
+    def test_file_buffer(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'digest.jsonl')
+            buffer = FileBuffer(path)
+            self.assertIsNone(buffer.first())
+            self.assertEqual(buffer.append({'a': 1}), 1)
+            self.assertEqual(buffer.append({'a': 2}), 2)
+
+            # another instance sees the same builds
+            other = FileBuffer(path)
+            self.assertEqual(other.first(), {'a': 1})
+            self.assertEqual(other.peek(), [{'a': 1}, {'a': 2}])
+            other.remove(1)
+            self.assertEqual(buffer.first(), {'a': 2})
+            buffer.remove(1)
+            self.assertIsNone(buffer.first())
+            self.assertEqual(os.path.getsize(path), 0)
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'digest.jsonl')
+            clock = Mock_Clock()
+            digest = self.new(clock=clock, **{'buffer': 'file', 'path': path})
+            digest.add(variables('aaaaaaaa-1', '60'), 'SUCCESS')
+
+            # a new function instance posts the digest of the previous one
+            clock.now += 300
+            summary = self.new(clock=clock, **{'buffer': 'file', 'path': path}).poll()
+            self.assertEqual(summary['digest_count'], '1')
+
+    def test_template(self):
+        with open('mocks/pubsub/success_triggered.json') as f:
+            data = json.load(f)
+        build, _ = BuildStatus.toMessage(data, {})
+
+        digest = self.new(max_events=1, channel='#digest')
+        summary = digest.add(build, 'SUCCESS')
+
+        config = Config(config_override={'slack': {'channel': '#test', 'digest': {'statuses': ['success']}}})
+        slack = Slack(config, client=object())
+        msg = slack.render_message(summary, digest.template, channel=digest.channel)
+        # preloaded, not read on the first digest
+        self.assertEqual(slack.template_stats()['misses'], 0)
+        self.assertEqual(msg['channel'], '#digest')
+        self.assertEqual(msg['attachments'][0]['title'], '1 builds in the last 1 minutes')
+        self.assertEqual(msg['attachments'][0]['text'], '1 success')
+        self.assertEqual(msg['attachments'][0]['fields'][1]['value'],
+                         '<%s|cc905bd4> testrepo master (%s seconds)' % (build['build_log_url'], build['build_duration_seconds']))
+
+
+if __name__ == '__main__':
+    unittest.main()
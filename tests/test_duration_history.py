@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import unittest
+from slackbuild.build_status import BuildStatus
+from slackbuild.config import Config
+from slackbuild.duration_history import DurationHistory
+from slackbuild.state_store import MemoryStore
+from slackbuild.state_store import SqliteStore
+
+
+def build(seconds, trigger='t1', branch='master'):
+    return {
+        'build_duration_seconds': str(seconds),
+        'build_trigger_id': trigger,
+        'branch_name': branch,
+        'build_duration_p50': '',
+        'build_duration_delta_pct': '',
+        'build_slow': ''
+    }
+
+
+class TestDurationHistory(unittest.TestCase):
+
+    def new(self, store=None, **conf):
+        config = Config(config_override={'pubsub': {'duration_history': dict({'min_samples': 3}, **conf)}})
+        return DurationHistory(config, store=store if store is not None else MemoryStore())
+
+    def test_disabled(self):
+        history = DurationHistory(Config(config_override={}))
+        variables = history.annotate(build(100), 'SUCCESS')
+        self.assertEqual(variables['build_duration_p50'], '')
+        self.assertEqual(variables['build_slow'], '')
+
+    def test_baseline(self):
+        history = self.new()
+
+        # nothing to compare the first build with
+        variables = history.annotate(build(100), 'SUCCESS')
+        self.assertEqual((variables['build_duration_p50'], variables['build_duration_delta_pct']), ('', ''))
+
+        history.annotate(build(110), 'SUCCESS')
+        history.annotate(build(90), 'SUCCESS')
+
+        variables = history.annotate(build(120), 'SUCCESS')
+        self.assertEqual(variables['build_duration_p50'], '100 seconds')
+        self.assertEqual(variables['build_duration_delta_pct'], '+20%')
+        self.assertEqual(variables['build_slow'], '')
+
+        variables = history.annotate(build(80), 'FAILURE')
+        # median of 90, 100, 110, 120
+        self.assertEqual(variables['build_duration_p50'], '105 seconds')
+        self.assertEqual(variables['build_duration_delta_pct'], '-24%')
+
+    def test_slow(self):
+        history = self.new(threshold_pct=50, slow_text='slow!')
+
+        for seconds in [100, 100]:
+            history.annotate(build(seconds), 'SUCCESS')
+        # too few samples to call it slow
+        self.assertEqual(history.annotate(build(300), 'FAILURE')['build_slow'], '')
+
+        history.annotate(build(100), 'SUCCESS')
+        variables = history.annotate(build(151), 'FAILURE')
+        self.assertEqual(variables['build_duration_delta_pct'], '+51%')
+        self.assertEqual(variables['build_slow'], 'slow!')
+        self.assertEqual(history.annotate(build(150), 'SUCCESS')['build_slow'], '')
+
+    def test_window(self):
+        history = self.new(window=3)
+
+        for seconds in [1000, 1000, 1000, 10, 10, 10]:
+            history.annotate(build(seconds), 'SUCCESS')
+
+        # the slow builds left the window
+        self.assertEqual(history.annotate(build(10), 'SUCCESS')['build_duration_p50'], '10 seconds')
+
+    def test_keys(self):
+        history = self.new()
+
+        history.annotate(build(100, trigger='t1', branch='master'), 'SUCCESS')
+        self.assertEqual(history.annotate(build(100, trigger='t1', branch='dev'), 'SUCCESS')['build_duration_p50'], '')
+        self.assertEqual(history.annotate(build(100, trigger='t2', branch='master'), 'SUCCESS')['build_duration_p50'], '')
+
+        # manual builds are grouped by repository
+        self.assertEqual(BuildStatus.source_key({'repo_name': 'testrepo', 'branch_name': 'master'}), 'testrepo:master')
+
+    def test_unfinished(self):
+        history = self.new()
+        variables = history.annotate(dict(build(0), build_duration_seconds=''), 'WORKING')
+        self.assertEqual(variables['build_duration_p50'], '')
+
+    def test_pubsub_fixture(self):
+        with open('mocks/pubsub/success_triggered.json') as f:
+            data = json.load(f)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'history.db')
+            history = self.new(store=SqliteStore(path, table='duration_history'))
+            for _ in range(3):
+                history.annotate(BuildStatus.toMessage(data, {})[0], 'SUCCESS')
+
+            # another instance sharing the sqlite file
+            history = self.new(store=SqliteStore(path, table='duration_history'))
+            variables, _ = BuildStatus.toMessage(data, {})
+            self.assertEqual(variables['branch_name'], 'master')
+            variables = history.annotate(variables, 'SUCCESS')
+            self.assertEqual(variables['build_duration_p50'], '11 seconds')
+            self.assertEqual(variables['build_duration_delta_pct'], '+0%')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import unittest
+from slackbuild.build_event import BuildEvent
+from slackbuild.config import Config
+from slackbuild.ingest import IngestRules
+
+
+def load(fixture):
+    with open('mocks/pubsub/%s' % fixture) as f:
+        return BuildEvent(json.load(f))
+
+
+class TestIngestRules(unittest.TestCase):
+
+    def new(self, rules):
+        return IngestRules(Config(config_override={
+            'gcloud': {
+                'triggers': {
+                    'testrepo': 'e9328cda-ac3a-4af3-9625-532d47df9032',
+                    'other': '12345678-9012-3456-7890-123456789012',
+                    'all': ['testrepo', 'other']
+                }
+            },
+            'pubsub': {'rules': rules}
+        }))
+
+    def test_no_rules(self):
+        rules = IngestRules(Config(config_override={}))
+        event = load('working_manual.json')
+
+        self.assertEqual(rules.accept(event), (True, None))
+        self.assertFalse(event.is_decoded())
+        self.assertEqual(rules.stats(), {'accepted': 1, 'decoded': 0, 'dropped': {}})
+
+    def test_status_without_decoding(self):
+        rules = self.new([{'name': 'skip-working', 'status': ['working', 'QUEUED']}])
+
+        event = load('working_manual.json')
+        self.assertEqual(rules.accept(event), (False, 'skip-working'))
+        self.assertFalse(event.is_decoded())
+
+        event = load('success_manual.json')
+        self.assertEqual(rules.accept(event), (True, None))
+        self.assertFalse(event.is_decoded())
+
+        self.assertEqual(rules.stats(), {'accepted': 1, 'decoded': 0, 'dropped': {'skip-working': 1}})
+
+    def test_trigger_failures_only(self):
+        rules = self.new([
+            {'name': 'testrepo-failures', 'trigger': 'testrepo', 'status': ['FAILURE'], 'action': 'notify'},
+            {'name': 'testrepo-others', 'trigger': ['testrepo']}
+        ])
+
+        # the first rule fails on status alone, the second needs the trigger id
+        event = load('success_triggered.json')
+        self.assertEqual(rules.accept(event), (False, 'testrepo-others'))
+        self.assertTrue(event.is_decoded())
+
+        # a manual build matches neither rule
+        self.assertEqual(rules.accept(load('success_manual.json')), (True, None))
+
+        self.assertEqual(rules.stats(), {'accepted': 1, 'decoded': 2, 'dropped': {'testrepo-failures': 0, 'testrepo-others': 1}})
+
+    def test_trigger_group_and_ids(self):
+        rules = self.new([{'trigger': ['all']}])
+        self.assertEqual(rules.accept(load('success_triggered.json')), (False, 'rule-1'))
+
+        rules = self.new([{'trigger': 'e9328cda-ac3a-4af3-9625-532d47df9032'}])
+        self.assertEqual(rules.accept(load('success_triggered.json')), (False, 'rule-1'))
+
+        rules = self.new([{'trigger': 'other'}])
+        self.assertEqual(rules.accept(load('success_triggered.json')), (True, None))
+
+    def test_triggered(self):
+        rules = self.new([{'name': 'manual', 'triggered': False}])
+
+        self.assertEqual(rules.accept(load('success_manual.json')), (False, 'manual'))
+        self.assertEqual(rules.accept(load('success_triggered.json')), (True, None))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.new([{'status': 'QUEUED', 'action': 'ignore'}])
+        with self.assertRaises(ValueError):
+            self.new([{'branch': 'master'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import unittest
+from string import Template
+from slackbuild.json_template import JsonTemplate
+
+
+class TestJsonTemplate(unittest.TestCase):
+
+    text = '''{
+        "attachments": [
+            {
+                "text": "*${repo_name}*  <${revision_url}|${revision_sha_short}>",
+                "color": "${build_color}",
+                "footer": "ID: ${build_id_short} $build_duration",
+                "mrkdwn_in": ["text"],
+                "short": false
+            }
+        ],
+        "channel": "${channel}"
+    }'''
+
+    variables = {
+        "build_color": "#FFFFFF",
+        "build_id_short": "1234",
+        "build_duration": "3 seconds",
+        "repo_name": "testrepo",
+        "revision_url": "github.com/test/testrepo/commits/123",
+        "revision_sha_short": "123"
+    }
+
+    def test_render_matches_string_template(self):
+        template = JsonTemplate(self.text)
+        expected = json.loads(Template(self.text).safe_substitute(self.variables, channel='#test'))
+
+        self.assertEqual(template.render(self.variables, channel='#test'), expected)
+
+    def test_render_missing_variables(self):
+        template = JsonTemplate(self.text)
+        actual = template.render({})
+
+        self.assertEqual(actual['channel'], '${channel}')
+        self.assertEqual(actual['attachments'][0]['footer'], 'ID: ${build_id_short} $build_duration')
+        self.assertEqual(actual['attachments'][0]['short'], False)
+
+    def test_render_escaping(self):
+        template = JsonTemplate(self.text)
+        variables = dict(self.variables, repo_name='say "hi" \\o/', build_color='"')
+
+        actual = template.render(variables)
+        self.assertEqual(actual['attachments'][0]['text'], '*say "hi" \\o/*  <github.com/test/testrepo/commits/123|123>')
+        self.assertEqual(actual['attachments'][0]['color'], '"')
+        self.assertEqual(json.loads(json.dumps(actual)), actual)
+
+    def test_render_non_string_values(self):
+        template = JsonTemplate(self.text)
+        actual = template.render(dict(self.variables, build_color=('a', 'b'), repo_name=3))
+
+        self.assertEqual(actual['attachments'][0]['color'], "('a', 'b')")
+        self.assertEqual(actual['attachments'][0]['text'], '*3*  <github.com/test/testrepo/commits/123|123>')
+
+    def test_render_returns_new_message(self):
+        template = JsonTemplate(self.text)
+        first = template.render(self.variables)
+        first['attachments'][0]['mrkdwn_in'].append('fallback')
+        first['channel'] = 'changed'
+
+        second = template.render(self.variables)
+        self.assertEqual(second['attachments'][0]['mrkdwn_in'], ['text'])
+        self.assertEqual(second['channel'], '${channel}')
+
+    def test_slots(self):
+        template = JsonTemplate(self.text)
+        paths = [path for path, _ in template.slots()]
+
+        self.assertEqual(paths, [('attachments', 0, 'text'), ('attachments', 0, 'color'), ('attachments', 0, 'footer'), ('channel',)])
+
+
+if __name__ == '__main__':
+    unittest.main()
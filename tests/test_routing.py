@@ -0,0 +1,89 @@
+import unittest
+from slackbuild.config import Config
+from slackbuild.routing import Router
+
+
+def build(repo='testrepo', branch='master', trigger=''):
+    return {'repo_name': repo, 'branch_name': branch, 'build_trigger_id': trigger}
+
+
+class TestRouter(unittest.TestCase):
+
+    def new(self, routes, **gcloud):
+        return Router({'slack': {'channel': '#builds', 'routes': routes}, 'gcloud': gcloud})
+
+    def test_no_routes(self):
+        router = Router({'slack': {'channel': '#builds'}})
+        self.assertEqual(len(router), 0)
+        self.assertEqual(router.route(build(), 'SUCCESS', 'default.json'), (['#builds'], 'default.json'))
+
+    def test_no_match(self):
+        router = self.new([{'repo': 'other', 'channels': ['#other']}])
+        self.assertEqual(router.route(build(), 'SUCCESS', 'default.json'), (['#builds'], 'default.json'))
+
+    def test_repo(self):
+        router = self.new([
+            {'repo': ['testrepo', 'api'], 'channels': '#team'},
+            {'repo': 'api', 'channels': ['#api']}
+        ])
+        self.assertEqual(router.route(build(), 'SUCCESS')[0], ['#team'])
+        self.assertEqual(router.route(build(repo='api'), 'SUCCESS')[0], ['#team', '#api'])
+        self.assertEqual(router.route(build(repo=''), 'SUCCESS')[0], ['#builds'])
+
+    def test_patterns(self):
+        router = self.new([
+            {'repo': ['service-*'], 'channels': ['#services']},
+            {'branch': ['master', 'release/*'], 'channels': ['#releases']},
+            {'branch': '/hotfix-[0-9]+$/', 'channels': ['#hotfixes']},
+            {'repo': ['testrepo', '/lib-.*/'], 'channels': ['#libs']}
+        ])
+        self.assertEqual(router.route(build(repo='service-a', branch='feature'), 'SUCCESS')[0], ['#services'])
+        self.assertEqual(router.route(build(branch='release/1.2'), 'SUCCESS')[0], ['#releases', '#libs'])
+        self.assertEqual(router.route(build(repo='lib-a', branch='hotfix-12'), 'SUCCESS')[0], ['#hotfixes', '#libs'])
+        self.assertEqual(router.route(build(repo='x', branch='hotfix-12a'), 'SUCCESS')[0], ['#builds'])
+        # globs match the whole value
+        self.assertEqual(router.route(build(repo='my-service-a', branch='feature'), 'SUCCESS')[0], ['#builds'])
+        # so do regexes, without anchoring them
+        router = self.new([{'branch': '/hotfix-[0-9]/', 'channels': ['#hotfixes']}])
+        self.assertEqual(router.route(build(branch='hotfix-1-test'), 'SUCCESS')[0], ['#builds'])
+        self.assertEqual(router.route(build(branch='hotfix-1'), 'SUCCESS')[0], ['#hotfixes'])
+
+    def test_status_and_template(self):
+        router = self.new([
+            {'repo': 'testrepo', 'channels': ['#team']},
+            {'status': ['failure', 'TIMEOUT'], 'channels': ['#oncall', '#team'], 'template': 'failure.json'},
+            {'status': 'FAILURE', 'template': 'other.json'}
+        ])
+        self.assertEqual(router.route(build(), 'SUCCESS', 'default.json'), (['#team'], 'default.json'))
+        self.assertEqual(router.route(build(), 'FAILURE', 'default.json'), (['#team', '#oncall'], 'failure.json'))
+        self.assertEqual(router.route(build(repo='x'), 'TIMEOUT', 'default.json'), (['#oncall', '#team'], 'failure.json'))
+
+    def test_silenced(self):
+        router = self.new([{'branch': 'dependabot/*', 'channels': []}])
+        self.assertEqual(router.route(build(branch='dependabot/pip/yaml'), 'SUCCESS', 'default.json'), ([], 'default.json'))
+
+    def test_trigger(self):
+        router = self.new([{'trigger': 'services', 'channels': ['#services']}],
+                          triggers={'testrepo': '1234', 'api': '5678', 'services': ['testrepo', 'api']})
+        self.assertEqual(router.route(build(trigger='5678'), 'SUCCESS')[0], ['#services'])
+        self.assertEqual(router.route(build(trigger='9999'), 'SUCCESS')[0], ['#builds'])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.new([{'repository': 'testrepo', 'channels': ['#a']}])
+        with self.assertRaises(ValueError):
+            self.new([{'repo': 'testrepo'}])
+        with self.assertRaises(ValueError):
+            self.new([{'branch': '/[/', 'channels': ['#a']}])
+
+    def test_config(self):
+        config = Config(config_override={'slack': {'channel': '#builds', 'routes': [{'repo': 'testrepo', 'channels': ['#team']}]}})
+        self.assertEqual(len(config.router()), 1)
+        self.assertEqual(config.router().route(build(), 'SUCCESS')[0], ['#team'])
+
+        with self.assertRaises(ValueError):
+            Config(config_override={'slack': {'routes': [{'channels': ['#a'], 'colour': 'red'}]}})
+
+
+if __name__ == '__main__':
+    unittest.main()
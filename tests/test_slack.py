@@ -1,7 +1,9 @@
 import json
 import unittest
+from slackbuild.command import Command
 from slackbuild.config import Config
 from slackbuild.slack import Slack
+from slackbuild.state_store import MemoryStore
 
 
 class TestSlack(unittest.TestCase):
@@ -17,6 +19,13 @@ class TestSlack(unittest.TestCase):
         }
     }
 
+    signed_headers = {
+        'X-Slack-Request-Timestamp': '1531420618',
+        'X-Slack-Signature': 'v0=a2114d57b48eac39b9ad189dd8316235a7b4a8d21a10bd27519666489c69b503'
+    }
+
+    signed_body = 'token=xyzz0WbapA4vBCDEFasx0q6G&team_id=T1DC2JH3J&team_domain=testteamnow&channel_id=G8PSS9T3V&channel_name=foobar&user_id=U2CERLKJA&user_name=roadrunner&command=%2Fwebhook-collect&text=&response_url=https%3A%2F%2Fhooks.slack.com%2Fcommands%2FT1DC2JH3J%2F397700885554%2F96rGlfmibIGlgcZRskXaIFfN&trigger_id=398738663015.47445629121.803a0bc887a14d10d2c447fce8b6703c'
+
     def test_render_message_default(self):
         config = Config(config_override=self.config_override)
 
@@ -75,11 +84,52 @@ class TestSlack(unittest.TestCase):
         success = slack.post_message(expected_args)
         self.assertTrue(success)
 
+    def test_post_message_update_in_place(self):
+        config_override = {'slack': dict(self.config_override['slack'], update_in_place=True)}
+        config = Config(config_override=config_override)
+        msg = {"text": "hello", "channel": "#test"}
+
+        mock_client = Mock_SlackAPI({
+            "chat.postMessage": {"ok": True, "channel": "C123", "ts": "1.1"},
+            "chat.update": {"ok": True, "channel": "C123", "ts": "1.1"}
+        })
+        slack = Slack(config, client=mock_client, message_store=MemoryStore())
+
+        self.assertTrue(slack.post_message(msg, key="build-1"))
+        self.assertTrue(slack.post_message(msg, key="build-1"))
+        self.assertTrue(slack.post_message(msg, key="build-2"))
+        # without a key a new message is always posted
+        self.assertTrue(slack.post_message(msg))
+
+        self.assertEqual(mock_client.calls, [
+            ("chat.postMessage", msg),
+            ("chat.update", {"text": "hello", "channel": "C123", "ts": "1.1"}),
+            ("chat.postMessage", msg),
+            ("chat.postMessage", msg)
+        ])
+
+    def test_post_message_update_failed(self):
+        config_override = {'slack': dict(self.config_override['slack'], update_in_place=True)}
+        config = Config(config_override=config_override)
+        msg = {"text": "hello", "channel": "#test"}
+
+        store = MemoryStore()
+        store.set("build-1", {"channel": "C123", "ts": "1.1"})
+        mock_client = Mock_SlackAPI({
+            "chat.postMessage": {"ok": True, "channel": "C123", "ts": "2.2"},
+            "chat.update": {"ok": False, "error": "message_not_found"}
+        })
+        slack = Slack(config, client=mock_client, message_store=store)
+
+        self.assertTrue(slack.post_message(msg, key="build-1"))
+        self.assertEqual([c[0] for c in mock_client.calls], ["chat.update", "chat.postMessage"])
+        self.assertEqual(store.get("build-1"), {"channel": "C123", "ts": "2.2"})
+
     def test_verify_webhook_valid(self):
         config = Config(config_override=self.config_override)
         # Assert Slack.verify_webhook doesn't make an API call
         mock_client = Mock_SlackClient("", "", {})
-        slack = Slack(config, client=mock_client)
+        slack = Slack(config, client=mock_client, clock=lambda: 1531420618)
 
         headers = {
             'X-Slack-Request-Timestamp': '1531420618',
@@ -97,7 +147,7 @@ class TestSlack(unittest.TestCase):
         config = Config(config_override=self.config_override)
         # Assert Slack.verify_webhook doesn't make an API call
         mock_client = Mock_SlackClient("", "", {})
-        slack = Slack(config, client=mock_client)
+        slack = Slack(config, client=mock_client, clock=lambda: 1531420618)
 
         headers = {
             'X-Slack-Request-Timestamp': '1531420619',
@@ -115,7 +165,7 @@ class TestSlack(unittest.TestCase):
         config = Config(config_override=self.config_override)
         # Assert Slack.verify_webhook doesn't make an API call
         mock_client = Mock_SlackClient("", "", {})
-        slack = Slack(config, client=mock_client)
+        slack = Slack(config, client=mock_client, clock=lambda: 1531420618)
 
         headers = {
             'X-Slack-Request-Timestamp': '1531420618',
@@ -127,6 +177,73 @@ class TestSlack(unittest.TestCase):
         is_valid, err = slack.verify_webhook(req)
         self.assertFalse(is_valid)
 
+    def test_verify_webhook_stale(self):
+        config = Config(config_override=self.config_override)
+        clock = Mock_Clock(1531420618 + 301)
+        slack = Slack(config, client=Mock_SlackClient("", "", {}), clock=clock)
+        req = Mock_Request(self.signed_headers, self.signed_body, 1)
+
+        is_valid, err = slack.verify_webhook(req)
+        self.assertFalse(is_valid)
+        self.assertEqual(err, 'Slack request timestamp is older than slack.webhook.max_request_age')
+        # rejected before reading the body
+        self.assertEqual(req.reads, 0)
+
+        # timestamps in the future are just as suspicious
+        clock.now = 1531420618 - 301
+        self.assertFalse(slack.verify_webhook(req)[0])
+
+        clock.now = 1531420618 + 300
+        self.assertTrue(slack.verify_webhook(req)[0])
+
+        headers = dict(self.signed_headers, **{'X-Slack-Request-Timestamp': 'abc'})
+        self.assertFalse(slack.verify_webhook(Mock_Request(headers, self.signed_body, 1))[0])
+        self.assertFalse(slack.verify_webhook(Mock_Request({}, self.signed_body, 1))[0])
+
+        self.assertEqual(slack.webhook_stats(), {'verified': 1, 'rejected_stale': 4, 'rejected_replay': 0, 'rejected_invalid': 0})
+
+    def test_verify_webhook_stale_disabled(self):
+        config = Config(config_override={'slack': dict(self.config_override['slack'], webhook={'max_content_length': 2, 'max_request_age': 0})})
+        slack = Slack(config, client=Mock_SlackClient("", "", {}))
+
+        self.assertTrue(slack.verify_webhook(Mock_Request(self.signed_headers, self.signed_body, 1))[0])
+
+    def test_verify_webhook_replay(self):
+        config = Config(config_override=self.config_override)
+        clock = Mock_Clock(1531420618)
+        slack = Slack(config, client=Mock_SlackClient("", "", {}), clock=clock)
+
+        self.assertTrue(slack.verify_webhook(Mock_Request(self.signed_headers, self.signed_body, 1))[0])
+
+        req = Mock_Request(self.signed_headers, self.signed_body, 1)
+        is_valid, err = slack.verify_webhook(req)
+        self.assertFalse(is_valid)
+        self.assertEqual(err, 'Slack request was already received')
+        self.assertEqual(req.reads, 0)
+
+        # a badly signed request is not remembered, so it cannot block the genuine one
+        other = Slack(config, client=Mock_SlackClient("", "", {}), clock=clock)
+        self.assertFalse(other.verify_webhook(Mock_Request(self.signed_headers, self.signed_body + '&x=1', 1))[0])
+        self.assertTrue(other.verify_webhook(Mock_Request(self.signed_headers, self.signed_body, 1))[0])
+
+        self.assertEqual(slack.webhook_stats(), {'verified': 1, 'rejected_stale': 0, 'rejected_replay': 1, 'rejected_invalid': 0})
+        self.assertEqual(other.webhook_stats(), {'verified': 1, 'rejected_stale': 0, 'rejected_replay': 0, 'rejected_invalid': 1})
+
+    def test_previous(self):
+        config = Config(config_override={'slack': dict(self.config_override['slack'], update_in_place=True)})
+        clock = Mock_Clock(1531420618)
+        mock_client = Mock_SlackAPI({"chat.postMessage": {"ok": True, "channel": "C123", "ts": "1.1"}, "chat.update": {"ok": True}})
+        previous = Slack(config, client=mock_client, clock=clock)
+        self.assertTrue(previous.verify_webhook(Mock_Request(self.signed_headers, self.signed_body, 1))[0])
+        self.assertTrue(previous.post_message({"text": "hello", "channel": "#test"}, key="build-1"))
+        previous.close()
+
+        # after a config reload, requests are still replays and messages are still updated
+        slack = Slack(config, client=mock_client, clock=clock, previous=previous)
+        self.assertEqual(slack.verify_webhook(Mock_Request(self.signed_headers, self.signed_body, 1)), (False, 'Slack request was already received'))
+        self.assertTrue(slack.post_message({"text": "done", "channel": "#test"}, key="build-1"))
+        self.assertEqual([c[0] for c in mock_client.calls], ["chat.postMessage", "chat.update"])
+
     def test_is_interactive_message(self):
         self.assertTrue(Slack.is_interactive_message({"type": "interactive_message"}))
         self.assertFalse(Slack.is_interactive_message({"type": "interactive-message"}))
@@ -175,6 +292,19 @@ class TestSlack(unittest.TestCase):
         req = Mock_Request('', {}, 1)
         self.assertEqual({}, Slack.parse_request(req))
 
+    def test_render_help(self):
+        config = Config(config_override=self.config_override)
+        slack = Slack(config, client=object())
+
+        output, success = Command.help()
+        msg = slack.render_command_result({}, success, output)
+        text = msg['attachments'][0]['text']
+
+        self.assertNotIn('\\n', text)
+        self.assertTrue(text.startswith('```/builds <command> [arguments]\n/builds trigger'))
+        self.assertEqual(len(text.splitlines()), len(output.splitlines()))
+        self.assertTrue(text.endswith('Show this message\n```'))
+
     def test_render_interactive_message(self):
         self.maxDiff = None
 
@@ -206,6 +336,26 @@ class Mock_SlackClient():
         return self.__response
 
 
+class Mock_SlackAPI():
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def api_call(self, call, **args):
+        self.calls.append((call, args))
+        return self.responses[call]
+
+
+class Mock_Clock():
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 class Mock_Request():
 
     def __init__(self, headers, body, content_length):
@@ -213,8 +363,12 @@ class Mock_Request():
         self.__body = body
         self.content_length = content_length
         self.form = self
+        self.reads = 0
 
     def get_data(self, as_text=True):
+        self.reads += 1
+        if not as_text and isinstance(self.__body, str):
+            return self.__body.encode('utf-8')
         return self.__body
 
     def to_dict(self):
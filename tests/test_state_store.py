@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import unittest
+from slackbuild.state_store import MemoryStore
+from slackbuild.state_store import SqliteStore
+from slackbuild.state_store import new_store
+
+
+class Mock_Clock():
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StoreTests():
+
+    def new(self, ttl=60, max_entries=3):
+        raise NotImplementedError()
+
+    def test_get_set_delete(self):
+        store = self.new()
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.get('a', 'default'), 'default')
+
+        store.set('a', {'channel': 'C123', 'ts': '1.2'})
+        self.assertEqual(store.get('a'), {'channel': 'C123', 'ts': '1.2'})
+
+        store.set('a', {'channel': 'C456', 'ts': '3.4'})
+        self.assertEqual(store.get('a'), {'channel': 'C456', 'ts': '3.4'})
+
+        store.delete('a')
+        store.delete('missing')
+        self.assertIsNone(store.get('a'))
+
+    def test_scan(self):
+        store = self.new(max_entries=10)
+        for key in ['ab1', 'ab2', 'ac1', 'b']:
+            store.set(key, key.upper())
+
+        self.assertEqual(sorted(store.scan('ab')), [('ab1', 'AB1'), ('ab2', 'AB2')])
+        self.assertEqual(len(store.scan('a', limit=2)), 2)
+        self.assertEqual(len(store.scan('')), 4)
+        self.assertEqual(store.scan('c'), [])
+
+        self.clock.now += 60
+        self.assertEqual(store.scan('ab'), [])
+
+    def test_ttl(self):
+        store = self.new(ttl=60)
+        store.set('a', 1)
+
+        self.clock.now += 59
+        self.assertEqual(store.get('a'), 1)
+
+        self.clock.now += 1
+        self.assertIsNone(store.get('a'))
+
+
+class TestMemoryStore(StoreTests, unittest.TestCase):
+
+    def new(self, ttl=60, max_entries=3):
+        self.clock = Mock_Clock()
+        return MemoryStore(ttl=ttl, max_entries=max_entries, clock=self.clock)
+
+    def test_lru(self):
+        store = self.new(max_entries=3)
+        for key in ['a', 'b', 'c']:
+            store.set(key, key)
+
+        # a is now the most recently used
+        store.get('a')
+        store.set('d', 'd')
+
+        self.assertEqual(len(store), 3)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(store.get('a'), 'a')
+
+
+class TestSqliteStore(StoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def new(self, ttl=60, max_entries=3):
+        self.clock = Mock_Clock()
+        return SqliteStore(os.path.join(self.dir, 'test.db'), ttl=ttl, max_entries=max_entries, clock=self.clock)
+
+    def test_evict(self):
+        store = self.new(ttl=60, max_entries=3)
+        for key in ['a', 'b', 'c', 'd']:
+            store.set(key, key)
+            self.clock.now += 1
+
+        store.evict()
+        self.assertEqual(len(store), 3)
+        self.assertIsNone(store.get('a'))
+
+        self.clock.now += 60
+        store.evict()
+        self.assertEqual(len(store), 0)
+
+    def test_shared_file(self):
+        path = os.path.join(self.dir, 'shared.db')
+        SqliteStore(path, table='messages').set('a', [1, 2])
+
+        self.assertEqual(SqliteStore(path, table='messages').get('a'), [1, 2])
+        self.assertIsNone(SqliteStore(path, table='other').get('a'))
+
+    def test_invalid_table(self):
+        with self.assertRaises(ValueError):
+            SqliteStore(os.path.join(self.dir, 'test.db'), table='a; DROP TABLE b')
+
+
+class TestNewStore(unittest.TestCase):
+
+    def test_backends(self):
+        self.assertIsInstance(new_store({}), MemoryStore)
+        self.assertIsInstance(new_store(None), MemoryStore)
+
+        path = os.path.join(tempfile.mkdtemp(), 'test.db')
+        try:
+            self.assertIsInstance(new_store({'backend': 'sqlite', 'path': path}), SqliteStore)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+        with self.assertRaises(ValueError):
+            new_store({'backend': 'foo'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from slackbuild.template_registry import TemplateRegistry
+
+
+class TestTemplateRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.write('test.json', '{"text": "${build_id}"}')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, contents, mtime=None):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(contents)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_preload(self):
+        registry = TemplateRegistry(directory=self.dir)
+        registry.preload(['test.json', 'missing.json', ''])
+
+        template = registry.get('test.json')
+        self.assertEqual(template.render({'build_id': '123'}), {'text': '123'})
+        self.assertEqual(registry.stats(), {'hits': 1, 'misses': 0, 'reloads': 0})
+
+        with self.assertRaises(FileNotFoundError):
+            registry.get('missing.json')
+
+    def test_preload_invalid(self):
+        # only valid json once substituted, fails the render that uses it instead of the preload
+        self.write('count.json', '{"n": ${count}}')
+        registry = TemplateRegistry(directory=self.dir)
+        registry.preload(['count.json', 'test.json'])
+
+        self.assertEqual(registry.get('test.json').render({'build_id': '1'}), {'text': '1'})
+        with self.assertRaises(ValueError):
+            registry.get('count.json')
+
+    def test_miss_then_hit(self):
+        registry = TemplateRegistry(directory=self.dir)
+        first = registry.get('test.json')
+        second = registry.get('test.json')
+
+        self.assertIs(first, second)
+        self.assertEqual(registry.stats(), {'hits': 1, 'misses': 1, 'reloads': 0})
+
+    def test_mtime_reload(self):
+        registry = TemplateRegistry(directory=self.dir, check_mtime=True)
+        registry.get('test.json')
+
+        self.write('test.json', '{"text": "${build_id_short}"}', mtime=1)
+        template = registry.get('test.json')
+
+        self.assertEqual(template.render({'build_id_short': '1'}), {'text': '1'})
+        self.assertEqual(registry.stats(), {'hits': 0, 'misses': 1, 'reloads': 1})
+
+        # without mtime checks the cached template is kept
+        registry = TemplateRegistry(directory=self.dir)
+        registry.get('test.json')
+        self.write('test.json', '{}', mtime=2)
+        self.assertEqual(registry.get('test.json').template, '{"text": "${build_id_short}"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import copy
+import json
+import unittest
+from slackbuild.build_status import BuildStatus
+from slackbuild.config import Config
+from slackbuild.state_store import MemoryStore
+from slackbuild.transitions import Transitions
+
+
+def fixture(name, status):
+    with open('mocks/pubsub/%s' % name) as f:
+        data = json.load(f)
+    data['attributes']['status'] = status
+    return data
+
+
+def replay(transitions, events):
+    """ runs pubsub messages through toMessage and Transitions like slackbuild_pubsub
+
+    Returns:
+        list : (status, build_transition, streak_length) of the notified builds
+    """
+    notified = []
+    for data in events:
+        variables, _ = BuildStatus.toMessage(copy.deepcopy(data), {})
+        notify, variables = transitions.check(variables, data['attributes']['status'])
+        if notify:
+            notified.append((data['attributes']['status'], variables['build_transition'], variables['streak_length']))
+    return notified
+
+
+class TestTransitions(unittest.TestCase):
+
+    def new(self, **conf):
+        return Transitions(Config(config_override={'pubsub': {'transitions': conf}}), store=MemoryStore())
+
+    def test_disabled(self):
+        transitions = Transitions(Config(config_override={}))
+        events = [fixture('success_triggered.json', 'SUCCESS')] * 3
+
+        self.assertEqual(len(replay(transitions, events)), 3)
+        variables, _ = BuildStatus.toMessage(events[0], {})
+        self.assertEqual((variables['previous_status'], variables['streak_length'], variables['build_transition']), ('', '', ''))
+
+    def test_replay_fixtures(self):
+        transitions = self.new()
+        statuses = ['SUCCESS', 'SUCCESS', 'SUCCESS', 'FAILURE', 'FAILURE', 'SUCCESS', 'SUCCESS']
+        events = [fixture('success_triggered.json', status) for status in statuses]
+
+        self.assertEqual(replay(transitions, events), [
+            ('SUCCESS', '', '1'),
+            ('FAILURE', 'broken', '1'),
+            ('SUCCESS', 'fixed', '1')
+        ])
+        self.assertEqual(transitions.stats(), {'notified': 3, 'suppressed': 4})
+
+    def test_every_failure(self):
+        transitions = self.new(every_failure=True)
+        statuses = ['SUCCESS', 'SUCCESS', 'FAILURE', 'FAILURE', 'TIMEOUT', 'SUCCESS', 'SUCCESS']
+        events = [fixture('success_triggered.json', status) for status in statuses]
+
+        self.assertEqual(replay(transitions, events), [
+            ('SUCCESS', '', '1'),
+            ('FAILURE', 'broken', '1'),
+            ('FAILURE', '', '2'),
+            ('TIMEOUT', '', '1'),
+            ('SUCCESS', 'fixed', '1')
+        ])
+
+    def test_separate_sources(self):
+        transitions = self.new()
+        # a triggered build of master and a manual build of testrepo are tracked apart
+        events = [
+            fixture('success_triggered.json', 'SUCCESS'),
+            fixture('success_manual.json', 'SUCCESS'),
+            fixture('success_triggered.json', 'SUCCESS'),
+            fixture('success_manual.json', 'FAILURE')
+        ]
+
+        self.assertEqual(replay(transitions, events), [
+            ('SUCCESS', '', '1'),
+            ('SUCCESS', '', '1'),
+            ('FAILURE', 'broken', '1')
+        ])
+
+    def test_unfinished_suppressed(self):
+        transitions = self.new()
+        events = [fixture('working_manual.json', 'QUEUED'), fixture('working_manual.json', 'WORKING'), fixture('working_manual.json', 'SUCCESS')]
+
+        # the outcome of an unfinished build is not known, only the finished build is notified
+        self.assertEqual(replay(transitions, events), [('SUCCESS', '', '1')])
+        self.assertEqual(transitions.stats(), {'notified': 1, 'suppressed': 2})
+
+    def test_in_progress(self):
+        transitions = Transitions(Config(config_override={'pubsub': {'transitions': {'in_progress': True}}}), store=MemoryStore(), progress_store=MemoryStore())
+        working = fixture('success_triggered.json', 'WORKING')
+        success = fixture('success_triggered.json', 'SUCCESS')
+
+        # a repeated success is still sent when its build was notified while in progress
+        self.assertEqual(replay(transitions, [success, working, success]), [
+            ('SUCCESS', '', '1'),
+            ('WORKING', '', ''),
+            ('SUCCESS', '', '2')
+        ])
+        # later repeated successes are suppressed again
+        self.assertEqual(replay(transitions, [success]), [])
+
+    def test_cancelled(self):
+        transitions = self.new()
+        statuses = ['SUCCESS', 'CANCELLED', 'SUCCESS', 'FAILURE', 'CANCELLED', 'FAILURE']
+        events = [fixture('success_triggered.json', status) for status in statuses]
+
+        # cancelling a build does not start a new streak
+        self.assertEqual(replay(transitions, events), [
+            ('SUCCESS', '', '1'),
+            ('FAILURE', 'broken', '1')
+        ])
+
+    def test_previous_status(self):
+        transitions = self.new()
+        variables, _ = BuildStatus.toMessage(fixture('success_triggered.json', 'SUCCESS'), {})
+        transitions.check(variables, 'SUCCESS')
+
+        variables, _ = BuildStatus.toMessage(fixture('success_triggered.json', 'FAILURE'), {})
+        notify, variables = transitions.check(variables, 'FAILURE')
+        self.assertTrue(notify)
+        self.assertEqual(variables['previous_status'], 'SUCCESS')
+        self.assertEqual(variables['build_transition'], 'broken')
+
+
+if __name__ == '__main__':
+    unittest.main()
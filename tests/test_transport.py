@@ -0,0 +1,106 @@
+import json
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from slackbuild.transport import WebApiTransport
+from slackbuild.transport import WebhookTransport
+
+
+class Mock_Server(ThreadingMixIn, HTTPServer):
+    """ http.server.ThreadingHTTPServer, which python 3.6 does not have """
+
+    daemon_threads = True
+
+
+class Mock_SlackHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # path -> (status, content type, body)
+    responses = {}  # type: dict
+    requests = []  # type: list
+
+    def setup(self):
+        super().setup()
+        # headers and body are written separately, avoid nagle delaying keep-alive responses
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        Mock_SlackHandler.requests.append((self.path, self.headers.get('Authorization'), json.loads(body), self.client_address[1]))
+
+        status, content_type, resp = Mock_SlackHandler.responses[self.path]
+        resp = resp.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(resp)))
+        if status == 429:
+            self.send_header('Retry-After', '3')
+        self.end_headers()
+        self.wfile.write(resp)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTransport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Mock_Server(('127.0.0.1', 0), Mock_SlackHandler)
+        cls.url = 'http://127.0.0.1:%d/' % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Mock_SlackHandler.requests = []
+        Mock_SlackHandler.responses = {
+            '/api/chat.postMessage': (200, 'application/json', '{"ok": true, "channel": "C123", "ts": "1.1"}'),
+            '/api/chat.update': (429, 'application/json', '{"ok": false}'),
+            '/hook': (200, 'text/html', 'ok'),
+            '/badhook': (404, 'text/html', 'no_service')
+        }
+
+    def test_web_api(self):
+        transport = WebApiTransport('xoxb-test', base_url=self.url + 'api/')
+        msg = {'channel': '#test', 'attachments': [{'text': 'hi'}]}
+
+        resp = transport.api_call('chat.postMessage', **msg)
+        self.assertTrue(resp['ok'])
+        self.assertEqual(resp['ts'], '1.1')
+
+        resp = transport.api_call('chat.update', ts='1.1', **msg)
+        self.assertEqual(resp['error'], 'ratelimited')
+        self.assertEqual(resp['headers']['Retry-After'], '3')
+        self.assertEqual(resp['headers']['retry-after'], '3')
+
+        self.assertEqual([r[:3] for r in Mock_SlackHandler.requests], [
+            ('/api/chat.postMessage', 'Bearer xoxb-test', msg),
+            ('/api/chat.update', 'Bearer xoxb-test', dict(msg, ts='1.1'))
+        ])
+        # both calls were made over the same connection
+        self.assertEqual(Mock_SlackHandler.requests[0][3], Mock_SlackHandler.requests[1][3])
+
+    def test_webhook(self):
+        fallback = WebApiTransport('xoxb-test', base_url=self.url + 'api/')
+        transport = WebhookTransport(self.url + 'hook', fallback)
+        msg = {'channel': '#test', 'text': 'hi'}
+
+        self.assertTrue(transport.api_call('chat.postMessage', **msg)['ok'])
+        self.assertEqual(transport.api_call('chat.update', ts='1.1', **msg)['error'], 'ratelimited')
+        self.assertEqual([r[0] for r in Mock_SlackHandler.requests], ['/hook', '/api/chat.update'])
+
+        transport = WebhookTransport(self.url + 'badhook', fallback)
+        resp = transport.api_call('chat.postMessage', **msg)
+        self.assertFalse(resp['ok'])
+        self.assertEqual(resp['error'], 'no_service')
+
+
+if __name__ == '__main__':
+    unittest.main()
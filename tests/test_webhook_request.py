@@ -0,0 +1,93 @@
+import hmac
+import json
+import unittest
+from urllib.parse import urlencode
+from slackbuild.webhook_request import WebhookRequest
+
+
+SECRET = b'8f742231b10e8888abcd99yyyzzz85a5'
+
+
+def sign(ts, body):
+    return 'v0=' + hmac.new(SECRET, b'v0:' + ts.encode('utf-8') + b':' + body, 'sha256').hexdigest()
+
+
+class Mock_FlaskRequest():
+    """ counts how often the body is read """
+
+    def __init__(self, body: bytes, headers=None, content_length=-1):
+        self.headers = headers or {}
+        self.content_length = len(body) if content_length == -1 else content_length
+        self.reads = 0
+        self.__body = body
+
+    def get_data(self, as_text=False):
+        self.reads += 1
+        return self.__body
+
+
+class TestWebhookRequest(unittest.TestCase):
+
+    def new(self, form, ts='1531420618', signature=None):
+        body = urlencode(form).encode('utf-8')
+        headers = {
+            'X-Slack-Request-Timestamp': ts,
+            'X-Slack-Signature': signature or sign(ts, body)
+        }
+        req = Mock_FlaskRequest(body, headers)
+        return WebhookRequest(req), req
+
+    def test_verify_and_parse(self):
+        with open('mocks/webhook/form.json') as f:
+            form = json.load(f)
+        envelope, req = self.new(form)
+
+        self.assertEqual(envelope.verify(SECRET, 50000), (True, ''))
+        self.assertEqual(envelope.body(), form)
+        self.assertIs(envelope.body(), envelope.body())
+        self.assertEqual(req.reads, 1)
+
+    def test_interactive_payload(self):
+        with open('mocks/webhook/interactive_message.json') as f:
+            form = json.load(f)
+        with open('mocks/webhook/interactive_message_payload.json') as f:
+            expected = json.load(f)
+        envelope, req = self.new(form)
+
+        self.assertTrue(envelope.verify(SECRET, 50000)[0])
+        self.assertEqual(envelope.body(), expected)
+
+    def test_invalid_signature(self):
+        envelope, req = self.new({'text': 'help'}, signature='v0=1234')
+
+        self.assertEqual(envelope.verify(SECRET, 50000), (False, 'Slack signature did not match'))
+        # another timestamp changes the signed string
+        envelope, req = self.new({'text': 'help'}, signature=sign('1531420619', b'text=help'))
+        self.assertFalse(envelope.verify(SECRET, 50000)[0])
+
+        envelope, req = self.new({'text': 'help'}, signature='v0=é')
+        self.assertFalse(envelope.verify(SECRET, 50000)[0])
+
+    def test_content_length(self):
+        req = Mock_FlaskRequest(b'text=help', content_length=50001)
+        self.assertFalse(WebhookRequest(req).verify(SECRET, 50000)[0])
+        # oversized requests are rejected without reading the body
+        self.assertEqual(req.reads, 0)
+
+        req = Mock_FlaskRequest(b'', content_length=None)
+        self.assertFalse(WebhookRequest(req).verify(SECRET, 50000)[0])
+        self.assertEqual(req.reads, 0)
+
+    def test_repeated_keys(self):
+        envelope = WebhookRequest(Mock_FlaskRequest(b'text=first&text=second&user_name=a%20b'))
+        self.assertEqual(envelope.body(), {'text': 'first', 'user_name': 'a b'})
+
+    def test_text_body(self):
+        # bodies returned as str, such as from older test doubles, are encoded once
+        envelope = WebhookRequest(Mock_FlaskRequest('text=hélp'))
+        self.assertEqual(envelope.raw(), 'text=hélp'.encode('utf-8'))
+        self.assertEqual(envelope.body(), {'text': 'hélp'})
+
+
+if __name__ == '__main__':
+    unittest.main()